@@ -1,194 +1,97 @@
-import functools
+import importlib
+import os
+import sys
 
-import boto3
 import click
-from botocore.exceptions import ClientError
-
-from cloudlift.config import highlight_production, ServiceConfiguration
-from cloudlift.config.logging import log_err
-from cloudlift.deployment import EnvironmentCreator, editor
-from cloudlift.deployment.configs import deduce_name
-from cloudlift.deployment.service_creator import ServiceCreator
-from cloudlift.deployment.service_information_fetcher import ServiceInformationFetcher
-from cloudlift.deployment.service_updater import ServiceUpdater
+
 from cloudlift.exceptions import UnrecoverableException
 from cloudlift.version import VERSION
 
+# Commands are resolved lazily so that `--help`, `--version` and other cheap
+# invocations do not pay for boto3, troposphere and the deployment package.
+LAZY_COMMANDS = {
+    'create_environment': 'cloudlift.commands.environment',
+    'update_environment': 'cloudlift.commands.environment',
+    'create_service': 'cloudlift.commands.service',
+    'update_service': 'cloudlift.commands.service',
+    'deploy_service': 'cloudlift.commands.service',
+    'revert_service': 'cloudlift.commands.service',
+    'upload_to_ecr': 'cloudlift.commands.service',
+    'promote_image': 'cloudlift.commands.service',
+    'get_version': 'cloudlift.commands.service',
+    'edit_config': 'cloudlift.commands.config',
+    'cache': 'cloudlift.commands.cache',
+}
+
+AWS_CONNECTIVITY_ERRORS = ('NoCredentialsError', 'PartialCredentialsError', 'NoRegionError')
+
 
-def _require_environment(func):
-    @click.option('--environment', '-e', prompt='environment',
-                  help='environment')
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        if kwargs['environment'] == 'production' or kwargs['environment'] == 'prod':
-            highlight_production()
-        return func(*args, **kwargs)
+def _log_err(text):
+    click.secho(text, fg='red', bold=True)
 
-    return wrapper
 
+def _report_client_stats():
+    # Only report when a command actually touched AWS; importing the registry
+    # here would pull in boto3 for `--help` and `--version`.
+    client_registry = sys.modules.get('cloudlift.config.client_registry')
+    if os.environ.get('CLOUDLIFT_CLIENT_STATS') and client_registry is not None:
+        click.echo('boto3 client registry: {}'.format(client_registry.registry.stats()), err=True)
+    poller = sys.modules.get('cloudlift.utils.poller')
+    if os.environ.get('CLOUDLIFT_CLIENT_STATS') and poller is not None:
+        for name, stats in sorted(poller.poll_stats().items()):
+            click.echo('poll {}: {}'.format(name, stats), err=True)
 
-def _require_name(func):
-    @click.option('--name', help='Your service name, give the name of \
-repo')
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        if kwargs['name'] is None:
-            kwargs['name'] = deduce_name(None)
-        return func(*args, **kwargs)
 
-    return wrapper
+def _is_aws_connectivity_error(error):
+    return type(error).__module__ == 'botocore.exceptions' and type(error).__name__ in AWS_CONNECTIVITY_ERRORS
 
 
 class CommandWrapper(click.Group):
+    def __init__(self, *args, **kwargs):
+        self.lazy_commands = kwargs.pop('lazy_commands', {})
+        super(CommandWrapper, self).__init__(*args, **kwargs)
+
+    def list_commands(self, ctx):
+        return sorted(set(super(CommandWrapper, self).list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        command = super(CommandWrapper, self).get_command(ctx, cmd_name)
+        if command is None and cmd_name in self.lazy_commands:
+            module = importlib.import_module(self.lazy_commands[cmd_name])
+            command = getattr(module, cmd_name)
+            self.add_command(command, cmd_name)
+        return command
+
     def __call__(self, *args, **kwargs):
         try:
             return self.main(*args, **kwargs)
         except UnrecoverableException as e:
-            log_err(e.value)
+            _log_err(e.value)
+            exit(1)
+        except Exception as e:
+            # The connectivity check happens on the first real AWS call
+            # instead of eagerly creating a client for every invocation.
+            if not _is_aws_connectivity_error(e):
+                raise
+            _log_err("Could not connect to AWS!")
+            _log_err("Ensure AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY & \
+AWS_DEFAULT_REGION env vars are set OR run 'aws configure'")
             exit(1)
+        finally:
+            _report_client_stats()
 
 
-@click.group(cls=CommandWrapper)
+@click.group(cls=CommandWrapper, lazy_commands=LAZY_COMMANDS)
 @click.version_option(version=VERSION, prog_name="cloudlift")
-def cli():
+@click.option('--no-cache', is_flag=True, help='Bypass the local cache of AWS lookups for this run')
+def cli(no_cache):
     """
         Cloudlift is built by Simpl developers to make it easier to launch \
         dockerized services in AWS ECS.
     """
-    try:
-        boto3.client('cloudformation')
-    except ClientError:
-        log_err("Could not connect to AWS!")
-        log_err("Ensure AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY & \
-AWS_DEFAULT_REGION env vars are set OR run 'aws configure'")
-        exit(1)
-
-
-@cli.command(help="Create a new service. This can contain multiple \
-ECS services")
-@_require_environment
-@_require_name
-@click.option('--version', default=None,
-              help='local image version tag')
-@click.option("--build-arg", type=(str, str), multiple=True, help="These args are passed to docker build command "
-                                                                  "as --build-args. Supports multiple.\
-                                                                   Please leave space between name and value")
-@click.option('--dockerfile', default=None, help='The Dockerfile path used to build')
-@click.option('--env_sample_file', default='env.sample', help='env sample file path')
-@click.option('--ssh', default=None, help='SSH agent socket or keys to expose to the docker build')
-@click.option('--cache-from', multiple=True, help='Images to consider as cache sources')
-def create_service(name, environment, version, build_arg, dockerfile, env_sample_file, ssh, cache_from):
-    ServiceCreator(name, environment, env_sample_file).create(
-        version=version, build_arg=dict(build_arg), dockerfile=dockerfile, ssh=ssh, cache_from=list(cache_from),
-    )
-
-
-@cli.command(help="Update existing service.")
-@_require_environment
-@_require_name
-@click.option('--env_sample_file', default='env.sample', help='env sample file path')
-def update_service(name, environment, env_sample_file):
-    ServiceCreator(name, environment, env_sample_file).update()
-
-
-@cli.command(help="Create a new environment")
-@click.option('--environment', '-e', prompt='environment',
-              help='environment')
-def create_environment(environment):
-    EnvironmentCreator(environment).run()
-
-
-@cli.command(help="Update environment")
-@_require_environment
-@click.option('--update_ecs_agents',
-              is_flag=True,
-              help='Update ECS container agents')
-def update_environment(environment, update_ecs_agents):
-    EnvironmentCreator(environment).run_update(update_ecs_agents)
-
-
-@cli.command(help="Command used to create or update the configuration \
-in parameter store")
-@_require_name
-@_require_environment
-@click.option('--sidecar', help='Choose which sidecar to edit the configuration. Defaults to the main container ' +
-                                'if not provided')
-def edit_config(name, environment, sidecar):
-    editor.edit_config(name, environment, sidecar)
-
-
-@cli.command()
-@_require_environment
-@_require_name
-@click.option('--deployment_identifier', type=str, required=False,
-              help='Unique identifier for deployment which can be used for reverting')
-@click.option('--timeout_seconds', default=600, help='The deployment timeout')
-@click.option('--version', default=None,
-              help='local image version tag')
-@click.option("--build-arg", type=(str, str), multiple=True, help="These args are passed to docker build command "
-                                                                  "as --build-args. Supports multiple.\
-                                                                   Please leave space between name and value")
-@click.option('--dockerfile', default=None, help='The Dockerfile path used to build')
-@click.option('--env_sample_file', default='env.sample', help='env sample file path')
-@click.option('--ssh', default=None, help='SSH agent socket or keys to expose to the docker build')
-@click.option('--cache-from', multiple=True, help='Images to consider as cache sources')
-def deploy_service(name, environment, timeout_seconds, version, build_arg, dockerfile, env_sample_file, ssh,
-                   cache_from,
-                   deployment_identifier):
-    ServiceUpdater(
-        name,
-        environment=environment,
-        env_sample_file=env_sample_file,
-        timeout_seconds=timeout_seconds,
-        version=version,
-        build_args=dict(build_arg),
-        dockerfile=dockerfile,
-        ssh=ssh,
-        cache_from=list(cache_from), deployment_identifier=deployment_identifier
-    ).run()
-
-
-@cli.command()
-@_require_environment
-@_require_name
-@click.option('--deployment_identifier', type=str, required=True,
-              help='Unique identifier for deployment which can be used for reverting')
-@click.option('--timeout_seconds', default=600, help='The deployment timeout')
-def revert_service(name, environment, timeout_seconds, deployment_identifier):
-    ServiceUpdater(name, environment, deployment_identifier=deployment_identifier,
-                   timeout_seconds=timeout_seconds).revert()
-
-
-@cli.command()
-@_require_name
-@_require_environment
-@click.option('--additional_tags', default=[], multiple=True,
-              help='Additional tags for the image apart from commit SHA')
-@click.option("--build-arg", type=(str, str), multiple=True, help="These args are passed to docker build command "
-                                                                  "as --build-args. Supports multiple.\
-                                                                   Please leave space between name and value")
-@click.option('--dockerfile', default=None, help='The Dockerfile path used to build')
-@click.option('--env_sample_file', default='env.sample', help='env sample file path')
-@click.option('--ssh', default=None, help='SSH agent socket or keys to expose to the docker build')
-@click.option('--cache-from', multiple=True, help='Images to consider as cache sources')
-def upload_to_ecr(name, environment, additional_tags, build_arg, dockerfile, env_sample_file, ssh, cache_from):
-    ServiceUpdater(name, environment=environment, env_sample_file=env_sample_file,
-                   build_args=dict(build_arg), dockerfile=dockerfile,
-                   ssh=ssh, cache_from=list(cache_from)).upload_to_ecr(additional_tags)
-
-
-@cli.command(help="Get commit information of currently deployed code \
-from commit hash")
-@_require_environment
-@_require_name
-@click.option('--image', is_flag=True, help='Print image with version')
-@click.option('--git', is_flag=True, help='Prints the git revision part of the image')
-def get_version(name, environment, image, git):
-    ServiceInformationFetcher(
-        name,
-        environment,
-        ServiceConfiguration(service_name=name, environment=environment).get_config(),
-    ).get_version(print_image=image, print_git=git)
+    if no_cache:
+        # Through the environment so that deployment subprocesses see it too
+        os.environ['CLOUDLIFT_NO_CACHE'] = '1'
 
 
 if __name__ == '__main__':
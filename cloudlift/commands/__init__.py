@@ -0,0 +1,7 @@
+'''
+Click commands for the cloudlift CLI.
+
+Modules in this package are imported lazily by the top level command group,
+so they must stay cheap to import. Anything that pulls in boto3, troposphere
+or the deployment package is imported inside the command body.
+'''
@@ -0,0 +1,27 @@
+import click
+
+from cloudlift.utils import disk_cache
+
+
+@click.group(help="Inspect or clear the local cache of AWS lookups")
+def cache():
+    pass
+
+
+@cache.command(help="List cached entries and their age")
+def show():
+    from terminaltables import SingleTable
+    rows = [['Namespace', 'Key', 'Age (s)', 'Status']]
+    for namespace, key, age, expired in disk_cache.entries():
+        rows.append([namespace, key, int(age), 'expired' if expired else 'fresh'])
+    if len(rows) == 1:
+        click.echo("Cache at {} is empty".format(disk_cache.cache_dir()))
+        return
+    print(SingleTable(rows, title=disk_cache.cache_dir()).table)
+
+
+@cache.command(help="Remove cached entries")
+@click.option('--namespace', help='Only clear entries of this namespace, e.g. ami_id')
+def clear(namespace):
+    removed = disk_cache.clear(namespace)
+    click.echo("Removed {} cache entries".format(removed))
@@ -0,0 +1,14 @@
+import click
+
+from cloudlift.commands.options import require_environment, require_name
+
+
+@click.command(help="Command used to create or update the configuration \
+in parameter store")
+@require_name
+@require_environment
+@click.option('--sidecar', help='Choose which sidecar to edit the configuration. Defaults to the main container ' +
+                                'if not provided')
+def edit_config(name, environment, sidecar):
+    from cloudlift.deployment import editor
+    editor.edit_config(name, environment, sidecar)
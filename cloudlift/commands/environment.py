@@ -0,0 +1,21 @@
+import click
+
+from cloudlift.commands.options import require_environment
+
+
+@click.command(help="Create a new environment")
+@click.option('--environment', '-e', prompt='environment',
+              help='environment')
+def create_environment(environment):
+    from cloudlift.deployment.environment_creator import EnvironmentCreator
+    EnvironmentCreator(environment).run()
+
+
+@click.command(help="Update environment")
+@require_environment
+@click.option('--update_ecs_agents',
+              is_flag=True,
+              help='Update ECS container agents')
+def update_environment(environment, update_ecs_agents):
+    from cloudlift.deployment.environment_creator import EnvironmentCreator
+    EnvironmentCreator(environment).run_update(update_ecs_agents)
@@ -0,0 +1,29 @@
+import functools
+
+import click
+
+
+def require_environment(func):
+    @click.option('--environment', '-e', prompt='environment',
+                  help='environment')
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if kwargs['environment'] == 'production' or kwargs['environment'] == 'prod':
+            from cloudlift.config.banner import highlight_production
+            highlight_production()
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+def require_name(func):
+    @click.option('--name', help='Your service name, give the name of \
+repo')
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if kwargs['name'] is None:
+            from cloudlift.deployment.configs import deduce_name
+            kwargs['name'] = deduce_name(None)
+        return func(*args, **kwargs)
+
+    return wrapper
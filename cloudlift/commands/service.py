@@ -0,0 +1,146 @@
+import click
+
+from cloudlift.commands.options import require_environment, require_name
+
+
+@click.command(help="Create a new service. This can contain multiple \
+ECS services")
+@require_environment
+@require_name
+@click.option('--version', default=None,
+              help='local image version tag')
+@click.option("--build-arg", type=(str, str), multiple=True, help="These args are passed to docker build command "
+                                                                  "as --build-args. Supports multiple.\
+                                                                   Please leave space between name and value")
+@click.option('--dockerfile', default=None, help='The Dockerfile path used to build')
+@click.option('--env_sample_file', default='env.sample', help='env sample file path')
+@click.option('--ssh', default=None, help='SSH agent socket or keys to expose to the docker build')
+@click.option('--cache-from', multiple=True, help='Images to consider as cache sources')
+def create_service(name, environment, version, build_arg, dockerfile, env_sample_file, ssh, cache_from):
+    from cloudlift.deployment.service_creator import ServiceCreator
+    ServiceCreator(name, environment, env_sample_file).create(
+        version=version, build_arg=dict(build_arg), dockerfile=dockerfile, ssh=ssh, cache_from=list(cache_from),
+    )
+
+
+@click.command(help="Update existing service.")
+@require_environment
+@require_name
+@click.option('--env_sample_file', default='env.sample', help='env sample file path')
+def update_service(name, environment, env_sample_file):
+    from cloudlift.deployment.service_creator import ServiceCreator
+    ServiceCreator(name, environment, env_sample_file).update()
+
+
+@click.command()
+@require_environment
+@require_name
+@click.option('--deployment_identifier', type=str, required=False,
+              help='Unique identifier for deployment which can be used for reverting')
+@click.option('--timeout_seconds', default=600, help='The deployment timeout')
+@click.option('--version', default=None,
+              help='local image version tag')
+@click.option("--build-arg", type=(str, str), multiple=True, help="These args are passed to docker build command "
+                                                                  "as --build-args. Supports multiple.\
+                                                                   Please leave space between name and value")
+@click.option('--dockerfile', default=None, help='The Dockerfile path used to build')
+@click.option('--env_sample_file', default='env.sample', help='env sample file path')
+@click.option('--ssh', default=None, help='SSH agent socket or keys to expose to the docker build')
+@click.option('--cache-from', multiple=True, help='Images to consider as cache sources')
+@click.option('--extra-dockerfile', multiple=True,
+              help='Another Dockerfile to build and push along with the service image, e.g. for a sidecar. '
+                   'Supports multiple.')
+@click.option('--context-hash', is_flag=True,
+              help='Reuse an image built from the same build context, even for a different commit or a dirty tree')
+@click.option('--registry-cache', is_flag=True,
+              help='Build with buildx, importing and exporting the layer cache through an ECR repository')
+@click.option('--force', is_flag=True,
+              help='Deploy even when the task definition is the same as the one running')
+def deploy_service(name, environment, timeout_seconds, version, build_arg, dockerfile, env_sample_file, ssh,
+                   cache_from, extra_dockerfile, context_hash, registry_cache,
+                   deployment_identifier, force):
+    from cloudlift.deployment.service_updater import ServiceUpdater
+    ServiceUpdater(
+        name,
+        environment=environment,
+        env_sample_file=env_sample_file,
+        timeout_seconds=timeout_seconds,
+        version=version,
+        build_args=dict(build_arg),
+        dockerfile=dockerfile,
+        ssh=ssh,
+        cache_from=list(cache_from), deployment_identifier=deployment_identifier,
+        extra_dockerfiles=list(extra_dockerfile), context_hash=context_hash, registry_cache=registry_cache,
+        force=force,
+    ).run()
+
+
+@click.command()
+@require_environment
+@require_name
+@click.option('--deployment_identifier', type=str, required=True,
+              help='Unique identifier for deployment which can be used for reverting')
+@click.option('--timeout_seconds', default=600, help='The deployment timeout')
+def revert_service(name, environment, timeout_seconds, deployment_identifier):
+    from cloudlift.deployment.service_updater import ServiceUpdater
+    ServiceUpdater(name, environment, deployment_identifier=deployment_identifier,
+                   timeout_seconds=timeout_seconds).revert()
+
+
+@click.command()
+@require_name
+@require_environment
+@click.option('--additional_tags', default=[], multiple=True,
+              help='Additional tags for the image apart from commit SHA')
+@click.option("--build-arg", type=(str, str), multiple=True, help="These args are passed to docker build command "
+                                                                  "as --build-args. Supports multiple.\
+                                                                   Please leave space between name and value")
+@click.option('--dockerfile', default=None, help='The Dockerfile path used to build')
+@click.option('--env_sample_file', default='env.sample', help='env sample file path')
+@click.option('--ssh', default=None, help='SSH agent socket or keys to expose to the docker build')
+@click.option('--cache-from', multiple=True, help='Images to consider as cache sources')
+@click.option('--extra-dockerfile', multiple=True,
+              help='Another Dockerfile to build and push along with the service image, e.g. for a sidecar. '
+                   'Supports multiple.')
+@click.option('--context-hash', is_flag=True,
+              help='Reuse an image built from the same build context, even for a different commit or a dirty tree')
+@click.option('--registry-cache', is_flag=True,
+              help='Build with buildx, importing and exporting the layer cache through an ECR repository')
+def upload_to_ecr(name, environment, additional_tags, build_arg, dockerfile, env_sample_file, ssh, cache_from,
+                  extra_dockerfile, context_hash, registry_cache):
+    from cloudlift.deployment.service_updater import ServiceUpdater
+    ServiceUpdater(name, environment=environment, env_sample_file=env_sample_file,
+                   build_args=dict(build_arg), dockerfile=dockerfile,
+                   ssh=ssh, cache_from=list(cache_from),
+                   extra_dockerfiles=list(extra_dockerfile),
+                   context_hash=context_hash,
+                   registry_cache=registry_cache).upload_to_ecr(additional_tags)
+
+
+@click.command(help="Copy an image from the ECR repository of one environment to that of another, "
+                    "without pulling it")
+@require_environment
+@require_name
+@click.option('--from-environment', required=True, help='Environment whose ECR repository has the image')
+@click.option('--version', required=True, help='Tag of the image to promote')
+@click.option('--additional_tags', default=[], multiple=True,
+              help='Additional tags for the promoted image. Supports multiple.')
+def promote_image(name, environment, from_environment, version, additional_tags):
+    from cloudlift.deployment.image_promoter import promote_service_image
+    promote_service_image(name, from_environment, environment, version, list(additional_tags))
+
+
+@click.command(help="Get commit information of currently deployed code \
+from commit hash")
+@require_environment
+@require_name
+@click.option('--image', is_flag=True, help='Print image with version')
+@click.option('--git', is_flag=True, help='Prints the git revision part of the image')
+def get_version(name, environment, image, git):
+    from cloudlift.config import ServiceConfiguration
+    from cloudlift.deployment.service_information_fetcher import ServiceInformationFetcher
+    ServiceInformationFetcher(
+        name,
+        environment,
+        ServiceConfiguration(service_name=name, environment=environment).get_config(),
+    ).get_version(print_image=image, print_git=git)
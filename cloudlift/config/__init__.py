@@ -9,3 +9,4 @@ from .mfa import *
 from .service_configuration import *
 from .stack import *
 from .dynamodb_config import *
+from .deployment_index import *
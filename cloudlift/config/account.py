@@ -1,6 +1,52 @@
-from boto3 import client
+import hashlib
+import os
+
+from cloudlift.config.client_registry import get_client, get_session
+from cloudlift.utils import disk_cache
+
+IDENTITY_CACHE_TTL_SECONDS = int(os.environ.get('CLOUDLIFT_IDENTITY_CACHE_TTL', disk_cache.ttl_for('identity')))
+
+# Caller identities keyed by credentials fingerprint
+_identities = {}
+
+
+def _credentials_fingerprint():
+    credentials = get_session().get_credentials()
+    if credentials is None:
+        return None
+    access_key = credentials.get_frozen_credentials().access_key
+    return hashlib.sha256(access_key.encode('utf-8')).hexdigest()
+
+
+def get_caller_identity(sts_client=None):
+    '''
+        Returns the Account, Arn and UserId of the credentials in use.
+        Resolved once per credential set and kept on disk for a short while,
+        so that repeated lookups do not each call STS.
+    '''
+    if sts_client is not None:
+        return sts_client.get_caller_identity()
+    fingerprint = _credentials_fingerprint()
+    if fingerprint is None:
+        return get_client('sts').get_caller_identity()
+    if fingerprint not in _identities:
+        _identities[fingerprint] = disk_cache.cached('identity', fingerprint, _fetch_caller_identity,
+                                                     IDENTITY_CACHE_TTL_SECONDS)
+    return _identities[fingerprint]
+
+
+def _fetch_caller_identity():
+    response = get_client('sts').get_caller_identity()
+    return {key: response[key] for key in ('Account', 'Arn', 'UserId')}
+
+
+def clear_identity_cache():
+    _identities.clear()
 
 
 def get_account_id(sts_client=None):
-    sts_client = sts_client or client('sts')
-    return sts_client.get_caller_identity().get('Account')
+    return get_caller_identity(sts_client).get('Account')
+
+
+def get_username():
+    return get_caller_identity()['Arn'].split("user/")[1]
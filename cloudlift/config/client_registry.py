@@ -0,0 +1,195 @@
+"""
+Process-wide registry of boto3 sessions, clients and resources.
+
+Creating a boto3 session and a client from it is expensive: every session
+loads and parses the botocore service models again and every client opens
+its own connection pool. The registry builds one session per credential
+identity and region, shares the botocore data loader between all of them and hands out
+the same client for the same (service, region, credentials, config), so a
+command builds each client once no matter how many modules ask for it.
+"""
+import hashlib
+import os
+import threading
+from datetime import datetime, timedelta
+
+import boto3
+import botocore.loaders
+import botocore.session
+from botocore.config import Config
+from dateutil.tz import tzutc
+
+# Environment variables that decide which credentials the default provider
+# chain resolves to. `do_mfa_login` rewrites some of these at runtime, which
+# must lead to a fresh session rather than a client with stale credentials.
+DEFAULT_CHAIN_ENV_VARS = ['AWS_PROFILE', 'AWS_DEFAULT_PROFILE', 'AWS_ACCESS_KEY_ID',
+                          'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN', 'AWS_DEFAULT_REGION']
+ROLE_CREDENTIALS_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def _digest(*values):
+    return hashlib.sha256('\0'.join(str(value) for value in values).encode('utf-8')).hexdigest()[:16]
+
+
+# API calls made by the current thread through registry clients
+_thread_api_calls = threading.local()
+
+
+def api_call_count():
+    '''
+        Returns the number of AWS API calls the current thread has made
+        through clients and resources handed out by the registry
+    '''
+    return getattr(_thread_api_calls, 'count', 0)
+
+
+def _config_key(config):
+    return tuple(sorted((key, repr(value)) for key, value in (config or {}).items()))
+
+
+class ClientRegistry(object):
+    """
+        Thread safe cache of boto3 clients and resources keyed by service,
+        region, credentials (or assumed role) and client config
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+        self._loader = None
+        self._sessions = {}
+        self._clients = {}
+        self._resources = {}
+        self._role_credentials = {}
+        self._counters = {kind: {'hits': 0, 'misses': 0} for kind in ('sessions', 'clients', 'resources')}
+        self._api_calls = 0
+
+    def _ensure_current_process(self):
+        # Locks, sessions and connection pools must not be shared with a
+        # forked child process.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def get_client(self, service, region=None, credentials=None, profile=None, role_arn=None,
+                   role_session_name='cloudlift', config=None):
+        self._ensure_current_process()
+        with self._lock:
+            identity, session_kwargs = self._identity(region, credentials, profile, role_arn, role_session_name)
+            key = (service, region, identity, _config_key(config))
+            if key in self._clients:
+                self._counters['clients']['hits'] += 1
+            else:
+                self._counters['clients']['misses'] += 1
+                self._clients[key] = self._session(identity, session_kwargs, region).client(
+                    service, config=Config(**config) if config else None
+                )
+                # Fires once per API call, regardless of retries
+                self._clients[key].meta.events.register('before-parameter-build', self._count_api_call)
+            return self._clients[key]
+
+    def get_resource(self, service, region=None, credentials=None, profile=None, role_arn=None,
+                     role_session_name='cloudlift'):
+        self._ensure_current_process()
+        with self._lock:
+            identity, session_kwargs = self._identity(region, credentials, profile, role_arn, role_session_name)
+            # Unlike clients, boto3 resources are not thread safe, so every
+            # thread gets its own instance.
+            key = (service, region, identity, threading.get_ident())
+            if key in self._resources:
+                self._counters['resources']['hits'] += 1
+            else:
+                self._counters['resources']['misses'] += 1
+                self._resources[key] = self._session(identity, session_kwargs, region).resource(service)
+                self._resources[key].meta.client.meta.events.register('before-parameter-build', self._count_api_call)
+            return self._resources[key]
+
+    def get_session(self, region=None, credentials=None, profile=None, role_arn=None,
+                    role_session_name='cloudlift'):
+        self._ensure_current_process()
+        with self._lock:
+            identity, session_kwargs = self._identity(region, credentials, profile, role_arn, role_session_name)
+            return self._session(identity, session_kwargs, region)
+
+    def stats(self):
+        with self._lock:
+            stats = {kind: dict(counter) for kind, counter in self._counters.items()}
+            stats['api_calls'] = self._api_calls
+            return stats
+
+    def _count_api_call(self, **kwargs):
+        _thread_api_calls.count = api_call_count() + 1
+        with self._lock:
+            self._api_calls += 1
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _identity(self, region, credentials, profile, role_arn, role_session_name):
+        '''
+            Returns a hashable identity for the credentials along with the
+            keyword arguments needed to build a session for them. Secrets
+            only ever appear in the latter.
+        '''
+        if role_arn:
+            base_identity, base_session_kwargs = self._identity(region, credentials, profile, None, None)
+            role_credentials = self._assume_role(base_identity, base_session_kwargs, region,
+                                                 role_arn, role_session_name)
+            return ('role', role_arn, role_credentials['AccessKeyId']), {
+                'aws_access_key_id': role_credentials['AccessKeyId'],
+                'aws_secret_access_key': role_credentials['SecretAccessKey'],
+                'aws_session_token': role_credentials['SessionToken'],
+            }
+        if credentials:
+            return ('static', credentials['aws_access_key_id'],
+                    _digest(credentials['aws_secret_access_key'], credentials.get('aws_session_token'))), \
+                dict(credentials)
+        if profile:
+            return ('profile', profile), {'profile_name': profile}
+        return ('default', _digest(*[os.environ.get(name) for name in DEFAULT_CHAIN_ENV_VARS])), {}
+
+    def _assume_role(self, base_identity, base_session_kwargs, region, role_arn, role_session_name):
+        key = (base_identity, role_arn, role_session_name)
+        cached = self._role_credentials.get(key)
+        if cached is None or self._expiring(cached):
+            sts_client = self._session(base_identity, base_session_kwargs, region).client('sts')
+            cached = sts_client.assume_role(RoleArn=role_arn, RoleSessionName=role_session_name)['Credentials']
+            self._role_credentials[key] = cached
+        return cached
+
+    @staticmethod
+    def _expiring(role_credentials):
+        expiration = role_credentials.get('Expiration')
+        return expiration is not None and expiration - ROLE_CREDENTIALS_REFRESH_MARGIN <= datetime.now(tzutc())
+
+    def _session(self, identity, session_kwargs, region):
+        key = (identity, region)
+        if key in self._sessions:
+            self._counters['sessions']['hits'] += 1
+            return self._sessions[key]
+        self._counters['sessions']['misses'] += 1
+        if self._loader is None:
+            self._loader = botocore.loaders.create_loader()
+        botocore_session = botocore.session.get_session()
+        botocore_session.register_component('data_loader', self._loader)
+        self._sessions[key] = boto3.session.Session(botocore_session=botocore_session, region_name=region,
+                                                    **session_kwargs)
+        return self._sessions[key]
+
+
+registry = ClientRegistry()
+
+
+def get_client(service, region=None, **kwargs):
+    return registry.get_client(service, region, **kwargs)
+
+
+def get_resource(service, region=None, **kwargs):
+    return registry.get_resource(service, region, **kwargs)
+
+
+def get_session(**kwargs):
+    return registry.get_session(**kwargs)
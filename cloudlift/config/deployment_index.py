@@ -0,0 +1,43 @@
+'''
+Index from deployment_identifier to the task definition registered for the
+deployment, stored in DynamoDB next to the service configurations. Reverts
+look their target up here instead of describing every revision of the
+family. The index is best effort: ECS stays the source of truth and a
+failed read or write only costs the slow search.
+'''
+from time import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from cloudlift.config.dynamodb_config import DynamodbConfig
+from cloudlift.config.logging import log_warning
+
+DEPLOYMENT_INDEX_TABLE = 'deployment_identifiers'
+
+
+class DeploymentIndex(DynamodbConfig):
+    '''
+        Task definition ARN of one deployment of a task definition family
+    '''
+
+    def __init__(self, task_definition_family, deployment_identifier):
+        super(DeploymentIndex, self).__init__(DEPLOYMENT_INDEX_TABLE, [
+            ('task_definition_family', task_definition_family), ('deployment_identifier', deployment_identifier)])
+
+    def get_task_definition_arn(self):
+        try:
+            response = self._call_table('get_item', Key=self._key(), AttributesToGet=['task_definition_arn'])
+        except (BotoCoreError, ClientError) as error:
+            log_warning("Unable to read the deployment index: {}".format(error))
+            return None
+        return response.get('Item', {}).get('task_definition_arn')
+
+    def set_task_definition_arn(self, task_definition_arn):
+        try:
+            self._call_table('put_item', Item=dict(self._key(), task_definition_arn=task_definition_arn,
+                                                   recorded_at=int(time())))
+        except (BotoCoreError, ClientError) as error:
+            log_warning("Unable to record the deployment in the deployment index: {}".format(error))
+
+    def _key(self):
+        return {key: value for key, value in self.kv_pairs}
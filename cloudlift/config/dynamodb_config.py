@@ -1,8 +1,13 @@
-import boto3
 from botocore.exceptions import ClientError
 from cloudlift.version import VERSION
 from cloudlift.exceptions import UnrecoverableException
 from cloudlift.config.logging import log_bold, log_err, log_warning
+from cloudlift.config.client_registry import get_resource
+
+# Table handles shared by every DynamodbConfig in the process. Keyed by the
+# resource they were built from, which the client registry hands out per
+# credentials and thread.
+_tables = {}
 
 
 class DynamodbConfig:
@@ -10,18 +15,24 @@ class DynamodbConfig:
         Handles configuration in DynamoDB for cloudlift
     """
     def __init__(self, table_name, kv_pairs):
-        session = boto3.session.Session()
-        self.dynamodb = session.resource('dynamodb')
         self.kv_pairs = kv_pairs
         self.table_name = table_name
-        self.table = self._get_table()
+
+    @property
+    def dynamodb(self):
+        return get_resource('dynamodb')
+
+    @property
+    def table(self):
+        return self._get_table()
 
     def get_config_in_db(self):
         '''
             Get configuration from DynamoDB
         '''
         try:
-            configuration_response = self.table.get_item(
+            configuration_response = self._call_table(
+                'get_item',
                 Key={k: v for k, v in self.kv_pairs},
                 ConsistentRead=True,
                 AttributesToGet=[
@@ -40,7 +51,8 @@ class DynamodbConfig:
         '''
         self._validate_changes(config)
         try:
-            configuration_response = self.table.update_item(
+            configuration_response = self._call_table(
+                'update_item',
                 TableName=self.table_name,
                 Key={k: v for k, v in self.kv_pairs},
                 UpdateExpression='SET configuration = :configuration',
@@ -54,22 +66,43 @@ class DynamodbConfig:
             raise UnrecoverableException("Unable to store service configuration in DynamoDB.")
 
     def _get_table(self):
-        dynamodb_client = boto3.session.Session().client('dynamodb')
-        table_names = dynamodb_client.list_tables()['TableNames']
-        if self.table_name not in table_names:
-            log_warning("Could not find configuration table, creating one..")
-            self._create_configuration_table()
-        return self.dynamodb.Table(self.table_name)
+        dynamodb = self.dynamodb
+        key = (self.table_name, id(dynamodb))
+        if key not in _tables:
+            # The resource is kept alongside the table so its id cannot be
+            # reused by another resource while the entry exists.
+            _tables[key] = (dynamodb, dynamodb.Table(self.table_name))
+        return _tables[key][1]
+
+    def _call_table(self, method, **kwargs):
+        '''
+            Calls the table assuming it exists, and creates it on first use
+            when DynamoDB reports that it does not
+        '''
+        try:
+            return getattr(self.table, method)(**kwargs)
+        except ClientError as client_error:
+            if client_error.response['Error']['Code'] != 'ResourceNotFoundException':
+                raise
+        log_warning("Could not find configuration table, creating one..")
+        self._create_configuration_table()
+        return getattr(self.table, method)(**kwargs)
 
     def _create_configuration_table(self):
         key_schema = [{'AttributeName': self.kv_pairs[0][0], 'KeyType': 'HASH'}]
         key_schema.extend([{'AttributeName': key, 'KeyType': 'RANGE'} for key, _ in self.kv_pairs[1:]])
-        self.dynamodb.create_table(
-            TableName=self.table_name,
-            KeySchema=key_schema,
-            AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'} for key, _ in self.kv_pairs],
-            BillingMode='PAY_PER_REQUEST'
-        )
+        try:
+            self.dynamodb.create_table(
+                TableName=self.table_name,
+                KeySchema=key_schema,
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'} for key, _ in self.kv_pairs],
+                BillingMode='PAY_PER_REQUEST'
+            )
+        except ClientError as client_error:
+            # Another cloudlift run created it in the meantime
+            if client_error.response['Error']['Code'] != 'ResourceInUseException':
+                raise
+        self.table.wait_until_exists()
         log_bold("{} table created!".format(self.table_name))
 
     def _validate_changes(self, config):
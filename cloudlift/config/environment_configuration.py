@@ -32,7 +32,8 @@ class EnvironmentConfiguration(DynamodbConfig):
         self._edit_config()
 
     def get_all_environments(self):
-        response = self.table.scan(
+        response = self._call_table(
+            'scan',
             TableName=ENVIRONMENT_CONFIGURATION_TABLE,
             AttributesToGet=[
                 'environment',
@@ -51,7 +52,8 @@ class EnvironmentConfiguration(DynamodbConfig):
             raise UnrecoverableException("Environment configuration not found. Does this environment exist?")
 
     def _env_config_exists(self):
-        response = self.table.get_item(
+        response = self._call_table(
+            'get_item',
             Key={
                 'environment': self.environment,
             }
@@ -195,7 +197,9 @@ class EnvironmentConfiguration(DynamodbConfig):
         '''
             Set configuration in DynamoDB
         '''
+        from cloudlift.config.region import clear_environment_config_cache
         self.set_config_in_db(config)
+        clear_environment_config_cache(self.environment)
 
     def _validate_changes(self, configuration):
         log_bold("\nValidating schema..")
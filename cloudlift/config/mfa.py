@@ -1,11 +1,10 @@
 import os
 
 import botocore
-from boto3 import client
-from boto3.session import Session
 from cloudlift.exceptions import UnrecoverableException
 
-from cloudlift.config import get_account_id
+from cloudlift.config import get_account_id, get_username
+from cloudlift.config.client_registry import get_client, get_session
 from cloudlift.config.logging import log_bold, log_err
 
 
@@ -17,7 +16,7 @@ def do_mfa_login(mfa_code=None, region='ap-south-1'):
 
     log_bold("Using credentials for " + username)
     try:
-        session_params = client('sts').get_session_token(
+        session_params = get_client('sts').get_session_token(
             DurationSeconds=900,
             SerialNumber=mfa_arn,
             TokenCode=str(mfa_code)
@@ -40,21 +39,16 @@ def get_mfa_session(mfa_code=None, region='ap-south-1'):
 
     log_bold("Using credentials for " + username)
     try:
-        session_params = client('sts').get_session_token(
+        session_params = get_client('sts').get_session_token(
             DurationSeconds=900,
             SerialNumber=mfa_arn,
             TokenCode=str(mfa_code)
         )
         credentials = session_params['Credentials']
-        return Session(
-                aws_access_key_id=credentials['AccessKeyId'],
-                aws_secret_access_key=credentials['SecretAccessKey'],
-                aws_session_token=credentials['SessionToken'],
-                region_name=region
-        )
+        return get_session(region=region, credentials={
+            'aws_access_key_id': credentials['AccessKeyId'],
+            'aws_secret_access_key': credentials['SecretAccessKey'],
+            'aws_session_token': credentials['SessionToken'],
+        })
     except botocore.exceptions.ClientError as client_error:
         raise UnrecoverableException(str(client_error))
-
-
-def get_username():
-    return client('sts').get_caller_identity()['Arn'].split("user/")[1]
@@ -1,26 +1,60 @@
-import boto3
+import json
+
 from cloudlift.exceptions import UnrecoverableException
 
-from cloudlift.config import EnvironmentConfiguration
+from cloudlift.config import DecimalEncoder, EnvironmentConfiguration, get_account_id
+from cloudlift.config.client_registry import get_client, get_resource, get_session
+from cloudlift.utils import disk_cache
 
-local_cache = {}
+# Environment configuration documents keyed by environment name. Loading
+# one costs a DynamoDB round trip, so it happens once per process (and at
+# most once per disk cache TTL across runs) unless the configuration is
+# written in between.
+_environment_configs = {}
 
 
-def get_region_for_environment(environment):
-    global local_cache
-    if 'region' not in local_cache:
-        if environment:
-            local_cache['region'] = EnvironmentConfiguration(environment).get_config()[environment]['region']
+def get_environment_config(environment):
+    if environment not in _environment_configs:
+        if disk_cache.enabled():
+            _environment_configs[environment] = disk_cache.cached(
+                'environment_config', _environment_cache_key(environment),
+                lambda: _fetch_environment_config(environment)
+            )
         else:
-            # Get the region from the AWS credentials used to execute cloudlift
-            aws_session = boto3.session.Session()
-            local_cache['region'] = aws_session.region_name
+            _environment_configs[environment] = _fetch_environment_config(environment)
+    return _environment_configs[environment]
+
+
+def clear_environment_config_cache(environment=None):
+    if environment is None:
+        _environment_configs.clear()
+        disk_cache.clear('environment_config')
+    else:
+        _environment_configs.pop(environment, None)
+        disk_cache.clear('environment_config', key_filter=lambda key: key.endswith('/' + environment))
+
+
+def _environment_cache_key(environment):
+    return '{}/{}'.format(get_account_id(), environment)
+
 
-    return local_cache['region']
+def _fetch_environment_config(environment):
+    config = EnvironmentConfiguration(environment).get_config()
+    if not config or environment not in config:
+        raise UnrecoverableException("Environment configuration not found. Does this environment exist?")
+    # Normalise DynamoDB decimals so that fresh and cached documents look alike
+    return json.loads(json.dumps(config[environment], cls=DecimalEncoder))
+
+
+def get_region_for_environment(environment):
+    if environment:
+        return get_environment_config(environment)['region']
+    # Get the region from the AWS credentials used to execute cloudlift
+    return get_session().region_name
 
 
 def get_environment_level_alb_listener(environment):
-    env_spec = EnvironmentConfiguration(environment).get_config()[environment]
+    env_spec = get_environment_config(environment)
     if 'loadbalancer_listener_arn' not in env_spec:
         raise UnrecoverableException('environment level ALB not defined. ' +
                                      'Please run update_environment and set "loadbalancer_listener_arn".')
@@ -29,44 +63,26 @@ def get_environment_level_alb_listener(environment):
 
 
 def get_service_templates_bucket_for_environment(environment):
-    global local_cache
-
-    if 'bucket' not in local_cache:
-        config = EnvironmentConfiguration(environment).get_config()
-
-        if 'service_templates_bucket' not in config[environment]:
-            return None
-
-        local_cache['bucket'] = config[environment]['service_templates_bucket']
-
-    return local_cache['bucket']
+    return get_environment_config(environment).get('service_templates_bucket')
 
 
 def get_client_for(resource, environment):
-    return boto3.session.Session(
-        region_name=get_region_for_environment(environment)
-    ).client(resource)
+    return get_client(resource, get_region_for_environment(environment))
 
 
 def get_resource_for(resource, environment):
-    return boto3.session.Session(
-        region_name=get_region_for_environment(environment)
-    ).resource(resource)
+    return get_resource(resource, get_region_for_environment(environment))
 
 
 def get_notifications_arn_for_environment(environment):
     try:
-        return EnvironmentConfiguration(
-            environment
-        ).get_config()[environment]['environment']["notifications_arn"]
+        return get_environment_config(environment)['environment']["notifications_arn"]
     except KeyError:
         raise UnrecoverableException("Unable to find notifications arn for {environment}".format(**locals()))
 
 
 def get_ssl_certification_for_environment(environment):
     try:
-        return EnvironmentConfiguration(
-            environment
-        ).get_config()[environment]['environment']["ssl_certificate_arn"]
+        return get_environment_config(environment)['environment']["ssl_certificate_arn"]
     except KeyError:
         raise UnrecoverableException("Unable to find ssl certificate for {environment}".format(**locals()))
@@ -274,6 +274,10 @@ class ServiceConfiguration(DynamodbConfig):
                             "minimum": 100,
                             "maximum": 200
                         },
+                        "slow_deployment_alarm_seconds": {
+                            "type": "number",
+                            "minimum": 60
+                        },
                     },
                     "required": ["maximum_percent"]
                 },
@@ -292,6 +296,10 @@ class ServiceConfiguration(DynamodbConfig):
                         }
                     }
                 },
+                "cpu_architecture": {
+                    "type": "string",
+                    "enum": ["x86_64", "arm64"]
+                },
                 "command": {
                     "oneOf": [
                         {"type": "string"},
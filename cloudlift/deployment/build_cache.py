@@ -0,0 +1,68 @@
+'''
+BuildKit registry cache kept in a companion ECR repository of the image
+repository. Each branch and Dockerfile gets its own cache tag, and builds
+on other branches fall back to the cache of the default branch.
+'''
+import os
+import re
+from collections import namedtuple
+
+CACHE_REPOSITORY_SUFFIX = '-build-cache'
+DEFAULT_CACHE_BRANCH = os.environ.get('CLOUDLIFT_CACHE_DEFAULT_BRANCH', 'master')
+# ECR tags are limited to 128 characters
+MAX_TAG_LENGTH = 128
+
+# Steps of a `--progress=plain` build log, e.g. "#7 [build 2/5] RUN make"
+STEP_PATTERN = re.compile(r'^#(\d+) \[[^\]]*\d+/\d+\] ')
+CACHED_PATTERN = re.compile(r'^#(\d+) CACHED\s*$')
+
+BuildCacheStats = namedtuple('BuildCacheStats', ['cached', 'total'])
+
+
+def cache_repository_name(repo_name):
+    return repo_name + CACHE_REPOSITORY_SUFFIX
+
+
+def cache_tag(branch, dockerfile=None):
+    '''
+        Tag of the cache for builds of the Dockerfile on the branch
+    '''
+    tag = _slug(branch or DEFAULT_CACHE_BRANCH) + '-' + _slug(os.path.basename(dockerfile or 'Dockerfile'))
+    return tag[:MAX_TAG_LENGTH]
+
+
+def cache_options(cache_repo_path, branch, dockerfile=None):
+    '''
+        buildx options importing the caches of the branch and of the default
+        branch, and exporting the cache of the branch
+    '''
+    cache_ref = '{}:{}'.format(cache_repo_path, cache_tag(branch, dockerfile))
+    default_cache_ref = '{}:{}'.format(cache_repo_path, cache_tag(DEFAULT_CACHE_BRANCH, dockerfile))
+    options = ['--cache-from type=registry,ref={}'.format(cache_ref)]
+    if default_cache_ref != cache_ref:
+        options.append('--cache-from type=registry,ref={}'.format(default_cache_ref))
+    # ECR only accepts caches stored as an image manifest
+    options.append('--cache-to type=registry,ref={},mode=max,image-manifest=true,oci-mediatypes=true'.format(
+        cache_ref))
+    return options
+
+
+def parse_cache_stats(lines):
+    '''
+        Counts the build steps of a plain progress build log and how many
+        of them were served from the cache
+    '''
+    steps, cached = set(), set()
+    for line in lines:
+        step = STEP_PATTERN.match(line)
+        if step:
+            steps.add(step.group(1))
+            continue
+        hit = CACHED_PATTERN.match(line)
+        if hit:
+            cached.add(hit.group(1))
+    return BuildCacheStats(len(cached & steps), len(steps))
+
+
+def _slug(value):
+    return re.sub(r'[^a-zA-Z0-9_.-]+', '-', value).strip('-').lower()
@@ -0,0 +1,188 @@
+'''
+Content hash of a docker build: the files docker would send as build
+context (honoring .dockerignore), the Dockerfile and the build args. Two
+builds with the same hash produce the same image, so an image tagged with
+the hash can be reused instead of building again.
+'''
+import hashlib
+import os
+import re
+import stat
+import tarfile
+
+DEFAULT_DOCKER_FILE = "Dockerfile"
+# Name in the build context of a Dockerfile that is outside of it
+OUTSIDE_DOCKERFILE_NAME = '.dockerfile.cloudlift'
+CONTEXT_TAG_PREFIX = 'ctx-'
+# Hex digits of the digest kept in the tag
+CONTEXT_TAG_DIGEST_LENGTH = 32
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class DockerIgnore(object):
+    '''
+        The patterns of a .dockerignore file. As in docker, the last pattern
+        matching a path decides, patterns starting with ! re-include paths,
+        and excluding a directory excludes everything under it.
+    '''
+
+    def __init__(self, lines):
+        self.patterns = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            include = line.startswith('!')
+            pattern = os.path.normpath(line[1:].strip() if include else line).lstrip('/')
+            if pattern == '.':
+                continue
+            self.patterns.append((_pattern_regex(pattern), include))
+
+    @classmethod
+    def load(cls, working_dir, dockerfile=None):
+        # A <Dockerfile>.dockerignore next to the Dockerfile takes precedence
+        candidates = [os.path.join(working_dir, '.dockerignore')]
+        if dockerfile:
+            candidates.insert(0, dockerfile + '.dockerignore')
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                with open(candidate) as ignore_file:
+                    return cls(ignore_file.read().splitlines())
+        return cls([])
+
+    @property
+    def has_exceptions(self):
+        return any(include for _, include in self.patterns)
+
+    def excludes(self, path):
+        '''
+            Whether the path, relative to the context and using / as
+            separator, is left out of the build context
+        '''
+        parents = _parents(path)
+        excluded = False
+        for regex, include in self.patterns:
+            if any(regex.match(candidate) for candidate in parents):
+                excluded = not include
+        return excluded
+
+
+def context_digest(working_dir='.', dockerfile=None, build_args=None, platforms=None):
+    '''
+        Hex sha256 of the build context, the Dockerfile, the build args and
+        the target platforms, None for a plain docker build
+    '''
+    dockerfile_path = dockerfile or os.path.join(working_dir, DEFAULT_DOCKER_FILE)
+    digest = hashlib.sha256()
+    _update(digest, 'dockerfile', os.path.relpath(dockerfile_path, working_dir))
+    digest.update(_file_digest(dockerfile_path))
+    for key, value in sorted((build_args or {}).items()):
+        _update(digest, 'build-arg', '{}={}'.format(key, value))
+    for platform in sorted(platforms or []):
+        _update(digest, 'platform', platform)
+    for relative_path, full_path in _context_files(working_dir, DockerIgnore.load(working_dir, dockerfile)):
+        mode = os.lstat(full_path).st_mode
+        _update(digest, 'file', relative_path, oct(mode & 0o111))
+        if stat.S_ISLNK(mode):
+            _update(digest, 'link', os.readlink(full_path))
+        else:
+            digest.update(_file_digest(full_path))
+    return digest.hexdigest()
+
+
+def context_tag(working_dir='.', dockerfile=None, build_args=None, platforms=None):
+    return CONTEXT_TAG_PREFIX + \
+        context_digest(working_dir, dockerfile, build_args, platforms)[:CONTEXT_TAG_DIGEST_LENGTH]
+
+
+def write_context_tar(fileobj, working_dir='.', dockerfile=None):
+    '''
+        Writes the build context as a tar archive to fileobj, the way the
+        docker CLI sends it to the daemon, and returns the path of the
+        Dockerfile inside the archive
+    '''
+    dockerfile_path = dockerfile or os.path.join(working_dir, DEFAULT_DOCKER_FILE)
+    dockerfile_name = os.path.relpath(dockerfile_path, working_dir).replace(os.sep, '/')
+    if dockerfile_name.startswith('../'):
+        dockerfile_name = OUTSIDE_DOCKERFILE_NAME
+    archived = set()
+    with tarfile.open(fileobj=fileobj, mode='w') as archive:
+        for relative_path, full_path in _context_files(working_dir, DockerIgnore.load(working_dir, dockerfile)):
+            archive.add(full_path, arcname=relative_path, recursive=False)
+            archived.add(relative_path)
+        # The Dockerfile is sent even when .dockerignore leaves it out
+        if dockerfile_name not in archived:
+            archive.add(dockerfile_path, arcname=dockerfile_name, recursive=False)
+    return dockerfile_name
+
+
+def _context_files(working_dir, dockerignore):
+    '''
+        Yields (relative path, full path) of every file in the context, in a
+        stable order
+    '''
+    prune = not dockerignore.has_exceptions
+    for root, dirs, files in os.walk(working_dir):
+        relative_root = os.path.relpath(root, working_dir).replace(os.sep, '/')
+        relative_root = '' if relative_root == '.' else relative_root + '/'
+        dirs.sort()
+        if prune:
+            # Nothing below an excluded directory can be included again
+            dirs[:] = [name for name in dirs if not dockerignore.excludes(relative_root + name)]
+        for name in sorted(files + [name for name in dirs if os.path.islink(os.path.join(root, name))]):
+            relative_path = relative_root + name
+            if not dockerignore.excludes(relative_path):
+                yield relative_path, os.path.join(root, name)
+
+
+def _file_digest(path):
+    file_digest = hashlib.sha256()
+    with open(path, 'rb') as context_file:
+        for chunk in iter(lambda: context_file.read(READ_CHUNK_SIZE), b''):
+            file_digest.update(chunk)
+    return file_digest.digest()
+
+
+def _update(digest, *fields):
+    for field in fields:
+        digest.update(field.encode('utf-8'))
+        digest.update(b'\0')
+
+
+def _parents(path):
+    parts = path.split('/')
+    return ['/'.join(parts[:index]) for index in range(1, len(parts) + 1)]
+
+
+def _pattern_regex(pattern):
+    regex = ''
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith('**', index):
+            # ** matches any number of directories, including none
+            index += 2
+            if pattern.startswith('/', index):
+                index += 1
+                regex += '(?:.*/)?'
+            else:
+                regex += '.*'
+            continue
+        if char == '*':
+            regex += '[^/]*'
+        elif char == '?':
+            regex += '[^/]'
+        elif char == '[':
+            end = pattern.find(']', index + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                char_class = pattern[index + 1:end]
+                if char_class.startswith('!'):
+                    char_class = '^' + char_class[1:]
+                regex += '[' + char_class + ']'
+                index = end
+        else:
+            regex += re.escape(char)
+        index += 1
+    return re.compile(regex + '$')
@@ -1,11 +1,11 @@
 import sys
 import uuid
-from time import sleep
 
 import click
 
 from cloudlift.config.logging import log, log_bold, log_err
 from cloudlift.deployment.cloud_formation_stack import prepare_stack_options_for_template
+from cloudlift.utils.poller import poll
 
 
 def create_change_set(client, service_template_body, stack_name,
@@ -24,18 +24,14 @@ def create_change_set(client, service_template_body, stack_name,
         **options,
     )
     log("Changeset creation initiated. Checking the progress...")
-    change_set = client.describe_change_set(
-        ChangeSetName=create_change_set_res['Id']
+    change_set = poll(
+        'create_change_set',
+        lambda: client.describe_change_set(ChangeSetName=create_change_set_res['Id']),
+        lambda change_set: change_set['Status'] not in ['CREATE_PENDING', 'CREATE_IN_PROGRESS'],
+        _print_change_set_status,
+        initial_interval=0.5,
+        max_interval=5,
     )
-    while change_set['Status'] in ['CREATE_PENDING', 'CREATE_IN_PROGRESS']:
-        sleep(1)
-        status_string = '\x1b[2K\rChecking changeset status.  Status: ' + \
-                        change_set['Status']
-        sys.stdout.write(status_string)
-        sys.stdout.flush()
-        change_set = client.describe_change_set(
-            ChangeSetName=create_change_set_res['Id']
-        )
     status_string = '\x1b[2K\rChecking changeset status..  Status: ' + \
                     change_set['Status']+'\n'
     sys.stdout.write(status_string)
@@ -58,6 +54,13 @@ def create_change_set(client, service_template_body, stack_name,
         log_bold("Done. Bye!")
 
 
+def _print_change_set_status(change_set):
+    status_string = '\x1b[2K\rChecking changeset status.  Status: ' + \
+                    change_set['Status']
+    sys.stdout.write(status_string)
+    sys.stdout.flush()
+
+
 def _print_changes(change_set):
     for change in change_set['Changes']:
         resource_change = change['ResourceChange']
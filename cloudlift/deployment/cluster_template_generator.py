@@ -21,8 +21,9 @@ from troposphere.rds import DBSubnetGroup
 from troposphere import Tags
 
 from cloudlift.config import DecimalEncoder
-from cloudlift.config import get_client_for, get_region_for_environment
+from cloudlift.config import get_account_id, get_client_for, get_region_for_environment
 from cloudlift.deployment.template_generator import TemplateGenerator
+from cloudlift.utils import disk_cache
 from cloudlift.version import VERSION
 
 
@@ -55,6 +56,14 @@ class ClusterTemplateGenerator(TemplateGenerator):
         return to_yaml(json.dumps(self.template.to_dict(), cls=DecimalEncoder))
 
     def _get_availability_zones(self):
+        # Zone names are mapped per account, so the account is part of the key
+        return disk_cache.cached(
+            'availability_zones',
+            '{}/{}'.format(get_account_id(), get_region_for_environment(self.env)),
+            self._fetch_availability_zones
+        )
+
+    def _fetch_availability_zones(self):
         client = get_client_for('ec2', self.env)
         aws_azs = client.describe_availability_zones()['AvailabilityZones']
         return [
@@ -597,6 +606,9 @@ for cluster for 15 minutes.',
     def _get_ami_id(self):
         if self.ami_id:
             return self.ami_id
+        return disk_cache.cached('ami_id', get_region_for_environment(self.env), self._fetch_ami_id)
+
+    def _fetch_ami_id(self):
         # Pick from https://docs.aws.amazon.com/AmazonECS/latest/developerguide/al2ami.html
         ssm_client = get_client_for('ssm', self.env)
         ami_response = ssm_client.get_parameter(
@@ -0,0 +1,25 @@
+CPU_ARCHITECTURE_X86_64 = 'x86_64'
+CPU_ARCHITECTURE_ARM64 = 'arm64'
+CPU_ARCHITECTURES = [CPU_ARCHITECTURE_X86_64, CPU_ARCHITECTURE_ARM64]
+
+# docker build platform of each architecture
+DOCKER_PLATFORMS = {
+    CPU_ARCHITECTURE_X86_64: 'linux/amd64',
+    CPU_ARCHITECTURE_ARM64: 'linux/arm64',
+}
+
+
+def get_cpu_architecture(ecs_service_configuration):
+    return ecs_service_configuration.get('cpu_architecture', CPU_ARCHITECTURE_X86_64)
+
+
+def get_image_platforms(services_configuration):
+    '''
+        Platforms the image shared by the services has to be built for, None
+        when all of them run on x86_64, the only one a plain docker build
+        targets
+    '''
+    architectures = {get_cpu_architecture(configuration) for configuration in services_configuration.values()}
+    if architectures <= {CPU_ARCHITECTURE_X86_64}:
+        return None
+    return [DOCKER_PLATFORMS[architecture] for architecture in CPU_ARCHITECTURES if architecture in architectures]
@@ -1,21 +1,24 @@
 import os
-from datetime import datetime
 from glob import glob
 from pprint import pformat
-from time import sleep, time
+from time import time
 
-import boto3
 from deepdiff import DeepDiff
 
 from cloudlift.config import ParameterStore
 from cloudlift.config import secrets_manager
+from cloudlift.config.deployment_index import DeploymentIndex
 from cloudlift.config.logging import log_bold, log_err, log_intent, log_with_color, log_warning, log
-from cloudlift.deployment.ecs import DeployAction
+from cloudlift.deployment.deployment_context import DeploymentContext
 from cloudlift.deployment.ecs import EcsClient
 from cloudlift.deployment.ecs import EcsTaskDefinition
-from cloudlift.deployment.task_definition_builder import TaskDefinitionBuilder
+from cloudlift.deployment.task_definition_builder import FINGERPRINT_TAG, TaskDefinitionBuilder
 from cloudlift.exceptions import UnrecoverableException
+from cloudlift.utils.poller import PollTimeout, poll
 
+ROLLOUT_IN_PROGRESS = 'IN_PROGRESS'
+ROLLOUT_COMPLETED = 'COMPLETED'
+ROLLOUT_FAILED = 'FAILED'
 
 
 def find_essential_container(container_definitions):
@@ -25,57 +28,69 @@ def find_essential_container(container_definitions):
     raise UnrecoverableException('no essential containers found')
 
 
-def revert_deployment(cluster_name, ecs_service_name, color, timeout_seconds, deployment_identifier, region, **kwargs):
-    client = EcsClient(None, None, region)
-    deployment = DeployAction(client, cluster_name, ecs_service_name)
-    previous_task_defn = deployment.get_task_definition_by_deployment_identifier(deployment.service,
-                                                                                 deployment_identifier)
-    deploy_task_definition(client, previous_task_defn, cluster_name, ecs_service_name, color, timeout_seconds, 'Revert')
+def revert_deployment(cluster_name, ecs_service_name, color, timeout_seconds, deployment_identifier, region,
+                      metrics, monitor=None, **kwargs):
+    context = DeploymentContext(EcsClient(None, None, region), cluster_name, ecs_service_name, metrics)
+    previous_task_defn = context.deployment.get_task_definition_by_deployment_identifier(context.service,
+                                                                                         deployment_identifier)
+    deploy_task_definition(context, previous_task_defn, color, timeout_seconds, 'Revert', monitor)
 
 
 def deploy_new_version(cluster_name, ecs_service_name, ecs_service_logical_name, deployment_identifier,
                        service_name, sample_env_file_path,
                        timeout_seconds, env_name, secrets_name, service_configuration, region, ecr_image_uri,
-                       color='white'):
-    client = EcsClient(None, None, region)
+                       metrics, color='white', monitor=None, force=False, ecr_image_digest=None):
+    context = DeploymentContext(EcsClient(None, None, region), cluster_name, ecs_service_name, metrics)
     task_definition = create_new_task_definition(
+        context=context,
         color=color,
         ecr_image_uri=ecr_image_uri,
-        ecs_service_name=ecs_service_name,
         env_name=env_name,
         sample_env_file_path=sample_env_file_path,
         secrets_name=secrets_name,
         service_name=service_name,
-        client=client,
-        cluster_name=cluster_name,
         deployment_identifier=deployment_identifier,
         ecs_service_logical_name=ecs_service_logical_name,
         service_configuration=service_configuration,
         region=region,
+        force=force,
+        ecr_image_digest=ecr_image_digest,
     )
-    deploy_task_definition(client, task_definition, cluster_name, ecs_service_name, color, timeout_seconds, 'Deploy')
+    if task_definition is None:
+        return
+    deploy_task_definition(context, task_definition, color, timeout_seconds, 'Deploy', monitor)
 
 
-def deploy_task_definition(client, task_definition, cluster_name, ecs_service_name, color, timeout_secs, action_name):
-    deployment = DeployAction(client, cluster_name, ecs_service_name)
+def deploy_task_definition(context, task_definition, color, timeout_secs, action_name, monitor=None):
+    deployment = context.deployment
+    ecs_service_name = context.ecs_service_name
     log_with_color(f"Starting {action_name} for {ecs_service_name}", color)
     if deployment.service.desired_count == 0:
         desired_count = 1
     else:
         desired_count = deployment.service.desired_count
     deployment.service.set_desired_count(desired_count)
-    deployment_succeeded = deploy_and_wait(deployment, task_definition, color, timeout_secs)
+    deployment_succeeded = deploy_and_wait(deployment, task_definition, color, timeout_secs, monitor,
+                                           context.metrics)
     if not deployment_succeeded:
-        record_deployment_failure_metric(deployment.cluster_name, deployment.service_name)
+        record_deployment_failure_metric(context.metrics, deployment.service_name)
         raise UnrecoverableException(ecs_service_name + f" {action_name} failed.")
     log_with_color(f"{ecs_service_name} {action_name}: Completed successfully.", color)
 
 
-def create_new_task_definition(color, ecr_image_uri, ecs_service_name, env_name,
-                               sample_env_file_path, secrets_name, service_name, client, cluster_name,
-                               deployment_identifier, ecs_service_logical_name, service_configuration, region):
-    deployment = DeployAction(client, cluster_name, ecs_service_name)
-    task_definition = deployment.get_current_task_definition(deployment.service)
+def create_new_task_definition(context, color, ecr_image_uri, env_name,
+                               sample_env_file_path, secrets_name, service_name,
+                               deployment_identifier, ecs_service_logical_name, service_configuration, region,
+                               force=False, ecr_image_digest=None):
+    '''
+        Registers the task definition for the deployment. Returns None,
+        without registering anything, when it matches the running one and
+        force is not set. ecr_image_digest is the digest of the image the
+        ecr_image_uri points to, so that a tag moved to another image is
+        deployed again.
+    '''
+    ecs_service_name = context.ecs_service_name
+    task_definition = context.current_task_definition
     essential_container = find_essential_container(task_definition[u'containerDefinitions'])
     container_configurations = build_config(env_name, service_name, ecs_service_logical_name, sample_env_file_path,
                                             essential_container,
@@ -95,16 +110,45 @@ def create_new_task_definition(color, ecr_image_uri, ecs_service_name, env_name,
         ecr_image_uri=ecr_image_uri,
         fallback_task_role=task_definition.role_arn,
         fallback_task_execution_role=task_definition.execution_role_arn,
-        deployment_identifier=deployment_identifier
+        deployment_identifier=deployment_identifier,
+        image_digest=ecr_image_digest
     ))
-    return deployment.update_task_definition(updated_task_definition)
-
-
-def deploy_and_wait(deployment, new_task_definition, color, timeout_seconds):
-    existing_events = fetch_events(deployment.get_service())
+    if not force and is_unchanged(context.service, task_definition, updated_task_definition):
+        log_with_color(ecs_service_name + " No change in task definition, skipping deployment", color)
+        if deployment_identifier:
+            # Reverts to this deployment find the running revision
+            DeploymentIndex(task_definition.family, deployment_identifier).set_task_definition_arn(
+                task_definition.arn)
+        return None
+    with context.metrics.phase('TaskDefinitionRegister', ServiceName=ecs_service_name):
+        new_task_definition = context.deployment.update_task_definition(updated_task_definition)
+    if deployment_identifier:
+        DeploymentIndex(new_task_definition.family, deployment_identifier).set_task_definition_arn(
+            new_task_definition.arn)
+    return new_task_definition
+
+
+def is_unchanged(service, current_task_definition, new_task_definition):
+    '''
+        Whether the service already runs, steadily, a task definition with
+        the fingerprint of the new one
+    '''
+    fingerprint = new_task_definition.tags.get(FINGERPRINT_TAG)
+    return fingerprint is not None and fingerprint == current_task_definition.tags.get(FINGERPRINT_TAG) \
+        and service.desired_count > 0 and is_deployed(service)
+
+
+def deploy_and_wait(deployment, new_task_definition, color, timeout_seconds, monitor=None, metrics=None):
+    # Events of the service as described at the start of the deployment
+    seen_event_ids = {_event_id(event) for event in deployment.service.get(u'events')}
     deploy_end_time = time() + timeout_seconds
-    deployment.deploy(new_task_definition)
-    return wait_for_finish(deployment, existing_events, color, deploy_end_time)
+    started_at = time()
+    # The deployment created by the update is PRIMARY in its response
+    primary_deployment = deployment.deploy(new_task_definition).primary_deployment
+    if metrics is not None:
+        metrics.record_duration('UpdateService', time() - started_at, ServiceName=deployment.service_name)
+    return wait_for_finish(deployment, seen_event_ids, color, deploy_end_time, monitor,
+                           primary_deployment.get('id') if primary_deployment else None, metrics)
 
 
 def get_env_sample_file_name(namespace):
@@ -234,40 +278,103 @@ def read_config(file_content):
     return config
 
 
-def wait_for_finish(action, existing_events, color, deploy_end_time):
-    while time() <= deploy_end_time:
-        service = action.get_service()
-        existing_events = fetch_and_print_new_events(service, existing_events, color)
-        if is_deployed(service):
-            return True
-        sleep(5)
-
-    log_err("Deployment timed out!")
-    return False
-
-
-def record_deployment_failure_metric(cluster_name, service_name):
-    cloudwatch_client = boto3.client('cloudwatch')
-    cloudwatch_client.put_metric_data(
-        Namespace='ECS/DeploymentMetrics',
-        MetricData=[
-            {
-                "MetricName": 'FailedCloudliftDeployments',
-                "Value": 1,
-                "Timestamp": datetime.utcnow(),
-                "Dimensions": [
-                    {
-                        'Name': 'ClusterName',
-                        'Value': cluster_name
-                    },
-                    {
-                        'Name': 'ServiceName',
-                        'Value': service_name
-                    }
-                ]
-            }
-        ]
-    )
+def wait_for_finish(action, seen_event_ids, color, deploy_end_time, monitor=None, deployment_id=None,
+                    metrics=None):
+    '''
+        Waits for the deployment deployment_id of the service, or its
+        PRIMARY deployment, to complete or fail, see rollout_state. With a
+        monitor the service is described by the monitor's batched poll,
+        otherwise it is polled directly. Records in metrics how long the
+        first task of the deployment took to run and the deployment to
+        complete.
+    '''
+    watch = monitor.watch(action.service_name) if monitor is not None else None
+    states = []
+    started_at = time()
+    first_task_running = []
+
+    def fetch():
+        if watch is None:
+            return action.get_service()
+        # Blocks until the monitor has a newer description
+        return watch.next(timeout=deploy_end_time - time())
+
+    def deployed(service):
+        if service is None:
+            return False
+        fetch_and_print_new_events(service, seen_event_ids, color)
+        states.append(rollout_state(service, deployment_id))
+        if metrics is not None:
+            deployment = service.get_deployment(deployment_id) if deployment_id else service.primary_deployment
+            if not first_task_running and deployment and deployment.get('runningCount'):
+                first_task_running.append(time() - started_at)
+                metrics.record_duration('FirstTaskRunning', first_task_running[0], ServiceName=action.service_name)
+            if states[-1] == ROLLOUT_COMPLETED:
+                metrics.record_duration('SteadyState', time() - started_at, ServiceName=action.service_name)
+        return states[-1] != ROLLOUT_IN_PROGRESS
+
+    intervals = dict(initial_interval=2, max_interval=10) if watch is None else \
+        dict(initial_interval=0, max_interval=0, jitter=0)
+    try:
+        poll('wait_for_finish', fetch, deployed, timeout=max(deploy_end_time - time(), 0), **intervals)
+    except PollTimeout:
+        log_err("Deployment timed out!")
+        return False
+    finally:
+        if watch is not None:
+            monitor.unwatch(action.service_name)
+    if states[-1] == ROLLOUT_FAILED:
+        log_err("Deployment failed!")
+        print_stopped_task_reasons(action, deployment_id, color)
+        return False
+    return True
+
+
+def rollout_state(service, deployment_id=None):
+    '''
+        State of the deployment deployment_id of the service, or of its
+        PRIMARY deployment. It fails when ECS marks it FAILED, e.g. through
+        the deployment circuit breaker, or when another deployment replaced
+        it, e.g. the rollback of the circuit breaker. Failed tasks alone do
+        not fail it, ECS keeps rolling it forward until then. It
+        completes once ECS reports it reached a steady state. Deployments
+        without a rolloutState complete when is_deployed.
+    '''
+    deployment = service.get_deployment(deployment_id) if deployment_id else service.primary_deployment
+    if deployment is None or deployment.get('rolloutState') is None:
+        if deployment is None and deployment_id:
+            return ROLLOUT_FAILED
+        return ROLLOUT_COMPLETED if is_deployed(service) else ROLLOUT_IN_PROGRESS
+    if deployment['rolloutState'] == ROLLOUT_FAILED:
+        return ROLLOUT_FAILED
+    if deployment['rolloutState'] == ROLLOUT_COMPLETED:
+        return ROLLOUT_COMPLETED
+    return ROLLOUT_IN_PROGRESS if deployment.get('status') == 'PRIMARY' else ROLLOUT_FAILED
+
+
+def print_stopped_task_reasons(action, deployment_id, color):
+    '''
+        Prints why the stopped tasks of the deployment stopped, once per
+        distinct reason
+    '''
+    if not deployment_id:
+        return
+    reasons = {}
+    for task in action.get_stopped_tasks(deployment_id):
+        reason = task.get('stoppedReason', 'unknown reason')
+        container_reasons = ['{}: {}'.format(container['name'], container.get('reason') or
+                                             'exit code {}'.format(container.get('exitCode')))
+                             for container in task.get('containers', [])
+                             if container.get('reason') or container.get('exitCode')]
+        if container_reasons:
+            reason += ' ({})'.format(', '.join(container_reasons))
+        reasons[reason] = reasons.get(reason, 0) + 1
+    for reason, count in reasons.items():
+        log_with_color("{} stopped task(s): {}".format(count, reason), color)
+
+
+def record_deployment_failure_metric(metrics, service_name):
+    metrics.record('FailedCloudliftDeployments', 1, ServiceName=service_name)
 
 
 def is_deployed(service):
@@ -276,16 +383,20 @@ def is_deployed(service):
     return False
 
 
-def fetch_events(service):
-    return sorted(service.get(u'events'), key=lambda k: k['createdAt'])
+def _event_id(event):
+    return event.get('id') or (event['createdAt'], event['message'])
 
 
-def fetch_and_print_new_events(service, existing_events, color):
-    all_events = fetch_events(service)
-    new_events = [evnt for evnt in all_events if evnt not in existing_events]
-    for event in new_events:
+def fetch_and_print_new_events(service, seen_event_ids, color):
+    '''
+        Prints the events of the service not in seen_event_ids, oldest
+        first, and adds them to it
+    '''
+    new_events = [event for event in service.get(u'events') if _event_id(event) not in seen_event_ids]
+    for event in sorted(new_events, key=lambda k: k['createdAt']):
+        seen_event_ids.add(_event_id(event))
         log_with_color(event['message'].replace("(", "").replace(")", "")[8:], color)
-    return all_events
+    return seen_event_ids
 
 
 def print_task_diff(ecs_service_name, diffs, color):
@@ -0,0 +1,35 @@
+from cloudlift.deployment.ecs import DeployAction
+
+
+class DeploymentContext(object):
+    '''
+        State of the deployment of one ECS service, shared by the stages of
+        the deploy: the service is described and its task definition
+        fetched once, and the service is replaced by the response of the
+        update instead of being described again. The stages record their
+        timings in metrics.
+    '''
+
+    def __init__(self, client, cluster_name, ecs_service_name, metrics):
+        self.client = client
+        self.cluster_name = cluster_name
+        self.ecs_service_name = ecs_service_name
+        self.metrics = metrics
+        self._deployment = None
+        self._current_task_definition = None
+
+    @property
+    def deployment(self):
+        if self._deployment is None:
+            self._deployment = DeployAction(self.client, self.cluster_name, self.ecs_service_name)
+        return self._deployment
+
+    @property
+    def service(self):
+        return self.deployment.service
+
+    @property
+    def current_task_definition(self):
+        if self._current_task_definition is None:
+            self._current_task_definition = self.deployment.get_current_task_definition(self.service)
+        return self._current_task_definition
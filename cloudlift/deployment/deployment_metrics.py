@@ -0,0 +1,74 @@
+'''
+Timings of the phases of a deployment, e.g. building the image or reaching
+a steady state, and its failures. They are buffered while the deployment
+runs and sent to CloudWatch together once it ends.
+'''
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from time import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from cloudlift.config.client_registry import get_client
+from cloudlift.config.logging import log_warning
+
+DEPLOYMENT_METRICS_NAMESPACE = 'ECS/DeploymentMetrics'
+
+# Metrics accepted by a single PutMetricData request
+PUT_METRIC_DATA_BATCH_SIZE = 1000
+
+
+class DeploymentMetrics(object):
+    def __init__(self, cluster_name, region):
+        self.cluster_name = cluster_name
+        self.region = region
+        self._metric_data = []
+        self._lock = threading.Lock()
+
+    def record(self, metric_name, value, unit='Count', **dimensions):
+        '''
+            Buffers a data point of metric_name, with the ClusterName
+            dimension and the given ones, e.g. ServiceName
+        '''
+        metric = {
+            "MetricName": metric_name,
+            "Value": value,
+            "Unit": unit,
+            "Timestamp": datetime.utcnow(),
+            "Dimensions": [{'Name': 'ClusterName', 'Value': self.cluster_name}] +
+                          [{'Name': name, 'Value': dimension} for name, dimension in dimensions.items()],
+        }
+        with self._lock:
+            self._metric_data.append(metric)
+
+    def record_duration(self, phase, seconds, **dimensions):
+        self.record(phase + 'Seconds', round(seconds, 3), 'Seconds', **dimensions)
+
+    @contextmanager
+    def phase(self, phase, **dimensions):
+        '''
+            Records how long the block takes as the duration of phase
+        '''
+        started_at = time()
+        try:
+            yield
+        finally:
+            self.record_duration(phase, time() - started_at, **dimensions)
+
+    def publish(self):
+        '''
+            Sends the buffered metrics to CloudWatch. Failing to do so only
+            logs a warning, the deployment itself is done.
+        '''
+        with self._lock:
+            metric_data, self._metric_data = self._metric_data, []
+        if not metric_data:
+            return
+        client = get_client('cloudwatch', self.region)
+        try:
+            for start in range(0, len(metric_data), PUT_METRIC_DATA_BATCH_SIZE):
+                client.put_metric_data(Namespace=DEPLOYMENT_METRICS_NAMESPACE,
+                                       MetricData=metric_data[start:start + PUT_METRIC_DATA_BATCH_SIZE])
+        except (BotoCoreError, ClientError) as error:
+            log_warning("Unable to publish the deployment metrics: {}".format(error))
@@ -0,0 +1,122 @@
+'''
+Central poller for in-flight ECS deployments. Instead of every deploy job
+calling DescribeServices for its own service, the monitor describes all
+watched services of a cluster in batches and hands each job the latest
+description of its service.
+'''
+import threading
+
+from cloudlift.config.logging import log_warning
+from cloudlift.deployment.ecs import EcsService
+from cloudlift.exceptions import UnrecoverableException
+from cloudlift.utils import chunks
+
+# DescribeServices accepts at most 10 services per call
+DESCRIBE_SERVICES_BATCH_SIZE = 10
+POLL_INTERVAL_SECONDS = 5
+
+
+class ServiceWatch(object):
+    '''
+        Latest known state of one watched service
+    '''
+
+    def __init__(self, service_name):
+        self.service_name = service_name
+        self._condition = threading.Condition()
+        self._service = None
+        self._error = None
+        self._version = 0
+        self._seen_version = 0
+
+    def publish(self, service=None, error=None):
+        with self._condition:
+            self._service = service
+            self._error = error
+            self._version += 1
+            self._condition.notify_all()
+
+    def next(self, timeout):
+        '''
+            Waits for a description newer than the last one returned. Returns
+            None when none arrives within timeout seconds.
+        '''
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._version > self._seen_version, timeout=max(timeout, 0)):
+                return None
+            self._seen_version = self._version
+            if self._error is not None:
+                raise UnrecoverableException(self._error)
+            return self._service
+
+
+class DeploymentMonitor(object):
+    '''
+        Polls every watched service of a cluster from a single thread with
+        batched DescribeServices calls
+    '''
+
+    def __init__(self, client, cluster_name, interval=POLL_INTERVAL_SECONDS):
+        self._client = client
+        self._cluster_name = cluster_name
+        self._interval = interval
+        self._watches = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='cloudlift-deployment-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def watch(self, service_name):
+        with self._lock:
+            watch = self._watches[service_name] = ServiceWatch(service_name)
+        # Describe the new service right away rather than at the next tick
+        self._wakeup.set()
+        return watch
+
+    def unwatch(self, service_name):
+        with self._lock:
+            self._watches.pop(service_name, None)
+
+    def poll(self):
+        with self._lock:
+            watches = dict(self._watches)
+        for service_names in chunks(sorted(watches), DESCRIBE_SERVICES_BATCH_SIZE):
+            try:
+                response = self._client.describe_services_batch(self._cluster_name, service_names)
+            except Exception as e:
+                # A failed poll is retried at the next tick
+                log_warning("Unable to describe services {}: {}".format(', '.join(service_names), e))
+                continue
+            for service_definition in response.get('services', []):
+                watch = watches.get(service_definition['serviceName'])
+                if watch is not None:
+                    watch.publish(service=EcsService(cluster=self._cluster_name,
+                                                     service_definition=service_definition))
+            for failure in response.get('failures', []):
+                watch = watches.get(failure['arn'].split('/')[-1])
+                if watch is not None:
+                    watch.publish(error="Unable to describe service {}: {}".format(watch.service_name,
+                                                                                    failure.get('reason')))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            self.poll()
+            self._wakeup.wait(self._interval)
@@ -0,0 +1,194 @@
+'''
+Small client of the Docker Engine API on the local unix socket. Images are
+built, tagged, pushed and removed with one API request each instead of a
+docker process per step. Progress comes back as structured events and
+failures carry the error message of the daemon.
+'''
+import base64
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+from urllib.parse import quote, urlencode
+
+from cloudlift.deployment import build_context
+from cloudlift.exceptions import UnrecoverableException
+
+DEFAULT_DOCKER_SOCKET = '/var/run/docker.sock'
+PING_TIMEOUT_SECONDS = 2
+
+# Push statuses that end the upload of a layer
+FINISHED_LAYER_STATUSES = ('Pushed', 'Layer already exists', 'Mounted from')
+
+_local_engine = {}
+_local_engine_lock = threading.Lock()
+
+
+class DockerEngineError(UnrecoverableException):
+    pass
+
+
+class DockerEngine(object):
+    def __init__(self, socket_path=DEFAULT_DOCKER_SOCKET, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def ping(self):
+        connection = _UnixConnection(self.socket_path, PING_TIMEOUT_SECONDS)
+        try:
+            connection.request('GET', '/_ping')
+            return connection.getresponse().status == 200
+        finally:
+            connection.close()
+
+    def build(self, working_dir, tag, dockerfile=None, build_args=None, cache_from=None, on_event=None):
+        '''
+            Builds the image from the context in working_dir, as docker
+            build would, and returns its id
+        '''
+        params = {'t': tag, 'rm': 1, 'forcerm': 1}
+        if build_args:
+            params['buildargs'] = json.dumps(build_args)
+        if cache_from:
+            params['cachefrom'] = json.dumps(list(cache_from))
+        image_id = None
+        with tempfile.TemporaryFile() as context:
+            params['dockerfile'] = build_context.write_context_tar(context, working_dir, dockerfile)
+            headers = {'Content-Type': 'application/x-tar', 'Content-Length': str(context.tell())}
+            context.seek(0)
+            for event in self._stream('POST', '/build', params, context, headers, on_event):
+                image_id = event.get('aux', {}).get('ID', image_id)
+        return image_id
+
+    def tag(self, image, repository, tag):
+        self._call('POST', '/images/{}/tag'.format(_quote(image)), {'repo': repository, 'tag': tag})
+
+    def push(self, repository, tag, auth, on_event=None):
+        '''
+            Pushes repository:tag with the registry credentials in auth. The
+            daemon uploads the layers in parallel.
+        '''
+        headers = {'X-Registry-Auth': base64.urlsafe_b64encode(json.dumps(auth).encode('utf-8')).decode('ascii')}
+        for _ in self._stream('POST', '/images/{}/push'.format(_quote(repository)), {'tag': tag}, None, headers,
+                              on_event):
+            pass
+
+    def remove_image(self, name):
+        self._call('DELETE', '/images/{}'.format(_quote(name)))
+
+    def _call(self, method, path, params=None):
+        connection = _UnixConnection(self.socket_path, self.timeout)
+        try:
+            _check(self._send(connection, method, path, params)).read()
+        finally:
+            connection.close()
+
+    def _stream(self, method, path, params, body, headers, on_event):
+        connection = _UnixConnection(self.socket_path, self.timeout)
+        try:
+            response = _check(self._send(connection, method, path, params, body, headers))
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line.decode('utf-8'))
+                if 'error' in event:
+                    raise DockerEngineError(event.get('errorDetail', {}).get('message') or event['error'])
+                if on_event is not None:
+                    on_event(event)
+                yield event
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _send(connection, method, path, params=None, body=None, headers=None):
+        if params:
+            path += '?' + urlencode(params)
+        connection.request(method, path, body=body, headers=headers or {})
+        return connection.getresponse()
+
+
+class PushProgress(object):
+    '''
+        Prints the push events of a layer once it is done and counts the
+        layers uploaded and those already in the registry
+    '''
+
+    def __init__(self):
+        self.pushed = 0
+        self.existing = 0
+
+    def __call__(self, event):
+        status = event.get('status', '')
+        if 'id' not in event:
+            if status:
+                print(status)
+            return
+        if status.startswith(FINISHED_LAYER_STATUSES):
+            if status == 'Pushed':
+                self.pushed += 1
+            else:
+                self.existing += 1
+            print('{}: {}'.format(event['id'], status))
+
+
+def print_build_event(event):
+    sys.stdout.write(event.get('stream', ''))
+
+
+def local_engine():
+    '''
+        The engine on the local docker socket, None when docker is not
+        reachable through a unix socket or CLOUDLIFT_DOCKER_CLI is set
+    '''
+    with _local_engine_lock:
+        if 'engine' not in _local_engine:
+            _local_engine['engine'] = _connect_local_engine()
+        return _local_engine['engine']
+
+
+def clear_local_engine():
+    with _local_engine_lock:
+        _local_engine.clear()
+
+
+def _connect_local_engine():
+    if os.environ.get('CLOUDLIFT_DOCKER_CLI'):
+        return None
+    docker_host = os.environ.get('DOCKER_HOST', 'unix://' + DEFAULT_DOCKER_SOCKET)
+    if not docker_host.startswith('unix://'):
+        return None
+    engine = DockerEngine(docker_host[len('unix://'):])
+    try:
+        return engine if engine.ping() else None
+    except OSError:
+        return None
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super(_UnixConnection, self).__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _check(response):
+    if response.status >= 400:
+        body = response.read().decode('utf-8', 'replace')
+        try:
+            message = json.loads(body).get('message', body)
+        except ValueError:
+            message = body
+        raise DockerEngineError('Docker engine request failed ({}): {}'.format(response.status, message.strip()))
+    return response
+
+
+def _quote(name):
+    return quote(name, safe='/:@')
@@ -1,7 +1,13 @@
 import base64
+import copy
+import re
 import subprocess
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import time
 
-import boto3
 import json
 from stringcase import spinalcase
 import os
@@ -9,14 +15,58 @@ import os
 from cloudlift.config.logging import log_bold, log_err, log_intent, log_warning
 from cloudlift.exceptions import UnrecoverableException
 from cloudlift.config.account import get_account_id
+from cloudlift.config.client_registry import get_client
+from cloudlift.deployment import build_cache, build_context, docker_engine
+from cloudlift.deployment.image_index import ImageInfo, image_index
+from cloudlift.utils import disk_cache, git_metadata
 
 ECR_DOCKER_PATH = "{}.dkr.ecr.{}.amazonaws.com/{}"
 DEFAULT_DOCKER_FILE = "Dockerfile"
+# ECR authorization tokens are valid for 12 hours
+ECR_TOKEN_VALIDITY_SECONDS = 12 * 60 * 60
+# Log in again this long before the token expires
+ECR_LOGIN_REFRESH_MARGIN_SECONDS = 30 * 60
+
+TAG_CONCURRENCY = 4
+
+# Build through the Docker Engine API instead of the docker CLI. The API
+# runs the legacy builder, which rejects BuildKit-only Dockerfile syntax.
+ENGINE_BUILD = bool(os.environ.get('CLOUDLIFT_DOCKER_ENGINE_BUILD'))
+
+MANIFEST_MEDIA_TYPES = [
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+]
+INDEX_MEDIA_TYPES = [
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.index.v1+json',
+]
+
+TagResult = namedtuple('TagResult', ['tag', 'status', 'error'])
+
+# Characters ECR does not accept in image tags
+TAG_UNSAFE_PATTERN = re.compile(r'[^A-Za-z0-9_.-]+')
+
+# buildx builder created for registry caches and multi-platform builds,
+# which the default docker driver cannot do
+BUILDX_BUILDER_NAME = 'cloudlift'
+CONTAINER_BUILDX_DRIVERS = ('docker-container', 'kubernetes', 'remote')
+BUILDX_DRIVER_PATTERN = re.compile(r'^Driver:\s*(\S+)', re.MULTILINE)
+
+# Token expiry (epoch seconds) of the docker logins done per registry
+_registry_logins = {}
+_registry_logins_lock = threading.Lock()
+# Credentials passed to the docker engine per registry, kept in memory only
+_registry_credentials = {}
+# buildx builder the builds of this run use
+_buildx_builder = {}
+_buildx_builder_lock = threading.Lock()
 
 
 class ECR:
     def __init__(self, region, repo_name, account_id=None, assume_role_arn=None, version=None,
-                 build_args=None, dockerfile=None, working_dir='.', ssh=None, cache_from=None):
+                 build_args=None, dockerfile=None, working_dir='.', ssh=None, cache_from=None, context_hash=False,
+                 registry_cache=False, platforms=None):
         self.repo_name = repo_name
         self.region = region
         self.account_id = account_id or get_account_id()
@@ -27,50 +77,129 @@ class ECR:
         self.working_dir = working_dir
         self.ssh = ssh
         self.cache_from = cache_from
+        # Look up images by the hash of their build context before building
+        self.context_hash = context_hash
+        self.context_tag = None
+        # Import and export a BuildKit cache through a companion repository
+        self.registry_cache = registry_cache
+        # Build a multi-platform image with buildx, e.g. for arm64 services
+        self.platforms = platforms
+        self.build_cache_stats = None
+        # Digest of the image the version tag points to, once it is in ECR
+        self.image_digest = None
 
     def ensure_image_in_ecr(self):
+        image = self.find_image()
+        if not image:
+            self.build_image()
+            image = self.push_image()
+        self.tag_image(image)
+
+    def find_image(self):
+        '''
+            Settles the version of the image and returns it from ECR, or
+            None when it has to be built
+        '''
         if self.version:
             log_intent("Using commit hash " + self.version + " to find image")
-            image = self._find_image_in_ecr(self.version)
+            image = self.images.find(self.version)
             if not image:
                 log_warning("Please build, tag and upload the image for the \
 commit " + self.version)
                 raise UnrecoverableException("Image for given version could not be found.")
+            return image
+        if git_metadata.is_dirty():
+            log_intent("Repository has uncommitted changes. Marking version as dirty.")
+            self.version = '{}-dirty'.format(self._derive_version())
+            tags = []
         else:
-            dirty = subprocess.check_output(
-                ["git", "status", "--short"]
-            ).decode("utf-8")
-            if dirty:
-                log_intent("Repository has uncommitted changes. Marking version as dirty.")
-                self.version = '{}-dirty'.format(self._derive_version())
-                image = None
-            else:
-                self.version = self._derive_version()
-                image = self._find_image_in_ecr(self.version)
-
-            log_intent("Version parameter was not provided. Determined version to be " +
-                       self.version + " based on current status")
-            if image:
-                log_intent("Image found in ECR")
-            else:
-                log_bold("Image not found in ECR. Building image")
-                self._build_image()
-                self._push_image()
-                image = self._find_image_in_ecr(self.version)
-        try:
-            image_manifest = image['imageManifest']
-            self.client.put_image(
-                repositoryName=self.repo_name,
-                imageTag=self.version,
-                imageManifest=image_manifest
-            )
-        except Exception:
-            pass
-        self._add_image_tag(self.version, f'{self.version}-{self._git_epoch_time()}')
+            self.version = self._derive_version()
+            tags = [self.version]
+
+        log_intent("Version parameter was not provided. Determined version to be " +
+                   self.version + " based on current status")
+        if self.context_hash:
+            self.context_tag = build_context.context_tag(self.working_dir, self.dockerfile, self.build_args,
+                                                         self.platforms)
+            tags.append(self.context_tag)
+        # The version and the build context are looked up together
+        images = self.images.lookup(tags) if tags else {}
+        image = images.get(self.version)
+        if image:
+            log_intent("Image found in ECR")
+            return image
+        image = images.get(self.context_tag)
+        if image:
+            log_intent("Image with the same build context found in ECR ({}). Skipping build".format(
+                self.context_tag))
+        else:
+            log_bold("Image not found in ECR. Building image")
+        return image
+
+    def build_image(self):
+        self._build_image()
+
+    def push_image(self):
+        '''
+            Pushes the built image and returns it from ECR
+        '''
+        if not self.platforms:
+            # buildx pushes multi-platform images itself
+            self._push_image()
+        self.images.forget([self.version])
+        return self.images.find(self.version)
+
+    def tag_image(self, image):
+        self.image_digest = image.digest if isinstance(image, ImageInfo) else \
+            image.get('imageId', {}).get('imageDigest')
+        tags = [self.version, f'{self.version}-{self._git_epoch_time()}']
+        if self.context_tag:
+            tags.append(self.context_tag)
+        self.put_tags(tags, image)
+
+    def for_dockerfile(self, dockerfile):
+        '''
+            Returns an ECR for the image built from another Dockerfile of the
+            same repository and build options
+        '''
+        ecr = copy.copy(self)
+        ecr.dockerfile = dockerfile
+        if self.version:
+            ecr.version = "{}-{}".format(self.version, _tag_safe(dockerfile))
+        return ecr
 
     def add_tags(self, additional_tags):
-        for new_tag in additional_tags:
-            self._add_image_tag(self.version, new_tag)
+        return self.put_tags(additional_tags)
+
+    def put_tags(self, tags, image=None):
+        '''
+            Puts every tag on the image (the one tagged with the version by
+            default), an ImageInfo or an image of batch_get_image. The
+            manifest is fetched once, only if a tag is missing, and tags are
+            put concurrently. A tag already on the image counts as put.
+            Returns a TagResult per tag and raises after all were tried if
+            any failed.
+        '''
+        if not tags:
+            return []
+        if image is None:
+            image = self.images.find(self.version)
+        if not image:
+            raise UnrecoverableException("Image {} not found in ECR, unable to tag it".format(self.image_uri))
+        existing_tags = image.tags if isinstance(image, ImageInfo) else []
+        missing_tags = [tag for tag in tags if tag not in existing_tags]
+        results = {tag: TagResult(tag, 'exists', None) for tag in tags if tag in existing_tags}
+        if missing_tags:
+            digest, manifest, media_type = self._image_manifest(image)
+            with ThreadPoolExecutor(max_workers=min(TAG_CONCURRENCY, len(missing_tags))) as executor:
+                for result in executor.map(lambda tag: self._put_tag(manifest, tag, media_type), missing_tags):
+                    results[result.tag] = result
+            self.images.record_tags(digest, [tag for tag in missing_tags if results[tag].status != 'failed'])
+        results = [results[tag] for tag in tags]
+        failed_tags = [result.tag for result in results if result.status == 'failed']
+        if failed_tags:
+            raise UnrecoverableException("Unable to add tags: {}".format(', '.join(failed_tags)))
+        return results
 
     def upload_artefacts(self):
         self.ensure_repository()
@@ -79,9 +208,7 @@ commit " + self.version)
     def upload_image(self, additional_tags):
         self.ensure_repository()
         self._push_image()
-
-        for new_tag in additional_tags:
-            self._add_image_tag(self.version, new_tag)
+        self.add_tags(additional_tags)
 
     def ensure_repository(self):
         try:
@@ -98,6 +225,9 @@ commit " + self.version)
             else:
                 raise ex
 
+        if self.registry_cache:
+            self._ensure_cache_repository()
+
         current_account_id = get_account_id()
         if current_account_id != self.account_id:
             log_intent('Setting cross account ECR access: ' + self.repo_name)
@@ -143,80 +273,164 @@ commit " + self.version)
             self.repo_name,
         )
 
+    @property
+    def cache_repo_path(self):
+        return ECR_DOCKER_PATH.format(
+            str(self.account_id),
+            self.region,
+            build_cache.cache_repository_name(self.repo_name),
+        )
+
     @property
     def local_image_uri(self):
         return spinalcase(self.repo_name) + ':' + self.version
 
-    def _login_to_ecr(self):
+    @property
+    def images(self):
+        return image_index(self.client, self.account_id, self.region, self.repo_name)
+
+    @property
+    def registry(self):
+        return self.repo_path.split('/')[0]
+
+    def _login_to_ecr(self, force=False):
+        '''
+            Logs docker in to the registry unless a login with a token that
+            is not about to expire was already done, by this or an earlier
+            run. Returns whether docker login was run.
+        '''
+        key = _registry_login_key(self.registry, self.region)
+        with _registry_logins_lock:
+            if not force and _registry_login_valid(key):
+                return False
+            expires_at = self._docker_login()
+            _registry_logins[key] = expires_at
+            # Only the expiry is kept, docker stores the credentials itself
+            disk_cache.store('ecr_login', key, {'expires_at': expires_at})
+            return True
+
+    def _docker_login(self):
         log_intent("Attempting login...")
-        auth_token_res = self.client.get_authorization_token()
+        credentials = self._authorization()
+        subprocess.check_call(["docker", "login", "-u", credentials['username'],
+                               "-p", credentials['password'], credentials['serveraddress']])
+        log_intent('Docker login to ECR succeeded.')
+        return credentials['expires_at']
+
+    def _registry_auth(self, force=False):
+        '''
+            Credentials of the registry for the docker engine, reused until
+            the token is about to expire
+        '''
+        key = _registry_login_key(self.registry, self.region)
+        with _registry_logins_lock:
+            credentials = _registry_credentials.get(key)
+            if force or credentials is None or \
+                    credentials['expires_at'] - ECR_LOGIN_REFRESH_MARGIN_SECONDS <= time():
+                credentials = _registry_credentials[key] = self._authorization()
+        return {name: credentials[name] for name in ('username', 'password', 'serveraddress')}
+
+    def _authorization(self):
+        authorization_data = self.client.get_authorization_token()['authorizationData'][0]
         user, auth_token = base64.b64decode(
-            auth_token_res['authorizationData'][0]['authorizationToken']
+            authorization_data['authorizationToken']
         ).decode("utf-8").split(':')
-        ecr_url = auth_token_res['authorizationData'][0]['proxyEndpoint']
-        subprocess.check_call(["docker", "login", "-u", user,
-                               "-p", auth_token, ecr_url])
-        log_intent('Docker login to ECR succeeded.')
+        expires_at = authorization_data.get('expiresAt')
+        return {
+            'username': user,
+            'password': auth_token,
+            'serveraddress': authorization_data['proxyEndpoint'],
+            'expires_at': expires_at.timestamp() if expires_at else time() + ECR_TOKEN_VALIDITY_SECONDS,
+        }
 
     def _git_epoch_time(self, git_version=None):
-        return subprocess.check_output(
-            ["git", "show", "-s", "--format=\"%ct\"", git_version or "HEAD"]
-        ).strip().decode("utf-8").replace('"', '')
+        return git_metadata.get_commit(git_version).epoch
 
     def _derive_version(self, git_version=None):
         log_intent("Finding commit SHA")
-        try:
-            version_to_find = git_version or "HEAD"
-            commit_sha = subprocess.check_output(
-                ["git", "rev-list", "-n", "1", version_to_find]
-            ).strip().decode("utf-8")
+        derived_version = git_metadata.get_commit(git_version).sha
+        if self.dockerfile is not None and self.dockerfile != DEFAULT_DOCKER_FILE:
+            derived_version = "{}-{}".format(derived_version, _tag_safe(self.dockerfile))
 
-            derived_version = commit_sha
-            if self.dockerfile is not None and self.dockerfile != DEFAULT_DOCKER_FILE:
-                derived_version = "{}-{}".format(derived_version, self.dockerfile)
-
-            log_intent("Derived version is " + derived_version)
-            return derived_version
-        except:
-            raise UnrecoverableException("Commit SHA not found. Given version is not a git tag, \
-branch or commit SHA")
+        log_intent("Derived version is " + derived_version)
+        return derived_version
 
     def _push_image(self):
+        engine = docker_engine.local_engine()
+        if engine is None:
+            self._push_image_with_cli()
+            return
+        local_name = self.local_image_uri
+        ecr_name = self.image_uri
+        try:
+            engine.tag(local_name, self.repo_path, self.version)
+        except docker_engine.DockerEngineError:
+            raise UnrecoverableException("Local image was not found.")
+        progress = docker_engine.PushProgress()
+        try:
+            engine.push(self.repo_path, self.version, self._registry_auth(), on_event=progress)
+        except docker_engine.DockerEngineError as ex:
+            if 'authorization' not in str(ex.value).lower() and 'denied' not in str(ex.value).lower():
+                raise
+            # The token may have been revoked before it expired
+            engine.push(self.repo_path, self.version, self._registry_auth(force=True), on_event=progress)
+        engine.remove_image(ecr_name)
+        log_intent('Pushed the image ({}) to ECR sucessfully: {} layers uploaded, {} already in ECR.'.format(
+            local_name, progress.pushed, progress.existing))
+
+    def _push_image_with_cli(self):
         local_name = self.local_image_uri
         ecr_name = self.image_uri
         try:
             subprocess.check_call(["docker", "tag", local_name, ecr_name])
         except:
             raise UnrecoverableException("Local image was not found.")
-        self._login_to_ecr()
-        subprocess.check_call(["docker", "push", ecr_name])
+        logged_in = self._login_to_ecr()
+        try:
+            subprocess.check_call(["docker", "push", ecr_name])
+        except subprocess.CalledProcessError:
+            if logged_in:
+                raise
+            # The remembered login may have been dropped from the docker config
+            self._login_to_ecr(force=True)
+            subprocess.check_call(["docker", "push", ecr_name])
         subprocess.check_call(["docker", "rmi", ecr_name])
         log_intent('Pushed the image (' + local_name + ') to ECR sucessfully.')
 
-    def _add_image_tag(self, existing_tag, new_tag):
+    def _put_tag(self, image_manifest, tag, media_type=None):
+        # OCI manifests need not name their media type, so pass it when known
+        media_type_kwargs = {'imageManifestMediaType': media_type} if media_type else {}
         try:
-            image_manifest = self.client.batch_get_image(
-                repositoryName=self.repo_name,
-                imageIds=[
-                    {'imageTag': existing_tag}
-                ])['images'][0]['imageManifest']
             self.client.put_image(
                 repositoryName=self.repo_name,
-                imageTag=new_tag,
-                imageManifest=image_manifest
+                imageTag=tag,
+                imageManifest=image_manifest,
+                **media_type_kwargs
             )
-            log_intent(f'Added additional tag: {new_tag}')
-        except:
-            log_err("Unable to add additional tag " + str(new_tag))
-
-    def _find_image_in_ecr(self, tag):
+            log_intent(f'Added additional tag: {tag}')
+            return TagResult(tag, 'added', None)
+        except Exception as ex:
+            if type(ex).__name__ == 'ImageAlreadyExistsException':
+                return TagResult(tag, 'exists', None)
+            log_err("Unable to add additional tag {}: {}".format(tag, ex))
+            return TagResult(tag, 'failed', str(ex))
+
+    def _image_manifest(self, image):
+        '''
+            Digest, manifest and manifest media type of the image
+        '''
+        if not isinstance(image, ImageInfo):
+            return image.get('imageId', {}).get('imageDigest'), image['imageManifest'], \
+                image.get('imageManifestMediaType')
         try:
-            return self.client.batch_get_image(
+            found = self.client.batch_get_image(
                 repositoryName=self.repo_name,
-                imageIds=[{'imageTag': tag}]
+                imageIds=[{'imageDigest': image.digest}],
+                acceptedMediaTypes=MANIFEST_MEDIA_TYPES + INDEX_MEDIA_TYPES,
             )['images'][0]
-        except:
-            return None
+        except IndexError:
+            raise UnrecoverableException("Image {} not found in ECR".format(image.digest))
+        return image.digest, found['imageManifest'], found.get('imageManifestMediaType')
 
     def _should_enable_buildkit(self):
         if self.ssh:
@@ -226,15 +440,41 @@ branch or commit SHA")
         return False
 
     def _build_image(self):
-        image_name = self.local_image_uri
+        # Multi-platform images cannot be loaded into docker, they go to ECR
+        image_name = self.image_uri if self.platforms else self.local_image_uri
         log_bold(
             f'Building docker image {image_name} using {"default Dockerfile" if self.dockerfile is None else self.dockerfile}')
-        command = self._build_command(image_name)
+        engine = self._build_engine()
+        if engine is not None:
+            engine.build(self.working_dir, image_name, self.dockerfile, self.build_args,
+                         on_event=docker_engine.print_build_event)
+        else:
+            self._build_image_with_cli(image_name)
+        log_bold("Built " + image_name)
+
+    def _build_engine(self):
+        # The docker CLI builds with BuildKit, the default since Docker 23.
+        # When engine builds are opted in, SSH forwarding, BuildKit inline
+        # caches, buildx registry caches and multi-platform builds still need
+        # the CLI.
+        if not ENGINE_BUILD or self._should_enable_buildkit() or self.registry_cache or self.platforms:
+            return None
+        return docker_engine.local_engine()
+
+    def _build_image_with_cli(self, image_name):
+        builder = buildx_builder() if self.registry_cache or self.platforms else None
+        command = self._build_command(image_name, builder)
         env = os.environ
         if self._should_enable_buildkit():
             env['DOCKER_BUILDKIT'] = '1'
         try:
-            subprocess.check_call(command, env=env, shell=True)
+            if self.registry_cache or self.platforms:
+                # buildx reads and writes the cache and pushes images in ECR itself
+                self._login_to_ecr()
+            if self.registry_cache:
+                self._build_with_cache_stats(command, env)
+            else:
+                subprocess.check_call(command, env=env, shell=True)
         except subprocess.CalledProcessError as e:
             message = 'docker build exited with status: {}'.format(e.returncode)
             if e.output:
@@ -243,13 +483,38 @@ branch or commit SHA")
 
             if e.stderr:
                 message += '\n'
-                message += e.output
+                message += e.stderr
 
             raise UnrecoverableException(message)
-        log_bold("Built " + image_name)
 
-    def _build_command(self, image_name):
-        command = ['docker', 'build']
+    def _build_with_cache_stats(self, command, env):
+        process = subprocess.Popen(command, env=env, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   universal_newlines=True)
+        self.build_cache_stats = build_cache.parse_cache_stats(_echo_lines(process.stdout))
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+        cached, total = self.build_cache_stats
+        log_intent("Build cache: {} of {} steps cached, {} rebuilt".format(cached, total, total - cached))
+
+    def _ensure_cache_repository(self):
+        cache_repository = build_cache.cache_repository_name(self.repo_name)
+        try:
+            self.client.create_repository(repositoryName=cache_repository)
+            log_intent('Build cache repo created with name: ' + cache_repository)
+        except Exception as ex:
+            if type(ex).__name__ != 'RepositoryAlreadyExistsException':
+                raise ex
+
+    def _build_command(self, image_name, builder=None):
+        if self.platforms:
+            command = ['docker', 'buildx', 'build', '--progress=plain', '--platform', ','.join(self.platforms),
+                       '--push']
+        elif self.registry_cache:
+            command = ['docker', 'buildx', 'build', '--progress=plain', '--load']
+        else:
+            command = ['docker', 'build']
+        if builder:
+            command.append(f'--builder {builder}')
         if self.dockerfile:
             command.append(f'-f {self.dockerfile}')
 
@@ -262,6 +527,10 @@ branch or commit SHA")
             for cache in self.cache_from:
                 command.append(f'--cache-from {cache}')
 
+        if self.registry_cache:
+            command.extend(build_cache.cache_options(self.cache_repo_path, git_metadata.get_branch(),
+                                                     self.dockerfile))
+
         command.extend(self._build_args_opts())
         command.append(self.working_dir)
 
@@ -277,14 +546,92 @@ branch or commit SHA")
             return build_args_command_fragment
 
 
+def _tag_safe(dockerfile):
+    '''
+        The Dockerfile path as part of an image tag, e.g.
+        docker/Dockerfile.sidecar becomes docker-Dockerfile.sidecar
+    '''
+    return TAG_UNSAFE_PATTERN.sub('-', dockerfile)
+
+
+def buildx_builder():
+    '''
+        Name of the buildx builder to build with, None when the current one
+        can export caches and build for several platforms. A docker-container
+        builder is created on first use otherwise.
+    '''
+    with _buildx_builder_lock:
+        if 'builder' not in _buildx_builder:
+            _buildx_builder['builder'] = _select_buildx_builder()
+        return _buildx_builder['builder']
+
+
+def clear_buildx_builder():
+    _buildx_builder.clear()
+
+
+def _select_buildx_builder():
+    driver = _buildx_driver()
+    if driver is None:
+        raise UnrecoverableException("docker buildx is needed to build with --registry-cache or for arm64 "
+                                     "services. Install the docker buildx plugin.")
+    if driver in CONTAINER_BUILDX_DRIVERS:
+        return None
+    if _buildx_driver(BUILDX_BUILDER_NAME) is None:
+        log_intent("Creating the docker-container buildx builder " + BUILDX_BUILDER_NAME)
+        try:
+            subprocess.check_output(['docker', 'buildx', 'create', '--name', BUILDX_BUILDER_NAME,
+                                     '--driver', 'docker-container'], stderr=subprocess.STDOUT,
+                                    universal_newlines=True)
+        except subprocess.CalledProcessError as e:
+            raise UnrecoverableException(
+                "Unable to create the buildx builder {}: {}Create a docker-container builder with "
+                "`docker buildx create --use --driver docker-container`".format(BUILDX_BUILDER_NAME, e.output))
+    return BUILDX_BUILDER_NAME
+
+
+def _buildx_driver(builder=None):
+    '''
+        Driver of the builder, the current one by default, None when buildx
+        or the builder is missing
+    '''
+    command = ['docker', 'buildx', 'inspect'] + ([builder] if builder else [])
+    try:
+        output = subprocess.check_output(command, stderr=subprocess.DEVNULL, universal_newlines=True)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    driver = BUILDX_DRIVER_PATTERN.search(output)
+    return driver.group(1) if driver else None
+
+
+def _echo_lines(stream):
+    for line in stream:
+        sys.stdout.write(line)
+        yield line
+
+
+def _registry_login_key(registry, region):
+    # Logins live in the docker config, so they are only reusable with the same one
+    docker_config = os.environ.get('DOCKER_CONFIG', os.path.join(os.path.expanduser('~'), '.docker'))
+    return '{}/{}/{}'.format(docker_config, region, registry)
+
+
+def _registry_login_valid(key):
+    expires_at = _registry_logins.get(key)
+    if expires_at is None:
+        entry = disk_cache.load('ecr_login', key)
+        if entry is not None:
+            expires_at = _registry_logins[key] = entry['expires_at']
+    return expires_at is not None and expires_at - ECR_LOGIN_REFRESH_MARGIN_SECONDS > time()
+
+
+def clear_registry_logins():
+    _registry_logins.clear()
+    _registry_credentials.clear()
+
+
 def _create_ecr_client(region, assume_role_arn=None):
     if assume_role_arn:
-        credentials = boto3.client('sts').assume_role(RoleArn=assume_role_arn,
-                                                      RoleSessionName='ecrCloudliftAgent')
-        return boto3.session.Session(
-            aws_access_key_id=credentials['Credentials']['AccessKeyId'],
-            aws_secret_access_key=credentials['Credentials']['SecretAccessKey'],
-            aws_session_token=credentials['Credentials']['SessionToken']
-        ).client('ecr')
+        return get_client('ecr', region, role_arn=assume_role_arn, role_session_name='ecrCloudliftAgent')
     else:
-        return boto3.session.Session(region_name=region).client('ecr')
+        return get_client('ecr', region)
@@ -11,28 +11,34 @@ Copy the new contents, but ensure that apply_container_environment_and_secrets i
 or updated. If the package supports deleting configs, use that.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from json import dumps
 
-from boto3.session import Session
 from botocore.exceptions import ClientError, NoCredentialsError
-from botocore.config import Config
+from cloudlift.config.client_registry import get_client
+from cloudlift.config.deployment_index import DeploymentIndex
 from dateutil.tz.tz import tzlocal
 from cloudlift.exceptions import UnrecoverableException
 
+# Task definitions described at once while searching for a deployment
+TASK_DEFINITION_SEARCH_CONCURRENCY = 8
+
+# Tasks accepted by a single DescribeTasks request
+DESCRIBE_TASKS_BATCH_SIZE = 100
+
 
 class EcsClient(object):
     def __init__(self, access_key_id=None, secret_access_key=None,
                  region=None, profile=None):
-        session = Session(aws_access_key_id=access_key_id,
-                          aws_secret_access_key=secret_access_key,
-                          region_name=region,
-                          profile_name=profile)
-        config = Config(retries=dict(
+        credentials = None
+        if access_key_id:
+            credentials = dict(aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key)
+        config = dict(retries=dict(
             max_attempts=10,
             mode='standard',
         ))
-        self.boto = session.client(u'ecs', config=config)
+        self.boto = get_client(u'ecs', region, credentials=credentials, profile=profile, config=config)
 
     def describe_services(self, cluster_name, service_name):
         return self.boto.describe_services(
@@ -40,6 +46,12 @@ class EcsClient(object):
             services=[service_name]
         )
 
+    def describe_services_batch(self, cluster_name, service_names):
+        return self.boto.describe_services(
+            cluster=cluster_name,
+            services=service_names
+        )
+
     def list_task_definitions(self, family):
         response = self.boto.list_task_definitions(familyPrefix=family, status='ACTIVE', sort='DESC')
         return response.get('taskDefinitionArns', []), response.get('nextToken', None)
@@ -68,6 +80,16 @@ class EcsClient(object):
             serviceName=service_name
         )
 
+    def list_stopped_tasks(self, cluster_name, service_name, next_token=None):
+        token_kwargs = {'nextToken': next_token} if next_token else {}
+        response = self.boto.list_tasks(
+            cluster=cluster_name,
+            serviceName=service_name,
+            desiredStatus='STOPPED',
+            **token_kwargs
+        )
+        return response.get('taskArns', []), response.get('nextToken', None)
+
     def describe_tasks(self, cluster_name, task_arns):
         return self.boto.describe_tasks(cluster=cluster_name, tasks=task_arns)
 
@@ -127,6 +149,15 @@ class EcsService(dict):
     def desired_count(self):
         return self.get(u'desiredCount')
 
+    @property
+    def primary_deployment(self):
+        return next((deployment for deployment in self.get(u'deployments') or []
+                     if deployment.get(u'status') == u'PRIMARY'), None)
+
+    def get_deployment(self, deployment_id):
+        return next((deployment for deployment in self.get(u'deployments') or []
+                     if deployment.get(u'id') == deployment_id), None)
+
     @property
     def deployment_created_at(self):
         for deployment in self.get(u'deployments'):
@@ -347,22 +378,63 @@ class EcsAction(object):
         return self.getEcsTaskDefinitionByArn(task_definition_arn)
 
     def _find_task_definition_by_deployment_identifier(self, task_definition_arns, deployment_identifier):
-        for task_definition_arn in task_definition_arns:
-            ecs_task_definition = self.getEcsTaskDefinitionByArn(task_definition_arn)
-            if ecs_task_definition.tags.get('deployment_identifier') == deployment_identifier:
-                return ecs_task_definition
+        '''
+            Describes the task definitions concurrently and returns the first
+            one, in the order of task_definition_arns (newest first), tagged
+            with the deployment_identifier
+        '''
+        if not task_definition_arns:
+            return None
+        with ThreadPoolExecutor(max_workers=TASK_DEFINITION_SEARCH_CONCURRENCY) as executor:
+            futures = [executor.submit(self.getEcsTaskDefinitionByArn, arn) for arn in task_definition_arns]
+            try:
+                for future in futures:
+                    ecs_task_definition = future.result()
+                    if ecs_task_definition.tags.get('deployment_identifier') == deployment_identifier:
+                        return ecs_task_definition
+            finally:
+                for future in futures:
+                    future.cancel()
         return None
 
+    def _get_indexed_task_definition(self, deployment_index):
+        '''
+            The recorded task definition, which may carry another
+            deployment_identifier when the deployment changed nothing
+        '''
+        task_definition_arn = deployment_index.get_task_definition_arn()
+        if not task_definition_arn:
+            return None
+        try:
+            ecs_task_definition = self.getEcsTaskDefinitionByArn(task_definition_arn)
+        except UnknownTaskDefinitionError:
+            return None
+        # Revisions deregistered since cannot be deployed any more
+        if ecs_task_definition.get('status', 'ACTIVE') != 'ACTIVE':
+            return None
+        return ecs_task_definition
+
     def get_task_definition_by_deployment_identifier(self, service, deployment_identifier):
         current_task_definition = self.get_current_task_definition(service)
-        task_definition_arns, next_token = self._client.list_task_definitions(family=current_task_definition.family)
+        deployment_index = DeploymentIndex(current_task_definition.family, deployment_identifier)
+        td = self._get_indexed_task_definition(deployment_index)
+        if td:
+            return td
+
+        td = self._search_task_definition_by_deployment_identifier(current_task_definition.family,
+                                                                   deployment_identifier)
+        deployment_index.set_task_definition_arn(td.arn)
+        return td
+
+    def _search_task_definition_by_deployment_identifier(self, family, deployment_identifier):
+        task_definition_arns, next_token = self._client.list_task_definitions(family=family)
         td = self._find_task_definition_by_deployment_identifier(task_definition_arns, deployment_identifier)
         if td:
             return td
 
         while next_token is not None:
             task_definition_arns, next_token = self._client.list_task_definitions_for_next_token(
-                family=current_task_definition.family, next_token=next_token,
+                family=family, next_token=next_token,
             )
             td = self._find_task_definition_by_deployment_identifier(task_definition_arns, deployment_identifier)
             if td:
@@ -408,6 +480,23 @@ class EcsAction(object):
         )
         return EcsService(self._cluster_name, response[u'service'])
 
+    def get_stopped_tasks(self, started_by):
+        '''
+            Recently stopped tasks of the service started by the deployment
+            started_by, listed page by page and described in batches
+        '''
+        task_arns, next_token = self._client.list_stopped_tasks(self._cluster_name, self._service_name)
+        while next_token is not None:
+            page, next_token = self._client.list_stopped_tasks(self._cluster_name, self._service_name, next_token)
+            task_arns.extend(page)
+        tasks = []
+        for start in range(0, len(task_arns), DESCRIBE_TASKS_BATCH_SIZE):
+            tasks.extend(self._client.describe_tasks(
+                cluster_name=self._cluster_name,
+                task_arns=task_arns[start:start + DESCRIBE_TASKS_BATCH_SIZE],
+            )[u'tasks'])
+        return [task for task in tasks if task.get(u'startedBy') == started_by]
+
     def get_running_tasks_count(self, service, task_arns):
         running_count = 0
         tasks_details = self._client.describe_tasks(
@@ -441,7 +530,9 @@ class EcsAction(object):
 class DeployAction(EcsAction):
     def deploy(self, task_definition):
         self._service.set_task_definition(task_definition)
-        return self.update_service(self._service)
+        # The response describes the updated service
+        self._service = self.update_service(self._service)
+        return self._service
 
 
 class ScaleAction(EcsAction):
@@ -1,17 +1,19 @@
 import sys
-from time import sleep
 
 from botocore.exceptions import ClientError
 from cloudlift.exceptions import UnrecoverableException
 
 from cloudlift.config import EnvironmentConfiguration
+from cloudlift.config import get_environment_config
 from cloudlift.config import get_client_for
 from cloudlift.config import get_cluster_name
 from cloudlift.deployment.changesets import create_change_set
 from cloudlift.deployment.cluster_template_generator import ClusterTemplateGenerator
 from cloudlift.config.logging import log, log_bold, log_err
-from cloudlift.deployment.progress import get_stack_events, print_new_events
+from cloudlift.deployment.progress import StackEventCursor, print_events
 from cloudlift.deployment.cloud_formation_stack import prepare_stack_options_for_template
+from cloudlift.utils import disk_cache
+from cloudlift.utils.poller import poll
 
 
 class EnvironmentCreator(object):
@@ -22,9 +24,10 @@ class EnvironmentCreator(object):
             self.environment
         )
         environment_configuration.update_config()
-        self.configuration = environment_configuration.get_config()[self.environment]
+        self.configuration = get_environment_config(self.environment)
         self.cluster_name = get_cluster_name(environment)
         self.client = get_client_for('cloudformation', self.environment)
+        self.stack_events = StackEventCursor(self.client, self.cluster_name)
 
     def run(self):
         try:
@@ -45,10 +48,7 @@ class EnvironmentCreator(object):
                 self.environment,
                 self.configuration
             ).generate_cluster()
-            self.existing_events = get_stack_events(
-                self.client,
-                self.cluster_name
-            )
+            self.stack_events.mark()
             options = prepare_stack_options_for_template(
                 environment_stack_template_body, self.environment, self.cluster_name)
             environment_stack = self.client.create_stack(
@@ -81,10 +81,7 @@ class EnvironmentCreator(object):
                 self.__get_parameter_values(),
                 self.environment
             )
-            self.existing_events = get_stack_events(
-                self.client,
-                self.cluster_name
-            )
+            self.stack_events.mark()
             if change_set is None:
                 return
             log_bold("Executing changeset. Checking progress...")
@@ -140,15 +137,20 @@ class EnvironmentCreator(object):
 
 
     def __print_progress(self):
-        while True:
-            response = self.client.describe_stacks(StackName=self.cluster_name)
-            if "IN_PROGRESS" not in response['Stacks'][0]['StackStatus']:
-                break
-            all_events = get_stack_events(self.client, self.cluster_name)
-            print_new_events(all_events, self.existing_events)
-            self.existing_events = all_events
-            sleep(5)
+        response = poll(
+            'environment_stack_progress',
+            lambda: self.client.describe_stacks(StackName=self.cluster_name),
+            lambda response: "IN_PROGRESS" not in response['Stacks'][0]['StackStatus'],
+            lambda response: self.__print_new_events(),
+            initial_interval=2,
+            max_interval=15,
+        )
         log_bold("Finished and Status: %s" % (response['Stacks'][0]['StackStatus']))
+        # Outputs may have changed, services must not build against stale ones
+        disk_cache.clear('environment_stack', key_filter=lambda key: key.endswith('/' + self.cluster_name))
+
+    def __print_new_events(self):
+        print_events(self.stack_events.new_events())
 
     def __run_ecs_container_agent_udpate(self):
         log("Initiating agent update")
@@ -171,29 +173,30 @@ class EnvironmentCreator(object):
                 else:
                     raise exception
 
-        while True:
-            sleep(1)
+        def update_statuses():
             response = ecs_client.describe_container_instances(
                 cluster=self.cluster_name,
                 containerInstances=container_instance_arns
             )
-            update_statuses = map(
-                lambda x: {
+            return [
+                {
                     "arn": x['containerInstanceArn'],
                     "status": x.get('agentUpdateStatus', 'UPDATED')
-                },
-                response['containerInstances']
-            )
-            finished = True
+                }
+                for x in response['containerInstances']
+            ]
+
+        def print_update_statuses(statuses):
             status_string = '\r'
-            for status in update_statuses:
+            for status in statuses:
                 status_string += status['arn'] + ":\033[92m" + \
                     status['status'] + " \033[0m"
-                if status['status'] != 'UPDATED':
-                    finished = False
             sys.stdout.write(status_string)
             sys.stdout.flush()
 
-            if finished:
-                print("")
-                break
+        def finished(statuses):
+            print_update_statuses(statuses)
+            return all(status['status'] == 'UPDATED' for status in statuses)
+
+        poll('container_agent_update', update_statuses, finished, initial_interval=1, max_interval=10)
+        print("")
@@ -0,0 +1,132 @@
+'''
+Which tags exist in an ECR repository, resolved for many tags at once with
+describe_images instead of downloading a manifest per tag. Every image
+found is remembered with all of its tags, digest, size and push time for
+the rest of the command, so later checks for tags of the same image need
+no API call at all.
+'''
+import threading
+from collections import namedtuple
+
+from cloudlift.utils import chunks
+
+# describe_images and batch_get_image take at most 100 image ids per call
+LOOKUP_BATCH_SIZE = 100
+
+ImageInfo = namedtuple('ImageInfo', ['digest', 'tags', 'size', 'pushed_at'])
+
+# Indexes shared per repository by every ECR of this process
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class ImageIndex(object):
+    '''
+        Tags and metadata of the images of one repository. Only images that
+        were found are remembered, a missing tag is looked up again the next
+        time as it may have been pushed meanwhile.
+    '''
+
+    def __init__(self, client, repo_name):
+        self.client = client
+        self.repo_name = repo_name
+        self._images = {}
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, tags):
+        '''
+            Returns the ImageInfo of every tag, None for the tags not in the
+            repository
+        '''
+        with self._lock:
+            unknown = [tag for tag in dict.fromkeys(tags) if tag not in self._digests]
+        for batch in chunks(unknown, LOOKUP_BATCH_SIZE):
+            for details in self._describe(batch):
+                self._remember(details)
+        with self._lock:
+            return {tag: self._images.get(self._digests.get(tag)) for tag in tags}
+
+    def find(self, tag):
+        return self.lookup([tag])[tag]
+
+    def record_tags(self, digest, tags):
+        '''
+            Notes tags just put on an image
+        '''
+        with self._lock:
+            if digest not in self._images:
+                return
+            self._assign(digest, tags)
+
+    def forget(self, tags):
+        '''
+            Drops tags that may now point to another image, e.g. after a push
+        '''
+        with self._lock:
+            for tag in tags:
+                self._forget_tag(tag)
+
+    def _forget_tag(self, tag):
+        digest = self._digests.pop(tag, None)
+        image = self._images.get(digest)
+        if image is not None and tag in image.tags:
+            self._images[digest] = image._replace(tags=[other for other in image.tags if other != tag])
+
+    def _remember(self, details):
+        image = ImageInfo(details['imageDigest'], list(details.get('imageTags', [])),
+                          details.get('imageSizeInBytes'), details.get('imagePushedAt'))
+        with self._lock:
+            self._images[image.digest] = image._replace(tags=[])
+            self._assign(image.digest, image.tags)
+
+    def _assign(self, digest, tags):
+        for tag in tags:
+            if self._digests.get(tag) != digest:
+                # A tag points to one image only, take it off the old one
+                self._forget_tag(tag)
+                self._digests[tag] = digest
+        image = self._images[digest]
+        self._images[digest] = image._replace(tags=image.tags + [tag for tag in tags if tag not in image.tags])
+
+    def _describe(self, tags):
+        try:
+            return self.client.describe_images(
+                repositoryName=self.repo_name,
+                imageIds=[{'imageTag': tag} for tag in tags],
+            )['imageDetails']
+        except Exception as ex:
+            if type(ex).__name__ != 'ImageNotFoundException':
+                raise
+        if len(tags) == 1:
+            # The only tag asked for is missing
+            return []
+        # A single missing tag fails the whole describe_images call, while
+        # batch_get_image reports missing tags one by one
+        found = self.client.batch_get_image(
+            repositoryName=self.repo_name,
+            imageIds=[{'imageTag': tag} for tag in tags],
+        )['images']
+        digests = list(dict.fromkeys(image['imageId']['imageDigest'] for image in found))
+        if not digests:
+            return []
+        return self.client.describe_images(
+            repositoryName=self.repo_name,
+            imageIds=[{'imageDigest': digest} for digest in digests],
+        )['imageDetails']
+
+
+def image_index(client, account_id, region, repo_name):
+    '''
+        The index of the repository shared by this process
+    '''
+    key = (str(account_id), region, repo_name)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = ImageIndex(client, repo_name)
+        return _indexes[key]
+
+
+def clear_image_indexes():
+    with _indexes_lock:
+        _indexes.clear()
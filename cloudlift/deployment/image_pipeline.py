@@ -0,0 +1,102 @@
+'''
+Builds and pushes several images of a release at once. Builds run with
+bounded concurrency and each image starts pushing as soon as its own build
+finishes, while the remaining builds keep going.
+'''
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import time
+
+from terminaltables import SingleTable
+
+from cloudlift.config.logging import log_bold, log_err
+from cloudlift.exceptions import UnrecoverableException
+
+BUILD_CONCURRENCY = int(os.environ.get('CLOUDLIFT_BUILD_CONCURRENCY', 2))
+PUSH_CONCURRENCY = int(os.environ.get('CLOUDLIFT_PUSH_CONCURRENCY', 4))
+
+IMAGE_STAGES = ['find', 'build', 'push', 'tag']
+
+ImageResult = namedtuple('ImageResult', ['image', 'status', 'timings', 'error'])
+
+
+class ImagePipeline(object):
+    '''
+        Makes sure every given ECR image exists, building and pushing the
+        missing ones
+    '''
+
+    def __init__(self, images, build_concurrency=BUILD_CONCURRENCY, push_concurrency=PUSH_CONCURRENCY):
+        self.images = images
+        self.build_concurrency = build_concurrency
+        self.push_concurrency = push_concurrency
+
+    def run(self):
+        '''
+            Returns an ImageResult per image, in the given order. Raises once
+            every image is done if any of them failed.
+        '''
+        timings = [{} for _ in self.images]
+        errors = [None] * len(self.images)
+        with ThreadPoolExecutor(max_workers=self.build_concurrency) as build_executor, \
+                ThreadPoolExecutor(max_workers=self.push_concurrency) as push_executor:
+            builds = {build_executor.submit(self._build, ecr, timings[index]): index
+                      for index, ecr in enumerate(self.images)}
+            pushes = {}
+            for build in as_completed(builds):
+                index = builds[build]
+                try:
+                    image = build.result()
+                except Exception as e:
+                    errors[index] = e
+                    continue
+                pushes[push_executor.submit(self._push, self.images[index], image, timings[index])] = index
+            for push in as_completed(pushes):
+                try:
+                    push.result()
+                except Exception as e:
+                    errors[pushes[push]] = e
+
+        results = []
+        for ecr, image_timings, error in zip(self.images, timings, errors):
+            if error is not None:
+                error = str(getattr(error, 'value', error))
+                log_err("Building {} failed: {}".format(_image_name(ecr), error))
+            results.append(ImageResult(_image_name(ecr), 'failed' if error else 'succeeded', image_timings, error))
+        _print_image_summary(results)
+        if any(result.status != 'succeeded' for result in results):
+            raise UnrecoverableException("Image build failed")
+        return results
+
+    def _build(self, ecr, timings):
+        image = _timed(timings, 'find', ecr.find_image)
+        if not image:
+            _timed(timings, 'build', ecr.build_image)
+        return image
+
+    def _push(self, ecr, image, timings):
+        if not image:
+            image = _timed(timings, 'push', ecr.push_image)
+        _timed(timings, 'tag', ecr.tag_image, image)
+        log_bold("{} is in ECR".format(ecr.image_uri))
+
+
+def _timed(timings, stage, function, *args):
+    started_at = time()
+    try:
+        return function(*args)
+    finally:
+        timings[stage] = time() - started_at
+
+
+def _image_name(ecr):
+    return ecr.local_image_uri if ecr.version else ecr.repo_name
+
+
+def _print_image_summary(results):
+    rows = [['Image', 'Status'] + ['{} (s)'.format(stage.capitalize()) for stage in IMAGE_STAGES]]
+    for result in results:
+        rows.append([result.image, result.status] +
+                    [round(result.timings[stage], 1) if stage in result.timings else '-' for stage in IMAGE_STAGES])
+    print(SingleTable(rows, title="Image summary").table)
@@ -0,0 +1,173 @@
+'''
+Copies images between ECR repositories, accounts and regions through the
+ECR layer and manifest APIs, without pulling them into a local docker
+daemon. Blobs already in the destination repository are skipped and the
+rest are streamed part by part with bounded concurrency.
+'''
+import json
+import os
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from stringcase import spinalcase
+
+from cloudlift.config import ServiceConfiguration, get_account_id, get_region_for_environment
+from cloudlift.config.logging import log_bold, log_intent
+from cloudlift.deployment.ecr import ECR, INDEX_MEDIA_TYPES, MANIFEST_MEDIA_TYPES
+from cloudlift.exceptions import UnrecoverableException
+from cloudlift.utils import chunks
+
+LAYER_CONCURRENCY = int(os.environ.get('CLOUDLIFT_LAYER_CONCURRENCY', 4))
+# BatchCheckLayerAvailability accepts at most 100 digests per call
+LAYER_AVAILABILITY_BATCH_SIZE = 100
+DOWNLOAD_TIMEOUT_SECONDS = 60
+
+PromotionResult = namedtuple('PromotionResult', ['blobs', 'copied_blobs', 'copied_bytes'])
+
+
+class ImagePromoter(object):
+    '''
+        Copies tagged images from the source ECR repository to the
+        destination one
+    '''
+
+    def __init__(self, source, destination, concurrency=LAYER_CONCURRENCY):
+        self.source = source
+        self.destination = destination
+        self.concurrency = concurrency
+
+    def promote(self, tag, destination_tags=None):
+        '''
+            Copies the image tagged with tag and tags it with tag and
+            destination_tags in the destination repository
+        '''
+        image = self._get_image(self.source, imageTag=tag)
+        if image is None:
+            raise UnrecoverableException("Image {}:{} not found".format(self.source.repo_path, tag))
+        blobs = []
+        manifests = []
+        self._collect(image, blobs, manifests)
+        copied = self._copy_missing_blobs(blobs)
+        # Platform manifests of an index have to exist before the index
+        for manifest in manifests[:-1]:
+            self._put_manifest(manifest)
+        self.destination.put_tags([tag] + list(destination_tags or []), image)
+        result = PromotionResult(len(blobs), len(copied), sum(size for _, size in copied))
+        log_bold("Promoted {}:{} to {}, copied {} of {} blobs ({} bytes)".format(
+            self.source.repo_path, tag, self.destination.repo_path, result.copied_blobs, result.blobs,
+            result.copied_bytes))
+        return result
+
+    def _collect(self, image, blobs, manifests):
+        '''
+            Gathers the blob digests of the image and the manifests to put,
+            children of an index first
+        '''
+        manifest = json.loads(image['imageManifest'])
+        if image.get('imageManifestMediaType', manifest.get('mediaType')) in INDEX_MEDIA_TYPES:
+            for child in manifest['manifests']:
+                child_image = self._get_image(self.source, imageDigest=child['digest'])
+                if child_image is None:
+                    raise UnrecoverableException("Manifest {} of the image not found".format(child['digest']))
+                self._collect(child_image, blobs, manifests)
+        else:
+            for blob in [manifest['config']] + manifest.get('layers', []):
+                if blob['digest'] not in blobs:
+                    blobs.append(blob['digest'])
+        manifests.append(image)
+
+    def _copy_missing_blobs(self, blobs):
+        missing = []
+        for digests in chunks(blobs, LAYER_AVAILABILITY_BATCH_SIZE):
+            response = self.destination.client.batch_check_layer_availability(
+                layerDigests=digests, **_repository(self.destination))
+            missing.extend(layer['layerDigest'] for layer in response.get('layers', [])
+                           if layer.get('layerAvailability') != 'AVAILABLE')
+            missing.extend(failure['layerDigest'] for failure in response.get('failures', []))
+        log_intent("{} of {} blobs already in {}".format(len(blobs) - len(missing), len(blobs),
+                                                         self.destination.repo_path))
+        if not missing:
+            return []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(self._copy_blob, missing))
+
+    def _copy_blob(self, digest):
+        download_url = self.source.client.get_download_url_for_layer(
+            layerDigest=digest, **_repository(self.source))['downloadUrl']
+        upload = self.destination.client.initiate_layer_upload(**_repository(self.destination))
+        part_size = upload['partSize']
+        size = 0
+        with urllib.request.urlopen(download_url, timeout=DOWNLOAD_TIMEOUT_SECONDS) as blob:
+            while True:
+                part = _read_part(blob, part_size)
+                if not part:
+                    break
+                self.destination.client.upload_layer_part(
+                    uploadId=upload['uploadId'], partFirstByte=size, partLastByte=size + len(part) - 1,
+                    layerPartBlob=part, **_repository(self.destination))
+                size += len(part)
+        try:
+            self.destination.client.complete_layer_upload(
+                uploadId=upload['uploadId'], layerDigests=[digest], **_repository(self.destination))
+        except Exception as ex:
+            # Copied meanwhile, e.g. by a concurrent promotion
+            if type(ex).__name__ != 'LayerAlreadyExistsException':
+                raise
+        log_intent("Copied blob {} ({} bytes)".format(digest, size))
+        return digest, size
+
+    def _put_manifest(self, image):
+        try:
+            self.destination.client.put_image(
+                imageManifest=image['imageManifest'],
+                imageManifestMediaType=image['imageManifestMediaType'],
+                imageDigest=image['imageId']['imageDigest'],
+                **_repository(self.destination))
+        except Exception as ex:
+            if type(ex).__name__ != 'ImageAlreadyExistsException':
+                raise
+
+    @staticmethod
+    def _get_image(ecr, **image_id):
+        images = ecr.client.batch_get_image(
+            imageIds=[image_id], acceptedMediaTypes=MANIFEST_MEDIA_TYPES + INDEX_MEDIA_TYPES,
+            **_repository(ecr))['images']
+        return images[0] if images else None
+
+
+def promote_service_image(name, from_environment, to_environment, version, additional_tags=None):
+    '''
+        Promotes the image of the service from the ECR repository configured
+        for one environment to the one configured for another
+    '''
+    source = _service_ecr(name, from_environment, version)
+    destination = _service_ecr(name, to_environment, version)
+    destination.ensure_repository()
+    return ImagePromoter(source, destination).promote(version, additional_tags)
+
+
+def _service_ecr(name, environment, version):
+    service_configuration = ServiceConfiguration(service_name=name, environment=environment).get_config()
+    ecr_repo_config = service_configuration.get('ecr_repo') or {}
+    return ECR(
+        get_region_for_environment(environment),
+        ecr_repo_config.get('name', spinalcase(name + '-repo')),
+        ecr_repo_config.get('account_id', get_account_id()),
+        ecr_repo_config.get('assume_role_arn', None),
+        version,
+    )
+
+
+def _repository(ecr):
+    return dict(registryId=str(ecr.account_id), repositoryName=ecr.repo_name)
+
+
+def _read_part(stream, part_size):
+    part = b''
+    while len(part) < part_size:
+        data = stream.read(part_size - len(part))
+        if not data:
+            break
+        part += data
+    return part
@@ -1,19 +1,68 @@
 from cloudlift.config.logging import log_intent, log_intent_err
 
 
-def get_stack_events(client, stack_name):
-    try:
-        return sorted(
-            client.describe_stack_events(
-                StackName=stack_name
-            )['StackEvents'], key=lambda k: k['Timestamp'])
-    except Exception:
-        return []
-
-
-def print_new_events(all_events, existing_events):
-    new_events = [evnt for evnt in all_events if evnt not in existing_events]
-    for event in new_events:
+class StackEventCursor(object):
+    '''
+        Remembers the newest CloudFormation event seen on a stack, so that
+        each poll pages describe_stack_events only back to that event
+        instead of fetching and comparing the whole stack history
+    '''
+
+    def __init__(self, client, stack_name):
+        self.client = client
+        self.stack_name = stack_name
+        self.last_event_id = None
+        self.last_event_timestamp = None
+
+    def mark(self):
+        '''
+            Moves the watermark to the latest event of the stack, so that
+            only events after now are returned
+        '''
+        try:
+            events = self.client.describe_stack_events(StackName=self.stack_name)['StackEvents']
+        except Exception:
+            events = []
+        self._advance(events)
+
+    def new_events(self):
+        '''
+            Events after the watermark, oldest first
+        '''
+        new_events = []
+        try:
+            for event in self._events_newest_first():
+                if self._is_seen(event):
+                    break
+                new_events.append(event)
+        except Exception:
+            return []
+        self._advance(new_events)
+        return list(reversed(new_events))
+
+    def _events_newest_first(self):
+        kwargs = dict(StackName=self.stack_name)
+        while True:
+            response = self.client.describe_stack_events(**kwargs)
+            for event in response['StackEvents']:
+                yield event
+            if not response.get('NextToken'):
+                return
+            kwargs['NextToken'] = response['NextToken']
+
+    def _is_seen(self, event):
+        if event['EventId'] == self.last_event_id:
+            return True
+        return self.last_event_timestamp is not None and event['Timestamp'] < self.last_event_timestamp
+
+    def _advance(self, events_newest_first):
+        if events_newest_first:
+            self.last_event_id = events_newest_first[0]['EventId']
+            self.last_event_timestamp = events_newest_first[0]['Timestamp']
+
+
+def print_events(events):
+    for event in events:
         update = "%s: Resource: %s\t\tStatus: %s" % (
             event['Timestamp'],
             event['LogicalResourceId'],
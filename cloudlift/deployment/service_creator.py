@@ -3,21 +3,23 @@ Create or update ECS service and related dependencies
 using CloudFormation templates
 '''
 
-from time import sleep
 
 from botocore.exceptions import ClientError
 from cloudlift.exceptions import UnrecoverableException
 
-from cloudlift.config import get_client_for
+from cloudlift.config import get_account_id, get_client_for
 from cloudlift.config import ServiceConfiguration
 from cloudlift.config import get_cluster_name, get_service_stack_name, get_region_for_environment
 from cloudlift.deployment.changesets import create_change_set
+from cloudlift.deployment.cpu_architectures import get_image_platforms
 from cloudlift.config.logging import log, log_bold, log_err
-from cloudlift.deployment.progress import get_stack_events, print_new_events
+from cloudlift.deployment.progress import StackEventCursor, print_events
 from cloudlift.deployment.service_template_generator import ServiceTemplateGenerator
 from cloudlift.deployment.cloud_formation_stack import prepare_stack_options_for_template
 from cloudlift.deployment.ecr import ECR
 from cloudlift.deployment.service_information_fetcher import ServiceInformationFetcher
+from cloudlift.utils import disk_cache
+from cloudlift.utils.poller import poll
 
 
 class ServiceCreator(object):
@@ -32,7 +34,8 @@ class ServiceCreator(object):
         self.stack_name = get_service_stack_name(environment, name)
         self.client = get_client_for('cloudformation', self.environment)
         self.environment_stack = self._get_environment_stack()
-        self.existing_events = get_stack_events(self.client, self.stack_name)
+        self.stack_events = StackEventCursor(self.client, self.stack_name)
+        self.stack_events.mark()
         self.service_configuration = ServiceConfiguration(self.name, self.environment)
         self.env_sample_file = env_sample_file
 
@@ -48,7 +51,8 @@ class ServiceCreator(object):
             self.service_configuration.set_config(config_body)
 
         self.service_configuration.validate()
-        ecr_repo_config = self.service_configuration.get_config().get('ecr_repo')
+        service_configuration = self.service_configuration.get_config()
+        ecr_repo_config = service_configuration.get('ecr_repo')
         ecr = ECR(
             region=get_region_for_environment(self.environment),
             repo_name=ecr_repo_config.get('name'),
@@ -59,6 +63,7 @@ class ServiceCreator(object):
             dockerfile=dockerfile,
             ssh=ssh,
             cache_from=cache_from,
+            platforms=get_image_platforms(service_configuration.get('services', {})),
         )
         ecr.upload_artefacts()
 
@@ -143,29 +148,45 @@ class ServiceCreator(object):
                 raise exc
 
     def _get_environment_stack(self):
+        log("Looking for " + self.environment + " cluster.")
+        environment_stack = disk_cache.cached(
+            'environment_stack',
+            '{}/{}'.format(get_account_id(), get_cluster_name(self.environment)),
+            self._fetch_environment_stack
+        )
+        log_bold(self.environment + " stack found. Using stack with ID: " +
+                 environment_stack['StackId'])
+        return environment_stack
+
+    def _fetch_environment_stack(self):
         try:
-            log("Looking for " + self.environment + " cluster.")
             environment_stack = self.client.describe_stacks(
                 StackName=get_cluster_name(self.environment)
             )['Stacks'][0]
-            log_bold(self.environment + " stack found. Using stack with ID: " +
-                     environment_stack['StackId'])
         except ClientError:
             raise UnrecoverableException(self.environment + " cluster not found. Create the environment \
 cluster using `create_environment` command.")
-        return environment_stack
+        # Only the outputs are used to build service templates
+        return {
+            'StackId': environment_stack['StackId'],
+            'StackName': environment_stack['StackName'],
+            'Outputs': environment_stack.get('Outputs', []),
+        }
 
     def _print_progress(self):
-        while True:
-            response = self.client.describe_stacks(StackName=self.stack_name)
-            if "IN_PROGRESS" not in response['Stacks'][0]['StackStatus']:
-                break
-            all_events = get_stack_events(self.client, self.stack_name)
-            print_new_events(all_events, self.existing_events)
-            self.existing_events = all_events
-            sleep(5)
+        response = poll(
+            'service_stack_progress',
+            lambda: self.client.describe_stacks(StackName=self.stack_name),
+            lambda response: "IN_PROGRESS" not in response['Stacks'][0]['StackStatus'],
+            lambda response: self._print_new_events(),
+            initial_interval=2,
+            max_interval=15,
+        )
         final_status = response['Stacks'][0]['StackStatus']
         if "FAIL" in final_status:
             log_err("Finished with status: %s" % (final_status))
         else:
             log_bold("Finished with status: %s" % (final_status))
+
+    def _print_new_events(self):
+        print_events(self.stack_events.new_events())
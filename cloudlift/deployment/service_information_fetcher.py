@@ -4,9 +4,12 @@ from cloudlift.config import get_client_for
 from cloudlift.config import get_cluster_name, get_service_stack_name
 from cloudlift.config import get_region_for_environment
 from cloudlift.config.logging import log, log_warning, log_intent
-from cloudlift.deployment.ecs import DeployAction, EcsClient
+from cloudlift.deployment.ecs import EcsClient
 from cloudlift.exceptions import UnrecoverableException
 
+# Services accepted by a single DescribeServices request
+DESCRIBE_SERVICES_BATCH_SIZE = 10
+
 
 class ServiceInformationFetcher(object):
     def __init__(self, name, environment, service_configuration):
@@ -129,12 +132,22 @@ class ServiceInformationFetcher(object):
         return next((rule for rule in self.listener_rules if rule['LogicalResourceId'].startswith(service_name)), None)
 
     def fetch_current_desired_count(self):
+        '''
+            Desired count of every service, described in batches instead of
+            one request per service
+        '''
         desired_counts = {}
         try:
             deployment_ecs_client = EcsClient(None, None, get_region_for_environment(self.environment))
-            for logical_service_name, service_config in self.service_info.items():
-                deployment = DeployAction(deployment_ecs_client, self.cluster_name, service_config["ecs_service_name"])
-                desired_counts[logical_service_name] = deployment.service.desired_count
+            logical_service_names = list(self.service_info)
+            for start in range(0, len(logical_service_names), DESCRIBE_SERVICES_BATCH_SIZE):
+                batch = logical_service_names[start:start + DESCRIBE_SERVICES_BATCH_SIZE]
+                ecs_service_names = [self.service_info[name]["ecs_service_name"] for name in batch]
+                response = deployment_ecs_client.describe_services_batch(self.cluster_name, ecs_service_names)
+                desired_count_by_ecs_name = {service['serviceName']: service['desiredCount']
+                                             for service in response['services']}
+                for logical_service_name, ecs_service_name in zip(batch, ecs_service_names):
+                    desired_counts[logical_service_name] = desired_count_by_ecs_name[ecs_service_name]
             log("Existing service counts: " + str(desired_counts))
         except Exception:
             raise UnrecoverableException("Could not find existing services.")
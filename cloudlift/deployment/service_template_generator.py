@@ -16,7 +16,7 @@ from troposphere.applicationautoscaling import ScalingPolicy, TargetTrackingScal
 from troposphere.cloudwatch import Alarm, MetricDimension
 from troposphere.ec2 import SecurityGroup
 from troposphere.ecs import (AwsvpcConfiguration, ContainerDefinition,
-                             DeploymentConfiguration, Environment, Secret,
+                             DeploymentCircuitBreaker, DeploymentConfiguration, Environment, Secret,
                              LoadBalancer, LogConfiguration,
                              NetworkConfiguration, PlacementStrategy,
                              PortMapping, Service, TaskDefinition, PlacementConstraint, SystemControl,
@@ -81,7 +81,7 @@ class ServiceTemplateGenerator(TemplateGenerator):
         for ecs_service_name, config in self.configuration['services'].items():
             self._add_service(ecs_service_name, config)
 
-    def _add_service_alarms(self, svc):
+    def _add_service_alarms(self, svc, config):
         cloudlift_timedout_deployments_alarm = Alarm(
             'FailedCloudliftDeployments' + str(svc.name),
             EvaluationPeriods=1,
@@ -107,6 +107,34 @@ class ServiceTemplateGenerator(TemplateGenerator):
             TreatMissingData='notBreaching'
         )
         self.template.add_resource(cloudlift_timedout_deployments_alarm)
+        slow_deployment_alarm_seconds = config.get('deployment', {}).get('slow_deployment_alarm_seconds')
+        if slow_deployment_alarm_seconds:
+            # Fires when a cloudlift deployment takes longer to reach a steady state
+            self.template.add_resource(Alarm(
+                'SlowCloudliftDeployments' + str(svc.name),
+                EvaluationPeriods=1,
+                Dimensions=[
+                    MetricDimension(
+                        Name='ClusterName',
+                        Value=self.cluster_name
+                    ),
+                    MetricDimension(
+                        Name='ServiceName',
+                        Value=GetAtt(svc, 'Name')
+                    )
+                ],
+                AlarmActions=[Ref(self.notification_sns_arn)],
+                OKActions=[Ref(self.notification_sns_arn)],
+                AlarmDescription='Cloudlift deployment took longer than {} seconds to reach a steady state'.format(
+                    int(slow_deployment_alarm_seconds)),
+                Namespace='ECS/DeploymentMetrics',
+                Period=60,
+                ComparisonOperator='GreaterThanThreshold',
+                Statistic='Maximum',
+                Threshold=str(int(slow_deployment_alarm_seconds)),
+                MetricName='SteadyStateSeconds',
+                TreatMissingData='notBreaching'
+            ))
         # How to add service task count alarm
         # http://docs.aws.amazon.com/AmazonECS/latest/developerguide/cloudwatch-metrics.html#cw_running_task_count
         ecs_no_running_tasks_alarm = Alarm(
@@ -248,8 +276,11 @@ service is down',
 
         self.template.add_resource(td)
         maximum_percent = config['deployment'].get('maximum_percent', 200) if 'deployment' in config else 200
-        deployment_configuration = DeploymentConfiguration(MinimumHealthyPercent=100,
-                                                           MaximumPercent=int(maximum_percent))
+        # Stops and rolls back deployments whose tasks keep failing to start
+        deployment_configuration = DeploymentConfiguration(
+            DeploymentCircuitBreaker=DeploymentCircuitBreaker(Enable=True, Rollback=True),
+            MinimumHealthyPercent=100,
+            MaximumPercent=int(maximum_percent))
         autoscaling_config = config['autoscaling'] if 'autoscaling' in config else {}
         desired_count = self._get_desired_task_count_for_service(service_name,
                                                                  min_count=int(
@@ -283,6 +314,7 @@ service is down',
                 Cluster=self.cluster_name,
                 TaskDefinition=Ref(td),
                 DesiredCount=desired_count,
+                DeploymentConfiguration=deployment_configuration,
                 LaunchType=launch_type,
                 Tags=Tags(environment=self.env, application=self.application_name, service=service_name),
                 PropagateTags="TASK_DEFINITION",
@@ -414,6 +446,7 @@ service is down',
                 Cluster=self.cluster_name,
                 TaskDefinition=Ref(td),
                 DesiredCount=desired_count,
+                DeploymentConfiguration=deployment_configuration,
                 LaunchType=launch_type,
                 PlacementStrategies=self.PLACEMENT_STRATEGIES,
                 Tags=Tags(environment=self.env, application=self.application_name, service=service_name),
@@ -477,7 +510,7 @@ service is down',
                 )
             )
             self.template.add_resource(svc)
-        self._add_service_alarms(svc)
+        self._add_service_alarms(svc, config)
 
     def get_alb_full_name_from_listener_arn(self, listener_arn):
         return "/".join(listener_arn.split('/')[1:-1])
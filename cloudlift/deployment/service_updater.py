@@ -1,34 +1,44 @@
-import multiprocessing
 import os
-from time import sleep
-
-import boto3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import time
 
 from cloudlift.config import get_account_id, get_cluster_name, \
     ServiceConfiguration, get_region_for_environment
-from cloudlift.config.logging import log_bold, log_intent, log_warning
+from cloudlift.config.client_registry import api_call_count, get_client
+from cloudlift.config.logging import log_bold, log_err, log_intent, log_warning
 from cloudlift.deployment import deployer, ServiceInformationFetcher
 from cloudlift.exceptions import UnrecoverableException
-from cloudlift.utils import chunks
+from cloudlift.deployment.cpu_architectures import get_image_platforms
+from cloudlift.deployment.deployment_metrics import DeploymentMetrics
+from cloudlift.deployment.deployment_monitor import DeploymentMonitor
 from cloudlift.deployment.ecr import ECR
+from cloudlift.deployment.ecs import EcsClient
+from cloudlift.deployment.image_pipeline import ImagePipeline
 from stringcase import spinalcase
+from terminaltables import SingleTable
 
 DEPLOYMENT_COLORS = ['blue', 'magenta', 'white', 'cyan']
 DEPLOYMENT_CONCURRENCY = int(os.environ.get('CLOUDLIFT_DEPLOYMENT_CONCURRENCY', 4))
 
+ServiceJobResult = namedtuple('ServiceJobResult', ['service', 'status', 'duration', 'api_calls', 'error'])
+
 
 class ServiceUpdater(object):
     def __init__(self, name, environment='', env_sample_file='', timeout_seconds=None, version=None,
                  build_args=None, dockerfile=None, ssh=None, cache_from=None,
-                 deployment_identifier=None, working_dir='.'):
+                 deployment_identifier=None, working_dir='.', extra_dockerfiles=None, context_hash=False,
+                 registry_cache=False, force=False):
         self.name = name
+        self.force = force
         self.environment = environment
         self.deployment_identifier = deployment_identifier
         self.env_sample_file = env_sample_file
         self.timeout_seconds = timeout_seconds
         self.version = version
-        self.ecr_client = boto3.session.Session(region_name=self.region).client('ecr')
+        self.ecr_client = get_client('ecr', self.region)
         self.cluster_name = get_cluster_name(environment)
+        self.metrics = DeploymentMetrics(self.cluster_name, self.region)
         self.service_configuration = ServiceConfiguration(service_name=name, environment=environment).get_config()
         self.service_info_fetcher = ServiceInformationFetcher(self.name, self.environment, self.service_configuration)
         if not self.service_info_fetcher.stack_found:
@@ -45,8 +55,13 @@ class ServiceUpdater(object):
             dockerfile,
             working_dir,
             ssh,
-            cache_from
+            cache_from,
+            context_hash,
+            registry_cache,
+            get_image_platforms(self.service_configuration.get('services', {})),
         )
+        # Images built next to the service image, e.g. for sidecars
+        self.extra_images = [self.ecr.for_dockerfile(extra_dockerfile) for extra_dockerfile in extra_dockerfiles or []]
 
     def run(self):
         log_warning("Deploying to {self.region}".format(**locals()))
@@ -56,30 +71,60 @@ class ServiceUpdater(object):
                    self.environment + " | version: " + str(self.version) +
                    " | deployment_identifier: " + self.deployment_identifier)
         log_bold("Checking image in ECR")
-        self.ecr.upload_artefacts()
-        log_bold("Initiating deployment\n")
-
-        image_url = self.ecr.image_uri
-        target = deployer.deploy_new_version
-        kwargs = dict(cluster_name=self.cluster_name,
-                      service_name=self.name, sample_env_file_path=self.env_sample_file,
-                      timeout_seconds=self.timeout_seconds, env_name=self.environment,
-                      ecr_image_uri=image_url,
-                      deployment_identifier=self.deployment_identifier,
-                      )
-        self.run_job_for_all_services("Deploy", target, kwargs)
+        try:
+            self._record_image_timings(self.upload_images()[0])
+            log_bold("Initiating deployment\n")
+
+            image_url = self.ecr.image_uri
+            target = deployer.deploy_new_version
+            kwargs = dict(cluster_name=self.cluster_name,
+                          service_name=self.name, sample_env_file_path=self.env_sample_file,
+                          timeout_seconds=self.timeout_seconds, env_name=self.environment,
+                          ecr_image_uri=image_url,
+                          ecr_image_digest=self.ecr.image_digest,
+                          deployment_identifier=self.deployment_identifier,
+                          force=self.force,
+                          metrics=self.metrics,
+                          )
+            self.run_job_for_all_services("Deploy", target, kwargs)
+        finally:
+            self.metrics.publish()
 
     def revert(self):
         target = deployer.revert_deployment
         kwargs = dict(cluster_name=self.cluster_name, timeout_seconds=self.timeout_seconds,
-                      deployment_identifier=self.deployment_identifier)
-        self.run_job_for_all_services("Revert", target, kwargs)
+                      deployment_identifier=self.deployment_identifier, metrics=self.metrics)
+        try:
+            self.run_job_for_all_services("Revert", target, kwargs)
+        finally:
+            self.metrics.publish()
 
     def upload_to_ecr(self, additional_tags):
-        self.ecr.upload_artefacts()
+        self.upload_images()
         self.ecr.add_tags(additional_tags)
 
+    def upload_images(self):
+        '''
+            Makes sure the service image and the extra images are in ECR,
+            building and pushing them through a single ImagePipeline.
+            Returns an ImageResult per image, the service image first.
+        '''
+        self.ecr.ensure_repository()
+        return ImagePipeline([self.ecr] + self.extra_images).run()
+
+    def _record_image_timings(self, image_result):
+        for stage, seconds in image_result.timings.items():
+            self.metrics.record_duration('Image' + stage.capitalize(), seconds, ApplicationName=self.name)
+
     def run_job_for_all_services(self, job_name, target, kwargs):
+        '''
+            Runs the job for every ECS service of the application, keeping
+            DEPLOYMENT_CONCURRENCY of them in flight and starting the next one
+            as soon as any finishes. Workers are threads, so they share the
+            clients and caches of this process, and a single
+            DeploymentMonitor polls their services in batches. Returns a
+            ServiceJobResult per service.
+        '''
         log_bold("{} concurrency: {}".format(job_name, DEPLOYMENT_CONCURRENCY))
         jobs = []
         service_info = self.service_info_fetcher.service_info
@@ -88,34 +133,45 @@ class ServiceUpdater(object):
             log_bold(f"Queueing {job_name} of " + ecs_service_info['ecs_service_name'])
             color = DEPLOYMENT_COLORS[index % 3]
             services_configuration = self.service_configuration['services']
-            kwargs.update(dict(ecs_service_name=ecs_service_info['ecs_service_name'],
-                               secrets_name=ecs_service_info.get('secrets_name'),
-                               ecs_service_logical_name=ecs_service_logical_name,
-                               color=color,
-                               service_configuration=services_configuration.get(ecs_service_logical_name),
-                               region=self.region,
-                               ))
-            process = multiprocessing.Process(
-                target=target,
-                kwargs=kwargs
-            )
-            jobs.append(process)
-        all_exit_codes = []
-        for chunk_of_jobs in chunks(jobs, DEPLOYMENT_CONCURRENCY):
-            for process in chunk_of_jobs:
-                process.start()
-
-            while True:
-                sleep(1)
-                exit_codes = [proc.exitcode for proc in chunk_of_jobs]
-                if None not in exit_codes:
-                    break
-
-            for exit_code in exit_codes:
-                all_exit_codes.append(exit_code)
-        if any(all_exit_codes) != 0:
+            job_kwargs = dict(kwargs)
+            job_kwargs.update(dict(ecs_service_name=ecs_service_info['ecs_service_name'],
+                                   secrets_name=ecs_service_info.get('secrets_name'),
+                                   ecs_service_logical_name=ecs_service_logical_name,
+                                   color=color,
+                                   service_configuration=services_configuration.get(ecs_service_logical_name),
+                                   region=self.region,
+                                   ))
+            jobs.append(job_kwargs)
+        with DeploymentMonitor(EcsClient(None, None, self.region), self.cluster_name) as monitor, \
+                ThreadPoolExecutor(max_workers=DEPLOYMENT_CONCURRENCY) as executor:
+            futures = [executor.submit(_run_service_job, job_name, target, dict(job_kwargs, monitor=monitor))
+                       for job_kwargs in jobs]
+            results = [future.result() for future in futures]
+        _print_job_summary(job_name, results)
+        if any(result.status != 'succeeded' for result in results):
             raise UnrecoverableException(f"{job_name} failed")
+        return results
 
     @property
     def region(self):
         return get_region_for_environment(self.environment)
+
+
+def _run_service_job(job_name, target, kwargs):
+    started_at = time()
+    api_calls_before = api_call_count()
+    status, error = 'succeeded', None
+    try:
+        target(**kwargs)
+    except Exception as e:
+        status, error = 'failed', str(getattr(e, 'value', e))
+        log_err(f"{job_name} of {kwargs['ecs_service_name']} failed: {error}")
+    return ServiceJobResult(kwargs['ecs_service_name'], status, time() - started_at,
+                            api_call_count() - api_calls_before, error)
+
+
+def _print_job_summary(job_name, results):
+    rows = [['Service', 'Status', 'Duration (s)', 'API calls']]
+    for result in results:
+        rows.append([result.service, result.status, round(result.duration, 1), result.api_calls])
+    print(SingleTable(rows, title=f"{job_name} summary").table)
@@ -1,16 +1,25 @@
+import hashlib
+import json
+
 from troposphere import Template
 from troposphere import Tags
 from troposphere.ecs import (ContainerDefinition,
                              Environment, Secret,
                              LogConfiguration,
                              PortMapping, TaskDefinition, PlacementConstraint, SystemControl,
-                             HealthCheck)
+                             HealthCheck, RuntimePlatform)
 
+from cloudlift.deployment.cpu_architectures import get_cpu_architecture
 from cloudlift.deployment.launch_types import LAUNCH_TYPE_FARGATE, get_launch_type
 from stringcase import camelcase
 
 HARD_LIMIT_MEMORY_IN_MB = 20480
 
+FINGERPRINT_TAG = 'fingerprint'
+
+# Lists whose order carries no meaning, e.g. built from an unordered set
+UNORDERED_LIST_KEYS = {'environment', 'secrets'}
+
 
 class TaskDefinitionBuilder:
     def __init__(self, environment, service_name, configuration, region, application_name):
@@ -25,7 +34,8 @@ class TaskDefinitionBuilder:
                               ecr_image_uri,
                               fallback_task_role,
                               fallback_task_execution_role,
-                              deployment_identifier
+                              deployment_identifier,
+                              image_digest=None
                               ):
         t = Template()
         t.add_resource(self.build_cloudformation_resource(
@@ -36,7 +46,9 @@ class TaskDefinitionBuilder:
             deployment_identifier=deployment_identifier
         ))
         task_definition = t.to_dict()["Resources"][self._resource_name(self.service_name)]["Properties"]
-        return _cloudformation_to_boto3_payload(task_definition, ignore_keys={'Options', 'DockerLabels'})
+        payload = _cloudformation_to_boto3_payload(task_definition, ignore_keys={'Options', 'DockerLabels'})
+        payload['tags'].append({'key': FINGERPRINT_TAG, 'value': task_definition_fingerprint(payload, image_digest)})
+        return payload
 
     def build_cloudformation_resource(
             self,
@@ -58,6 +70,11 @@ class TaskDefinitionBuilder:
                                 Expression=constraint['expression']) for constraint in
             config.get('placement_constraints', [])
         ]
+        if 'cpu_architecture' in config and launch_type != LAUNCH_TYPE_FARGATE:
+            # Keep tasks on container instances of the architecture of the image
+            td_kwargs['PlacementConstraints'].append(PlacementConstraint(
+                Type='memberOf',
+                Expression='attribute:ecs.cpu-architecture == {}'.format(get_cpu_architecture(config))))
 
         td_kwargs['TaskRoleArn'] = config.get('task_role_arn') if 'task_role_arn' in config \
             else fallback_task_role
@@ -171,6 +188,11 @@ class TaskDefinitionBuilder:
             td_kwargs['NetworkMode'] = 'awsvpc'
             td_kwargs['Cpu'] = str(config['fargate']['cpu'])
             td_kwargs['Memory'] = str(config['fargate']['memory'])
+            if 'cpu_architecture' in config:
+                td_kwargs['RuntimePlatform'] = RuntimePlatform(
+                    CpuArchitecture=get_cpu_architecture(config).upper(),
+                    OperatingSystemFamily='LINUX',
+                )
 
         return TaskDefinition(
             self._resource_name(service_name),
@@ -210,6 +232,30 @@ class TaskDefinitionBuilder:
         )
 
 
+def task_definition_fingerprint(payload, image_digest=None):
+    '''
+        Hash of everything in the register_task_definition payload that
+        affects the tasks, i.e. all of it but the tags, and of the digest of
+        the image, as the tag in the image URI may be moved to another image
+    '''
+    data = {k: v for k, v in payload.items() if k != 'tags'}
+    if image_digest:
+        data['imageDigest'] = image_digest
+    canonical = json.dumps(_canonical(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _canonical(data, unordered=False):
+    if isinstance(data, dict):
+        return {k: _canonical(v, k in UNORDERED_LIST_KEYS) for k, v in data.items()}
+    if isinstance(data, list):
+        elements = [_canonical(each) for each in data]
+        if unordered:
+            elements.sort(key=lambda each: json.dumps(each, sort_keys=True))
+        return elements
+    return data
+
+
 def _cloudformation_to_boto3_payload(data, ignore_keys=set(), ignore_camelcase=False):
     if not isinstance(data, dict):
         return data
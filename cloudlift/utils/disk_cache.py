@@ -0,0 +1,135 @@
+"""
+Small JSON cache on local disk for AWS lookups that are safe to reuse
+across cloudlift runs. Entries live under $XDG_CACHE_HOME/cloudlift
+(~/.cache/cloudlift by default), one file per key, grouped by namespace,
+and expire after the TTL policy of their namespace. The cache is best
+effort: unreadable or corrupt entries are treated as misses and write
+failures are ignored. Setting CLOUDLIFT_NO_CACHE (or passing --no-cache)
+bypasses it entirely.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from time import time
+
+# Seconds an entry stays valid, per namespace
+TTL_POLICIES = {
+    'identity': 15 * 60,
+    'environment_config': 5 * 60,
+    'environment_stack': 10 * 60,
+    'availability_zones': 24 * 60 * 60,
+    'ami_id': 6 * 60 * 60,
+    # Entries carry the expiry of the ECR token they stand for
+    'ecr_login': 12 * 60 * 60,
+}
+DEFAULT_TTL_SECONDS = 5 * 60
+
+
+def cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'cloudlift')
+
+
+def enabled():
+    return not os.environ.get('CLOUDLIFT_NO_CACHE')
+
+
+def ttl_for(namespace):
+    return TTL_POLICIES.get(namespace, DEFAULT_TTL_SECONDS)
+
+
+def _entry_path(namespace, key):
+    return os.path.join(cache_dir(), namespace, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+
+def _read_entry(path):
+    try:
+        with open(path) as entry_file:
+            return json.load(entry_file)
+    except (OSError, ValueError):
+        return None
+
+
+def load(namespace, key, ttl_seconds=None):
+    '''
+        Returns the value stored for the key, or None when there is no entry
+        or it is older than ttl_seconds (the namespace policy by default)
+    '''
+    ttl_seconds = ttl_for(namespace) if ttl_seconds is None else ttl_seconds
+    if not enabled() or ttl_seconds <= 0:
+        return None
+    entry = _read_entry(_entry_path(namespace, key))
+    if entry is None or entry.get('key') != key or time() - entry.get('stored_at', 0) > ttl_seconds:
+        return None
+    return entry.get('value')
+
+
+def store(namespace, key, value):
+    if not enabled():
+        return
+    path = _entry_path(namespace, key)
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        # Write to a temporary file and rename it so that concurrent runs
+        # never read a half written entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump({'key': key, 'stored_at': time(), 'value': value}, tmp_file)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def cached(namespace, key, fetch, ttl_seconds=None):
+    '''
+        Returns the stored value for the key, calling fetch and storing its
+        result on a miss
+    '''
+    value = load(namespace, key, ttl_seconds)
+    if value is None:
+        value = fetch()
+        store(namespace, key, value)
+    return value
+
+
+def entries():
+    '''
+        Yields (namespace, key, age in seconds, expired) for every entry
+    '''
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return
+    for namespace in sorted(os.listdir(root)):
+        namespace_dir = os.path.join(root, namespace)
+        if not os.path.isdir(namespace_dir):
+            continue
+        for file_name in sorted(os.listdir(namespace_dir)):
+            entry = _read_entry(os.path.join(namespace_dir, file_name))
+            if entry is None or 'key' not in entry:
+                continue
+            age = time() - entry.get('stored_at', 0)
+            yield namespace, entry['key'], age, age > ttl_for(namespace)
+
+
+def clear(namespace=None, key_filter=None):
+    '''
+        Removes entries of the namespace (all namespaces by default) whose key
+        matches key_filter, and returns how many were removed
+    '''
+    removed = 0
+    for entry_namespace, key, _, _ in list(entries()):
+        if namespace is not None and entry_namespace != namespace:
+            continue
+        if key_filter is not None and not key_filter(key):
+            continue
+        try:
+            os.remove(_entry_path(entry_namespace, key))
+            removed += 1
+        except OSError:
+            pass
+    return removed
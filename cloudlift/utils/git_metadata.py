@@ -0,0 +1,77 @@
+'''
+Git facts about the working tree that versions images: the commit SHA and
+commit time of a revision, the checked out branch and whether the tree has
+uncommitted changes. Each is resolved with a single git invocation at most
+once per process. CI systems that already know them can pass them in
+through CLOUDLIFT_GIT_SHA, CLOUDLIFT_GIT_COMMIT_EPOCH, CLOUDLIFT_GIT_BRANCH
+and CLOUDLIFT_GIT_DIRTY. Setting CLOUDLIFT_GIT_IGNORE_UNTRACKED skips the
+scan for untracked files, which is the slow part of `git status` on large
+repositories.
+'''
+import os
+import subprocess
+import threading
+from collections import namedtuple
+
+from cloudlift.exceptions import UnrecoverableException
+
+Commit = namedtuple('Commit', ['sha', 'epoch'])
+
+# Results of git invocations keyed by working directory and arguments
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+
+def get_commit(revision=None):
+    '''
+        Returns the SHA and commit time (epoch seconds, as a string) of the
+        revision, HEAD by default
+    '''
+    if revision in (None, 'HEAD') and os.environ.get('CLOUDLIFT_GIT_SHA') and \
+            os.environ.get('CLOUDLIFT_GIT_COMMIT_EPOCH'):
+        return Commit(os.environ['CLOUDLIFT_GIT_SHA'], os.environ['CLOUDLIFT_GIT_COMMIT_EPOCH'])
+    try:
+        output = _git('log', '-1', '--format=%H %ct', revision or 'HEAD', '--')
+        sha, epoch = output.split()
+    except (subprocess.CalledProcessError, ValueError):
+        raise UnrecoverableException("Commit SHA not found. Given version is not a git tag, \
+branch or commit SHA")
+    return Commit(sha, epoch)
+
+
+def is_dirty():
+    '''
+        Whether the working tree has uncommitted changes
+    '''
+    if os.environ.get('CLOUDLIFT_GIT_DIRTY'):
+        return os.environ['CLOUDLIFT_GIT_DIRTY'].lower() not in ('0', 'false', 'no')
+    arguments = ['status', '--porcelain']
+    if os.environ.get('CLOUDLIFT_GIT_IGNORE_UNTRACKED'):
+        arguments.append('--untracked-files=no')
+    return bool(_git(*arguments))
+
+
+def get_branch():
+    '''
+        Name of the checked out branch, None for a detached HEAD
+    '''
+    if os.environ.get('CLOUDLIFT_GIT_BRANCH'):
+        return os.environ['CLOUDLIFT_GIT_BRANCH']
+    try:
+        branch = _git('rev-parse', '--abbrev-ref', 'HEAD')
+    except subprocess.CalledProcessError:
+        return None
+    return None if branch == 'HEAD' else branch
+
+
+def clear_cache():
+    with _resolved_lock:
+        _resolved.clear()
+
+
+def _git(*arguments):
+    key = (os.getcwd(),) + arguments
+    with _resolved_lock:
+        if key not in _resolved:
+            _resolved[key] = subprocess.check_output(('git',) + arguments).decode('utf-8').strip()
+        return _resolved[key]
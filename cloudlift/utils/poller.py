@@ -0,0 +1,111 @@
+'''
+Polling loop shared by every wait in cloudlift. The interval starts short,
+so quick operations are noticed right away, and backs off with jitter up to
+a ceiling, so long ones do not hammer the AWS APIs.
+'''
+import random
+import threading
+from collections import namedtuple
+from time import monotonic, sleep
+
+from cloudlift.config.client_registry import api_call_count
+from cloudlift.exceptions import UnrecoverableException
+
+PollStats = namedtuple('PollStats', ['name', 'attempts', 'api_calls', 'elapsed', 'timed_out'])
+
+# Stats of the polls finished by this process
+_finished_polls = []
+_finished_polls_lock = threading.Lock()
+
+
+class PollTimeout(UnrecoverableException):
+    def __init__(self, name, last_result):
+        super(PollTimeout, self).__init__("{} timed out".format(name))
+        self.last_result = last_result
+
+
+class Poller(object):
+    '''
+        Calls fetch until is_done accepts its result. Waits initial_interval
+        seconds after the first attempt and multiplies the wait by backoff
+        after each further one, up to max_interval, shifting every wait by up
+        to jitter of itself. Raises PollTimeout once timeout seconds have
+        passed without a terminal result.
+    '''
+
+    def __init__(self, name, initial_interval=1, max_interval=15, backoff=1.5, jitter=0.2, timeout=None):
+        self.name = name
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.timeout = timeout
+        self.stats = None
+
+    def poll(self, fetch, is_done, on_pending=None):
+        '''
+            Returns the first result of fetch that is_done accepts. on_pending
+            is called with every other result before waiting again.
+        '''
+        started_at = monotonic()
+        deadline = started_at + self.timeout if self.timeout is not None else None
+        api_calls_before = api_call_count()
+        interval = self.initial_interval
+        attempts = 0
+        timed_out = False
+        try:
+            while True:
+                attempts += 1
+                result = fetch()
+                if is_done(result):
+                    return result
+                if on_pending is not None:
+                    on_pending(result)
+                wait = self._jittered(interval)
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        timed_out = True
+                        raise PollTimeout(self.name, result)
+                    wait = min(wait, remaining)
+                sleep(wait)
+                if deadline is not None and monotonic() >= deadline:
+                    timed_out = True
+                    raise PollTimeout(self.name, result)
+                interval = min(interval * self.backoff, self.max_interval)
+        finally:
+            self.stats = PollStats(self.name, attempts, api_call_count() - api_calls_before,
+                                   monotonic() - started_at, timed_out)
+            with _finished_polls_lock:
+                _finished_polls.append(self.stats)
+
+    def _jittered(self, interval):
+        return max(interval * random.uniform(1 - self.jitter, 1 + self.jitter), 0)
+
+
+def poll(name, fetch, is_done, on_pending=None, **kwargs):
+    return Poller(name, **kwargs).poll(fetch, is_done, on_pending)
+
+
+def poll_stats():
+    '''
+        Attempts, API calls and seconds spent per poll name, summed over the
+        polls finished by this process
+    '''
+    totals = {}
+    with _finished_polls_lock:
+        finished_polls = list(_finished_polls)
+    for stats in finished_polls:
+        total = totals.setdefault(stats.name, {'polls': 0, 'attempts': 0, 'api_calls': 0, 'elapsed': 0.0,
+                                               'timed_out': 0})
+        total['polls'] += 1
+        total['attempts'] += stats.attempts
+        total['api_calls'] += stats.api_calls
+        total['elapsed'] += stats.elapsed
+        total['timed_out'] += int(stats.timed_out)
+    return totals
+
+
+def clear_poll_stats():
+    with _finished_polls_lock:
+        del _finished_polls[:]
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+from cloudlift import LAZY_COMMANDS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET_MS = int(os.environ.get('CLOUDLIFT_STARTUP_BUDGET_MS', 100))
+HEAVY_MODULES = ['boto3', 'botocore', 'troposphere', 'awacs', 'cfn_flip', 'deepdiff', 'dictdiffer',
+                 'jsonschema', 'cloudlift.config', 'cloudlift.deployment']
+
+
+def _import_profile(statement):
+    '''
+        Runs the statement in a fresh interpreter with `-X importtime` and
+        returns the cumulative import time in microseconds per module
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+    )
+    profile = {}
+    for line in result.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        profile[module.strip()] = int(cumulative)
+    return profile
+
+
+class TestCliStartup(TestCase):
+    def assert_within_budget(self, profile, modules):
+        for heavy_module in HEAVY_MODULES:
+            self.assertNotIn(heavy_module, profile, '{} imported during startup'.format(heavy_module))
+        elapsed_ms = sum(profile[module] for module in modules) / 1000.0
+        self.assertLessEqual(elapsed_ms, STARTUP_BUDGET_MS,
+                             'startup took {}ms for {}'.format(elapsed_ms, modules))
+
+    def test_help_and_version_skip_heavy_imports(self):
+        profile = _import_profile(
+            "import cloudlift; cloudlift.cli.get_help(cloudlift.click.Context(cloudlift.cli))"
+        )
+
+        self.assert_within_budget(profile, ['cloudlift'])
+
+    def test_resolving_each_command_stays_within_budget(self):
+        for command_name, module_name in LAZY_COMMANDS.items():
+            # -X importtime prints no line for the module importlib.import_module
+            # loads itself, only for what that module imports, so import it with
+            # an import statement first to get its cumulative time
+            profile = _import_profile(
+                "import cloudlift; import {}; cloudlift.cli.get_command(None, '{}')".format(module_name, command_name)
+            )
+
+            self.assert_within_budget(profile, ['cloudlift', module_name])
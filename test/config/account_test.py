@@ -0,0 +1,63 @@
+import os
+from unittest import TestCase
+
+from mock import patch, MagicMock
+
+from cloudlift.config import account
+
+
+@patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'key', 'AWS_SECRET_ACCESS_KEY': 'secret',
+                         'AWS_DEFAULT_REGION': 'us-west-2'})
+class TestAccount(TestCase):
+    def setUp(self):
+        account.clear_identity_cache()
+        env_patcher = patch.dict(os.environ)
+        self.addCleanup(env_patcher.stop)
+        env_patcher.start()
+        os.environ.pop('CLOUDLIFT_NO_CACHE', None)
+        self.sts_client = MagicMock()
+        self.sts_client.get_caller_identity.return_value = {
+            'Account': '123456789012',
+            'Arn': 'arn:aws:iam::123456789012:user/jane',
+            'UserId': 'AIDAEXAMPLE',
+            'ResponseMetadata': {},
+        }
+        patcher = patch('cloudlift.config.account.get_client', return_value=self.sts_client)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def test_resolves_identity_once_per_credentials(self):
+        self.assertEqual('123456789012', account.get_account_id())
+        self.assertEqual('123456789012', account.get_account_id())
+        self.assertEqual('jane', account.get_username())
+
+        self.sts_client.get_caller_identity.assert_called_once_with()
+
+    def test_reuses_identity_persisted_by_an_earlier_run(self):
+        account.get_account_id()
+        account.clear_identity_cache()
+
+        self.assertEqual('123456789012', account.get_account_id())
+        self.sts_client.get_caller_identity.assert_called_once_with()
+
+    @patch('cloudlift.config.account.IDENTITY_CACHE_TTL_SECONDS', 0)
+    def test_skips_disk_cache_when_ttl_is_zero(self):
+        account.get_account_id()
+        account.clear_identity_cache()
+        account.get_account_id()
+
+        self.assertEqual(2, self.sts_client.get_caller_identity.call_count)
+
+    def test_resolves_again_for_different_credentials(self):
+        account.get_account_id()
+        with patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'other-key'}):
+            account.get_account_id()
+
+        self.assertEqual(2, self.sts_client.get_caller_identity.call_count)
+
+    def test_uses_given_sts_client_directly(self):
+        other_sts_client = MagicMock()
+        other_sts_client.get_caller_identity.return_value = {'Account': '98765'}
+
+        self.assertEqual('98765', account.get_account_id(other_sts_client))
+        self.sts_client.get_caller_identity.assert_not_called()
@@ -0,0 +1,93 @@
+import os
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from botocore.stub import Stubber
+from dateutil.tz import tzutc
+from mock import patch, MagicMock
+
+from cloudlift.config.client_registry import ClientRegistry, api_call_count
+
+
+@patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'key', 'AWS_SECRET_ACCESS_KEY': 'secret',
+                         'AWS_DEFAULT_REGION': 'us-west-2'})
+class TestClientRegistry(TestCase):
+    def setUp(self):
+        self.registry = ClientRegistry()
+
+    def test_reuses_client_for_same_service_and_region(self):
+        first = self.registry.get_client('ecs', 'us-west-2')
+        second = self.registry.get_client('ecs', 'us-west-2')
+
+        self.assertIs(first, second)
+        self.assertEqual({'hits': 1, 'misses': 1}, self.registry.stats()['clients'])
+
+    def test_builds_separate_clients_per_region_and_config(self):
+        west = self.registry.get_client('ecs', 'us-west-2')
+        east = self.registry.get_client('ecs', 'us-east-1')
+        retrying = self.registry.get_client('ecs', 'us-west-2', config={'retries': {'max_attempts': 10}})
+
+        self.assertEqual('us-west-2', west.meta.region_name)
+        self.assertEqual('us-east-1', east.meta.region_name)
+        self.assertIsNot(west, retrying)
+        self.assertEqual({'hits': 0, 'misses': 3}, self.registry.stats()['clients'])
+
+    def test_shares_service_models_between_sessions(self):
+        west = self.registry.get_session(region='us-west-2')
+        east = self.registry.get_session(region='us-east-1')
+
+        self.assertIs(west._session.get_component('data_loader'), east._session.get_component('data_loader'))
+
+    def test_changed_environment_credentials_build_a_new_client(self):
+        before = self.registry.get_client('sts', 'us-west-2')
+        with patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'mfa-key', 'AWS_SESSION_TOKEN': 'token'}):
+            after = self.registry.get_client('sts', 'us-west-2')
+
+        self.assertIsNot(before, after)
+
+    def test_caches_assumed_role_credentials_until_expiry(self):
+        sts_client = MagicMock()
+        sts_client.assume_role.return_value = {'Credentials': {
+            'AccessKeyId': 'roleKey', 'SecretAccessKey': 'roleSecret', 'SessionToken': 'roleToken',
+            'Expiration': datetime.now(tzutc()) + timedelta(hours=1),
+        }}
+
+        with patch('boto3.session.Session.client', return_value=sts_client):
+            first = self.registry.get_client('ecr', 'us-west-2', role_arn='arn:role', role_session_name='agent')
+            second = self.registry.get_client('ecr', 'us-west-2', role_arn='arn:role', role_session_name='agent')
+
+        sts_client.assume_role.assert_called_once_with(RoleArn='arn:role', RoleSessionName='agent')
+        self.assertIs(first, second)
+
+    def test_refreshes_expiring_role_credentials(self):
+        sts_client = MagicMock()
+        sts_client.assume_role.return_value = {'Credentials': {
+            'AccessKeyId': 'roleKey', 'SecretAccessKey': 'roleSecret', 'SessionToken': 'roleToken',
+            'Expiration': datetime.now(tzutc()) + timedelta(minutes=1),
+        }}
+
+        with patch('boto3.session.Session.client', return_value=sts_client):
+            self.registry.get_client('ecr', 'us-west-2', role_arn='arn:role')
+            self.registry.get_client('ecr', 'us-west-2', role_arn='arn:role')
+
+        self.assertEqual(2, sts_client.assume_role.call_count)
+
+    def test_resets_after_fork(self):
+        client = self.registry.get_client('ecs', 'us-west-2')
+        self.registry._pid = -1
+
+        self.assertIsNot(client, self.registry.get_client('ecs', 'us-west-2'))
+        self.assertEqual({'hits': 0, 'misses': 1}, self.registry.stats()['clients'])
+
+    def test_counts_api_calls_per_thread(self):
+        client = self.registry.get_client('sts', 'us-west-2')
+        calls_before = api_call_count()
+
+        with Stubber(client) as stubber:
+            stubber.add_response('get_caller_identity', {'Account': '123456789012'})
+            stubber.add_response('get_caller_identity', {'Account': '123456789012'})
+            client.get_caller_identity()
+            client.get_caller_identity()
+
+        self.assertEqual(2, api_call_count() - calls_before)
+        self.assertEqual(2, self.registry.stats()['api_calls'])
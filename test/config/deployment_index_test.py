@@ -0,0 +1,30 @@
+import unittest
+
+from botocore.exceptions import ClientError
+from mock import patch
+from moto import mock_dynamodb2
+
+from cloudlift.config.deployment_index import DeploymentIndex
+
+
+class TestDeploymentIndex(unittest.TestCase):
+
+    @mock_dynamodb2
+    def test_set_and_get_task_definition_arn(self):
+        DeploymentIndex('prodServiceAFamily', 'id-0').set_task_definition_arn('arn:td:3')
+
+        self.assertEqual('arn:td:3', DeploymentIndex('prodServiceAFamily', 'id-0').get_task_definition_arn())
+        self.assertIsNone(DeploymentIndex('prodServiceAFamily', 'id-1').get_task_definition_arn())
+        self.assertIsNone(DeploymentIndex('stgServiceAFamily', 'id-0').get_task_definition_arn())
+
+    @mock_dynamodb2
+    def test_failures_only_log_a_warning(self):
+        deployment_index = DeploymentIndex('prodServiceAFamily', 'id-0')
+        access_denied = ClientError({'Error': {'Code': 'AccessDeniedException'}}, 'GetItem')
+
+        with patch.object(deployment_index, '_call_table', side_effect=access_denied), \
+                patch('cloudlift.config.deployment_index.log_warning') as mock_log_warning:
+            self.assertIsNone(deployment_index.get_task_definition_arn())
+            deployment_index.set_task_definition_arn('arn:td:3')
+
+        self.assertEqual(2, mock_log_warning.call_count)
@@ -2,6 +2,7 @@ import unittest
 from cloudlift.config.dynamodb_config import DynamodbConfig
 from moto import mock_dynamodb2
 import boto3
+from botocore.exceptions import ClientError
 from decimal import Decimal
 from mock import patch
 
@@ -46,6 +47,7 @@ class TestDynamodbConfig(unittest.TestCase):
     def test_set_and_get_config_in_db(self):
         dynamodb_config_setter = DynamodbConfig('test_dynamodb_config',
                                                 [('key1', 'valuexyz'), ('key2', 'valueabc')])
+        dynamodb_config_setter._create_configuration_table()
         dynamodb_config_setter.set_config_in_db(DUMMY_CONFIG)
         dynamodb_config_getter = DynamodbConfig('test_dynamodb_config',
                                                 [('key1', 'valuexyz'), ('key2', 'valueabc')])
@@ -58,14 +60,24 @@ class TestDynamodbConfig(unittest.TestCase):
                                                                              [('key1', 'valuexyz'), ('key2', 'valueabc')])
         config_setter_with_failing_validate = ConfigClassWithFailingValidate('test_cloudlift_dynamodb_config',
                                                                              [('key1', 'valuexyz'), ('key2', 'valueabc')])
+        config_setter_with_passing_validate._create_configuration_table()
         config_setter_with_passing_validate.set_config_in_db(DUMMY_CONFIG)
 
         self.assertRaises(KeyError, config_setter_with_failing_validate.set_config_in_db, DUMMY_CONFIG)
 
     @mock_dynamodb2
     def test_create_configuration_table(self):
-        DynamodbConfig('creation_test_table', [('key1', 'valuexyz'), ('key2', 'valueabc'), ('random_key', '12345')])
+        dynamodb_config = DynamodbConfig('creation_test_table',
+                                         [('key1', 'valuexyz'), ('key2', 'valueabc'), ('random_key', '12345')])
         dynamodb_resource = boto3.session.Session().resource('dynamodb')
+        assert 'creation_test_table' not in [table.name for table in dynamodb_resource.tables.all()]
+        table_not_found = ClientError({'Error': {'Code': 'ResourceNotFoundException'}}, 'GetItem')
+
+        with patch.object(dynamodb_config.table, 'get_item', side_effect=[table_not_found, {}]) as mock_get_item:
+            assert dynamodb_config.get_config_in_db() is None
+
+        assert mock_get_item.call_count == 2
+
         created_table = dynamodb_resource.Table('creation_test_table')
         assert created_table.key_schema == [{'AttributeName': 'key1', 'KeyType': 'HASH'}, {'AttributeName': 'key2', 'KeyType': 'RANGE'}, {'AttributeName': 'random_key', 'KeyType': 'RANGE'}]
         assert created_table.attribute_definitions == [{'AttributeName': 'key1', 'AttributeType': 'S'}, {'AttributeName': 'key2', 'AttributeType': 'S'}, {'AttributeName': 'random_key', 'AttributeType': 'S'}]
@@ -75,7 +87,7 @@ class TestDynamodbConfig(unittest.TestCase):
     @patch('cloudlift.config.dynamodb_config.DynamodbConfig._create_configuration_table')
     def test_get_table(self, mock_create_conf_table):
         dynamodb_config = DynamodbConfig('test_table', [('primary_attr', 'v1'), ('secondary_attr', 'v2')])
-        assert mock_create_conf_table.call_count == 1
+        assert mock_create_conf_table.call_count == 0
         dynamodb_resource = boto3.session.Session().resource('dynamodb')
         dynamodb_resource.create_table(
             TableName='test_table',
@@ -89,3 +101,20 @@ class TestDynamodbConfig(unittest.TestCase):
         assert fetched_table.table_status == 'ACTIVE'
         assert fetched_table.key_schema == [{'AttributeName': 'primary_attr', 'KeyType': 'HASH'}, {'AttributeName': 'secondary_attr', 'KeyType': 'RANGE'}]
         assert fetched_table.attribute_definitions == [{'AttributeName': 'primary_attr', 'AttributeType': 'S'}, {'AttributeName': 'secondary_attr', 'AttributeType': 'S'}]
+        other_config = DynamodbConfig('test_table', [('primary_attr', 'v3'), ('secondary_attr', 'v4')])
+        assert other_config._get_table() is fetched_table
+        mock_create_conf_table.assert_not_called()
+
+    @mock_dynamodb2
+    def test_warm_get_config_makes_single_request(self):
+        dynamodb_config = DynamodbConfig('test_dynamodb_config', [('key1', 'valuexyz'), ('key2', 'valueabc')])
+        dynamodb_config._create_configuration_table()
+        dynamodb_config.set_config_in_db(DUMMY_CONFIG)
+        dynamodb_config = DynamodbConfig('test_dynamodb_config', [('key1', 'valuexyz'), ('key2', 'valueabc')])
+        requests = []
+        dynamodb_config.table.meta.client.meta.events.register(
+            'before-call.dynamodb', lambda model, **kwargs: requests.append(model.name)
+        )
+
+        self.assertDictEqual(DUMMY_CONFIG, dynamodb_config.get_config_in_db())
+        self.assertEqual(['GetItem'], requests)
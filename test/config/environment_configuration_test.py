@@ -2,7 +2,7 @@ import boto3
 import pytest
 from moto import mock_dynamodb2
 
-from cloudlift.config import EnvironmentConfiguration
+from cloudlift.config import EnvironmentConfiguration, get_environment_config
 
 
 class TestEnvironmentConfiguration(object):
@@ -241,3 +241,17 @@ class TestEnvironmentConfiguration(object):
                 }
             }
         }
+
+    @mock_dynamodb2
+    def test_set_config_invalidates_cached_environment_config(self):
+        self.setup_existing_params()
+        assert get_environment_config('dummy-staging')["cluster"]["instance_type"] == "m5.xlarge"
+
+        store_object = EnvironmentConfiguration('dummy-staging')
+        updated_config = store_object.get_config()
+        updated_config["dummy-staging"]["cluster"]["instance_type"] = "t2.large"
+        updated_config["dummy-staging"]["cluster"]["min_instances"] = 1
+        updated_config["dummy-staging"]["cluster"]["max_instances"] = 10
+        store_object._set_config(updated_config)
+
+        assert get_environment_config('dummy-staging')["cluster"]["instance_type"] == "t2.large"
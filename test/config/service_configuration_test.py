@@ -315,6 +315,36 @@ class TestServiceConfigurationValidation(TestCase):
         except UnrecoverableException as e:
             self.assertTrue("'invalid' is not one of ['memberOf', 'distinctInstance']" in str(e))
 
+    @mock_dynamodb2
+    def test_set_config_cpu_architecture(self):
+        service = ServiceConfiguration('test-service', 'test')
+
+        def validate(cpu_architecture):
+            service._validate_changes({
+                'cloudlift_version': 'test',
+                'ecr_repo': {'name': 'test-service-repo'},
+                'services': {
+                    'TestService': {
+                        'memory_reservation': 1000,
+                        'secrets_name': 'secret-config',
+                        'command': None,
+                        'cpu_architecture': cpu_architecture,
+                    }
+                }
+            })
+
+        try:
+            validate('arm64')
+            validate('x86_64')
+        except UnrecoverableException as e:
+            self.fail('Exception thrown: {}'.format(e))
+
+        try:
+            validate('aarch64')
+            self.fail('Validation error expected but validation passed')
+        except UnrecoverableException as e:
+            self.assertTrue("'aarch64' is not one of ['x86_64', 'arm64']" in str(e))
+
     @mock_dynamodb2
     def test_set_config_system_controls(self):
         service = ServiceConfiguration('test-service', 'test')
@@ -1,10 +1,13 @@
+import os
+
 from cloudlift.config import region
+from cloudlift.exceptions import UnrecoverableException
 from unittest import TestCase
 from mock import patch, MagicMock
 
 
 class TestRegion(TestCase):
-    @patch("cloudlift.config.region.local_cache", {})
+    @patch("cloudlift.config.region._environment_configs", {})
     @patch("cloudlift.config.region.EnvironmentConfiguration")
     def test_get_region_for_environment_without_cache(self, env_config):
         mock = MagicMock()
@@ -20,7 +23,7 @@ class TestRegion(TestCase):
 
         self.assertEqual(actual, expected)
 
-    @patch("cloudlift.config.region.local_cache", {'region': 'mock-region'})
+    @patch("cloudlift.config.region._environment_configs", {'test-env': {'region': 'mock-region'}})
     @patch("cloudlift.config.region.EnvironmentConfiguration")
     def test_get_region_for_environment_with_cache(self, env_config):
         expected = 'mock-region'
@@ -29,6 +32,64 @@ class TestRegion(TestCase):
         self.assertEqual(actual, expected)
         env_config.assert_not_called()
 
+    @patch("cloudlift.config.region._environment_configs", {'test-env': {'region': 'mock-region'}})
+    @patch("cloudlift.config.region.EnvironmentConfiguration")
+    def test_get_region_for_environment_is_cached_per_environment(self, env_config):
+        env_config.return_value.get_config.return_value = {
+            'other-env': {
+                'region': 'other-region'
+            }
+        }
+
+        self.assertEqual('other-region', region.get_region_for_environment('other-env'))
+        self.assertEqual('mock-region', region.get_region_for_environment('test-env'))
+        env_config.assert_called_once_with('other-env')
+
+    @patch("cloudlift.config.region._environment_configs", {})
+    @patch("cloudlift.config.region.EnvironmentConfiguration")
+    def test_helpers_share_one_environment_load(self, env_config):
+        env_config.return_value.get_config.return_value = {
+            'test-env': {
+                'region': 'mock-region',
+                'service_templates_bucket': 'mock.bucket.url',
+                'loadbalancer_listener_arn': 'listener-arn',
+                'environment': {
+                    'notifications_arn': 'notifications-arn',
+                    'ssl_certificate_arn': 'certificate-arn'
+                }
+            }
+        }
+
+        region.get_region_for_environment('test-env')
+        region.get_service_templates_bucket_for_environment('test-env')
+        region.get_environment_level_alb_listener('test-env')
+        region.get_notifications_arn_for_environment('test-env')
+        region.get_ssl_certification_for_environment('test-env')
+
+        env_config.assert_called_once_with('test-env')
+
+    @patch("cloudlift.config.region._environment_configs", {'test-env': {'region': 'stale-region'}})
+    @patch("cloudlift.config.region.EnvironmentConfiguration")
+    def test_clear_environment_config_cache(self, env_config):
+        env_config.return_value.get_config.return_value = {
+            'test-env': {
+                'region': 'fresh-region'
+            }
+        }
+
+        region.clear_environment_config_cache('test-env')
+
+        self.assertEqual('fresh-region', region.get_region_for_environment('test-env'))
+
+    @patch("cloudlift.config.region._environment_configs", {})
+    @patch("cloudlift.config.region.EnvironmentConfiguration")
+    def test_get_environment_config_for_unknown_environment(self, env_config):
+        env_config.return_value.get_config.return_value = None
+
+        with self.assertRaises(UnrecoverableException):
+            region.get_environment_config('test-env')
+
+    @patch("cloudlift.config.region._environment_configs", {})
     @patch("cloudlift.config.region.EnvironmentConfiguration")
     def test_get_service_templates_bucket_for_environment_without_cache(self, env_config):
         mock = MagicMock()
@@ -44,7 +105,7 @@ class TestRegion(TestCase):
 
         self.assertEqual(actual, expected)
 
-    @patch("cloudlift.config.region.local_cache", {'bucket': 'mock.bucket.url'})
+    @patch("cloudlift.config.region._environment_configs", {'test-env': {'service_templates_bucket': 'mock.bucket.url'}})
     @patch("cloudlift.config.region.EnvironmentConfiguration")
     def test_get_service_templates_bucket_for_environment_with_cache(self, env_config):
         expected = 'mock.bucket.url'
@@ -53,3 +114,25 @@ class TestRegion(TestCase):
 
         self.assertEqual(actual, expected)
         env_config.assert_not_called()
+
+    @patch("cloudlift.config.region._environment_configs", {})
+    @patch("cloudlift.config.region.get_account_id", return_value='123456789012')
+    @patch("cloudlift.config.region.EnvironmentConfiguration")
+    def test_environment_config_is_reused_across_runs(self, env_config, _):
+        env_config.return_value.get_config.return_value = {
+            'test-env': {
+                'region': 'mock-region'
+            }
+        }
+
+        with patch.dict("os.environ", {}):
+            os.environ.pop('CLOUDLIFT_NO_CACHE', None)
+            region.get_region_for_environment('test-env')
+            region._environment_configs.clear()
+
+            self.assertEqual('mock-region', region.get_region_for_environment('test-env'))
+            env_config.assert_called_once_with('test-env')
+
+            region.clear_environment_config_cache('test-env')
+            region.get_region_for_environment('test-env')
+            self.assertEqual(2, env_config.call_count)
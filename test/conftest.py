@@ -13,4 +13,41 @@ def keep_resources(request):
     Presence of `keep_resources` retains the AWS resources created by cloudformation
     during the test run. By default, the resources are deleted after the run.
     """
-    return request.config.getoption("--keep-resources")
\ No newline at end of file
+    return request.config.getoption("--keep-resources")
+
+
+@pytest.fixture(autouse=True)
+def clear_process_caches(tmp_path, monkeypatch):
+    """
+    Clients, identities, environment configurations, ECR logins, the buildx
+    builder, ECR image indexes, the docker engine connection and git
+    metadata are cached for the whole process (and partly on disk), so
+    tests that patch boto3 or run under moto must not see state left behind
+    by an earlier test.
+    """
+    from cloudlift.config.account import clear_identity_cache
+    from cloudlift.config.client_registry import registry
+    from cloudlift.config.region import clear_environment_config_cache
+    from cloudlift.deployment.docker_engine import clear_local_engine
+    from cloudlift.deployment.ecr import clear_buildx_builder, clear_registry_logins
+    from cloudlift.deployment.image_index import clear_image_indexes
+    from cloudlift.utils import git_metadata
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('CLOUDLIFT_NO_CACHE', '1')
+    registry.clear()
+    clear_identity_cache()
+    clear_environment_config_cache()
+    clear_registry_logins()
+    clear_buildx_builder()
+    clear_image_indexes()
+    clear_local_engine()
+    git_metadata.clear_cache()
+    yield
+    registry.clear()
+    clear_identity_cache()
+    clear_environment_config_cache()
+    clear_registry_logins()
+    clear_buildx_builder()
+    clear_image_indexes()
+    clear_local_engine()
+    git_metadata.clear_cache()
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from cloudlift.deployment.build_cache import cache_options, cache_tag, parse_cache_stats
+
+BUILD_LOG = '''#1 [internal] load build definition from Dockerfile
+#1 transferring dockerfile: 213B done
+#1 DONE 0.0s
+#4 [1/4] FROM docker.io/library/python:3.8@sha256:0123
+#4 CACHED
+#5 [2/4] COPY requirements.txt /app/
+#5 CACHED
+#6 [3/4] RUN pip install -r requirements.txt
+#6 0.512 Collecting click
+#6 DONE 9.1s
+#7 [4/4] COPY . /app
+#7 DONE 0.1s
+#8 importing cache manifest from 123.dkr.ecr.us-west-2.amazonaws.com/repo-build-cache:main-dockerfile
+#8 DONE 0.4s
+'''.splitlines(True)
+
+
+class TestBuildCache(TestCase):
+    def test_counts_cached_build_steps(self):
+        self.assertEqual((2, 4), parse_cache_stats(BUILD_LOG))
+
+    def test_cache_tag_per_branch_and_dockerfile(self):
+        self.assertEqual('feature-login-page-dockerfile', cache_tag('feature/Login page'))
+        self.assertEqual('main-dockerfile.worker', cache_tag('main', 'docker/Dockerfile.worker'))
+        self.assertEqual('master-dockerfile', cache_tag(None))
+        self.assertEqual(128, len(cache_tag('b' * 200)))
+
+    def test_imports_default_branch_cache_and_exports_branch_cache(self):
+        self.assertEqual([
+            '--cache-from type=registry,ref=repo-build-cache:feature-dockerfile',
+            '--cache-from type=registry,ref=repo-build-cache:master-dockerfile',
+            '--cache-to type=registry,ref=repo-build-cache:feature-dockerfile,mode=max,image-manifest=true,'
+            'oci-mediatypes=true',
+        ], cache_options('repo-build-cache', 'feature'))
+
+    def test_default_branch_imports_its_cache_once(self):
+        self.assertEqual(2, len(cache_options('repo-build-cache', 'master')))
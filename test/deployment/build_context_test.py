@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+from unittest import TestCase
+
+from cloudlift.deployment.build_context import DockerIgnore, context_tag, write_context_tar
+
+
+class TestDockerIgnore(TestCase):
+    def test_last_matching_pattern_decides(self):
+        dockerignore = DockerIgnore(['# comment', 'docs', '**/*.md', '!docs/keep.md', '/tmp?', 'src/[!a]'])
+
+        self.assertTrue(dockerignore.excludes('docs/guide/index.html'))
+        self.assertTrue(dockerignore.excludes('README.md'))
+        self.assertTrue(dockerignore.excludes('app/CHANGELOG.md'))
+        self.assertFalse(dockerignore.excludes('docs/keep.md'))
+        self.assertTrue(dockerignore.excludes('tmp1/file'))
+        self.assertFalse(dockerignore.excludes('tmp/file'))
+        self.assertTrue(dockerignore.excludes('src/b/main.py'))
+        self.assertFalse(dockerignore.excludes('src/a/main.py'))
+
+
+class TestContextTag(TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.working_dir)
+        self._write('Dockerfile', 'FROM python:3.8\nCOPY app /app\n')
+        self._write('.dockerignore', 'docs\n*.md\n')
+        self._write('app/main.py', 'print("hello")\n')
+        self._write('README.md', 'readme\n')
+
+    def _write(self, path, content):
+        full_path = os.path.join(self.working_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as context_file:
+            context_file.write(content)
+
+    def _tag(self, **kwargs):
+        return context_tag(self.working_dir, **kwargs)
+
+    def test_is_stable_and_prefixed(self):
+        self.assertTrue(self._tag().startswith('ctx-'))
+        self.assertEqual(self._tag(), self._tag())
+
+    def test_ignores_files_outside_the_context(self):
+        tag = self._tag()
+        self._write('README.md', 'changed readme\n')
+        self._write('docs/guide.txt', 'guide\n')
+
+        self.assertEqual(tag, self._tag())
+
+    def test_changes_with_context_files(self):
+        tag = self._tag()
+        self._write('app/main.py', 'print("changed")\n')
+
+        self.assertNotEqual(tag, self._tag())
+
+    def test_changes_with_dockerfile_and_build_args(self):
+        self._write('Dockerfile.worker', 'FROM python:3.8\n')
+        dockerfile_tag = self._tag()
+
+        self.assertNotEqual(dockerfile_tag, self._tag(dockerfile=os.path.join(self.working_dir, 'Dockerfile.worker')))
+        self.assertNotEqual(self._tag(build_args={'A': '1'}), self._tag(build_args={'A': '2'}))
+        self.assertEqual(self._tag(build_args={'A': '1', 'B': '2'}), self._tag(build_args={'B': '2', 'A': '1'}))
+
+    def test_changes_with_platforms(self):
+        tag = self._tag()
+        arm64_tag = self._tag(platforms=['linux/arm64'])
+
+        self.assertNotEqual(tag, arm64_tag)
+        self.assertNotEqual(arm64_tag, self._tag(platforms=['linux/amd64', 'linux/arm64']))
+        self.assertEqual(self._tag(platforms=['linux/amd64', 'linux/arm64']),
+                         self._tag(platforms=['linux/arm64', 'linux/amd64']))
+
+    def test_context_tar_holds_the_context_and_the_dockerfile(self):
+        self._write('.dockerignore', 'docs\n*.md\nDockerfile*\n')
+        outside_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside_dir)
+        outside_dockerfile = os.path.join(outside_dir, 'Dockerfile')
+        with open(outside_dockerfile, 'w') as dockerfile:
+            dockerfile.write('FROM python:3.8\n')
+
+        archives = {}
+        for dockerfile in [None, outside_dockerfile]:
+            context = io.BytesIO()
+            name = write_context_tar(context, self.working_dir, dockerfile)
+            context.seek(0)
+            with tarfile.open(fileobj=context) as archive:
+                archives[name] = sorted(archive.getnames())
+
+        self.assertEqual({'Dockerfile': ['.dockerignore', 'Dockerfile', 'app/main.py'],
+                          '.dockerfile.cloudlift': ['.dockerfile.cloudlift', '.dockerignore', 'app/main.py']},
+                         archives)
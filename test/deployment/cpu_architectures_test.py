@@ -0,0 +1,13 @@
+from unittest import TestCase
+
+from cloudlift.deployment.cpu_architectures import get_image_platforms
+
+
+class TestImagePlatforms(TestCase):
+    def test_plain_build_when_every_service_runs_on_x86_64(self):
+        self.assertIsNone(get_image_platforms({'Web': {}, 'Worker': {'cpu_architecture': 'x86_64'}}))
+
+    def test_builds_for_every_architecture_of_the_services(self):
+        self.assertEqual(['linux/amd64', 'linux/arm64'],
+                         get_image_platforms({'Web': {'cpu_architecture': 'arm64'}, 'Worker': {}}))
+        self.assertEqual(['linux/arm64'], get_image_platforms({'Web': {'cpu_architecture': 'arm64'}}))
@@ -10,8 +10,11 @@ from dateutil.tz.tz import tzlocal
 from cloudlift.deployment.deployer import is_deployed, \
     record_deployment_failure_metric, deploy_and_wait, build_config, get_env_sample_file_name, \
     get_env_sample_file_contents, get_namespaces_from_directory, find_duplicate_keys, get_sample_keys, get_secret_name, \
-    get_automated_injected_secret_name, create_new_task_definition
+    get_automated_injected_secret_name, create_new_task_definition, fetch_and_print_new_events, deploy_new_version, \
+    rollout_state
+from cloudlift.deployment.deployment_context import DeploymentContext
 from cloudlift.deployment.ecs import EcsService, EcsTaskDefinition
+from cloudlift.deployment.task_definition_builder import TaskDefinitionBuilder
 from cloudlift.exceptions import UnrecoverableException
 
 
@@ -80,8 +83,9 @@ class TestDeployer(TestCase):
         }
         assert not is_deployed(service)
 
+    @patch("cloudlift.deployment.deployer.DeploymentIndex")
     @patch("cloudlift.deployment.deployer.build_config")
-    def test_create_new_task_definition(self, mock_build_config):
+    def test_create_new_task_definition(self, mock_build_config, mock_deployment_index):
         client = MagicMock()
         service_configuration = {
             'command': './start_script.sh',
@@ -133,10 +137,8 @@ class TestDeployer(TestCase):
             'tags': [{'key': 'deployment_identifier', 'value': 'id-00'}],
         }
         create_new_task_definition(
+            context=DeploymentContext(client, 'cluster-test', 'dummy-123', MagicMock()),
             color='white',
-            client=client,
-            cluster_name='cluster-test',
-            ecs_service_name='dummy-123',
             ecs_service_logical_name='Dummy',
             deployment_identifier='id-01',
             service_name='dummy-test',
@@ -155,13 +157,137 @@ class TestDeployer(TestCase):
         client.register_task_definition.assert_called_with(**expected)
 
 
+    @patch("cloudlift.deployment.deployer.DeploymentIndex")
+    @patch("cloudlift.deployment.deployer.log_with_color")
+    @patch("cloudlift.deployment.deployer.TaskDefinitionBuilder")
+    @patch("cloudlift.deployment.deployer.build_config")
+    @patch("cloudlift.deployment.deployer.EcsClient")
+    def test_deploy_new_version_describes_the_service_once(self, mock_ecs_client, mock_build_config, mock_builder, *_):
+        client = mock_ecs_client.return_value
+        service = {'serviceName': 'dummy-123', 'taskDefinition': 'tdARN1', 'desiredCount': 2, 'runningCount': 2,
+                   'events': [{'id': 'e1', 'message': 'steady', 'createdAt': datetime.now()}],
+                   'deployments': [{'status': 'PRIMARY'}]}
+        client.describe_services.return_value = {'services': [service]}
+        client.describe_task_definition.return_value = {
+            'taskDefinition': {'taskDefinitionArn': 'tdARN1', 'family': 'dummyFamily',
+                               'containerDefinitions': [{'name': 'Dummy', 'image': 'nginx:v1', 'essential': True}]},
+            'tags': [],
+        }
+        client.register_task_definition.return_value = {
+            'taskDefinition': {'taskDefinitionArn': 'tdARN2', 'family': 'dummyFamily'}}
+        client.update_service.return_value = {'service': dict(service, taskDefinition='tdARN2')}
+        mock_builder.return_value.build_task_definition.return_value = {
+            'family': 'dummyFamily', 'containerDefinitions': [{'name': 'Dummy', 'image': 'nginx:v2'}],
+            'tags': [{'key': 'deployment_identifier', 'value': 'id-01'}]}
+        monitor = MagicMock()
+        monitor.watch.return_value.next.return_value = EcsService('cluster-test', dict(service, taskDefinition='tdARN2'))
+
+        deploy_new_version(cluster_name='cluster-test', ecs_service_name='dummy-123', ecs_service_logical_name='Dummy',
+                           deployment_identifier='id-01', service_name='dummy-test',
+                           sample_env_file_path='./env.sample', timeout_seconds=5, env_name='test',
+                           secrets_name='dummy-test-secrets', service_configuration={}, region='region1',
+                           ecr_image_uri='nginx:v2', metrics=MagicMock(), monitor=monitor)
+
+        self.assertEqual(1, client.describe_services.call_count)
+        self.assertEqual(1, client.describe_task_definition.call_count)
+        self.assertEqual(1, client.register_task_definition.call_count)
+        client.update_service.assert_called_once_with(cluster='cluster-test', service='dummy-123', desired_count=2,
+                                                      task_definition='tdARN2')
+
+
+    @patch("cloudlift.deployment.deployer.DeploymentIndex")
+    @patch("cloudlift.deployment.deployer.log_with_color")
+    @patch("cloudlift.deployment.deployer.TaskDefinitionBuilder")
+    @patch("cloudlift.deployment.deployer.build_config")
+    @patch("cloudlift.deployment.deployer.EcsClient")
+    def test_deploy_new_version_skips_an_unchanged_task_definition(self, mock_ecs_client, mock_build_config,
+                                                                    mock_builder, mock_log_with_color,
+                                                                    mock_deployment_index):
+        client = mock_ecs_client.return_value
+        client.describe_services.return_value = {'services': [{
+            'serviceName': 'dummy-123', 'taskDefinition': 'tdARN1', 'desiredCount': 2, 'runningCount': 2,
+            'events': [], 'deployments': [{'status': 'PRIMARY'}]}]}
+        client.describe_task_definition.return_value = {
+            'taskDefinition': {'taskDefinitionArn': 'tdARN1', 'family': 'dummyFamily',
+                               'containerDefinitions': [{'name': 'Dummy', 'image': 'nginx:v1', 'essential': True}]},
+            'tags': [{'key': 'deployment_identifier', 'value': 'id-00'}, {'key': 'fingerprint', 'value': 'f1'}],
+        }
+        mock_builder.return_value.build_task_definition.return_value = {
+            'family': 'dummyFamily', 'containerDefinitions': [{'name': 'Dummy', 'image': 'nginx:v1'}],
+            'tags': [{'key': 'deployment_identifier', 'value': 'id-01'}, {'key': 'fingerprint', 'value': 'f1'}]}
+        deploy_kwargs = dict(cluster_name='cluster-test', ecs_service_name='dummy-123',
+                             ecs_service_logical_name='Dummy', deployment_identifier='id-01',
+                             service_name='dummy-test', sample_env_file_path='./env.sample', timeout_seconds=5,
+                             env_name='test', secrets_name='dummy-test-secrets', service_configuration={},
+                             region='region1', ecr_image_uri='nginx:v1', metrics=MagicMock())
+
+        deploy_new_version(**deploy_kwargs)
+
+        client.register_task_definition.assert_not_called()
+        client.update_service.assert_not_called()
+        mock_deployment_index.assert_called_once_with('dummyFamily', 'id-01')
+        mock_deployment_index.return_value.set_task_definition_arn.assert_called_once_with('tdARN1')
+
+        client.register_task_definition.return_value = {
+            'taskDefinition': {'taskDefinitionArn': 'tdARN2', 'family': 'dummyFamily'}}
+        with patch("cloudlift.deployment.deployer.deploy_task_definition") as mock_deploy_task_definition:
+            deploy_new_version(force=True, **deploy_kwargs)
+
+        client.register_task_definition.assert_called_once()
+        mock_deployment_index.assert_called_with('dummyFamily', 'id-01')
+        mock_deployment_index.return_value.set_task_definition_arn.assert_called_with('tdARN2')
+        mock_deploy_task_definition.assert_called_once()
+
+
+    @patch("cloudlift.deployment.deployer.DeploymentIndex")
+    @patch("cloudlift.deployment.deployer.log_with_color")
+    @patch("cloudlift.deployment.deployer.build_config")
+    @patch("cloudlift.deployment.deployer.EcsClient")
+    def test_deploy_new_version_deploys_a_tag_moved_to_another_image(self, mock_ecs_client, mock_build_config, *_):
+        service_configuration = {'command': None, 'memory_reservation': 100}
+        mock_build_config.return_value = {'DummyContainer': {'secrets': {}, 'environment': {}}}
+        running = TaskDefinitionBuilder(environment='test', service_name='Dummy',
+                                        configuration=service_configuration, region='region1',
+                                        application_name='dummy-test').build_task_definition(
+            container_configurations=mock_build_config.return_value, ecr_image_uri='repo:v1-dirty',
+            fallback_task_role='role', fallback_task_execution_role='execution_role', deployment_identifier='id-00',
+            image_digest='sha256:01')
+        client = mock_ecs_client.return_value
+        client.describe_services.return_value = {'services': [{
+            'serviceName': 'dummy-123', 'taskDefinition': 'tdARN1', 'desiredCount': 2, 'runningCount': 2,
+            'events': [], 'deployments': [{'status': 'PRIMARY'}]}]}
+        client.describe_task_definition.return_value = {
+            'taskDefinition': dict(running, taskDefinitionArn='tdARN1'), 'tags': running['tags']}
+        client.register_task_definition.return_value = {
+            'taskDefinition': {'taskDefinitionArn': 'tdARN2', 'family': 'testDummyFamily'}}
+        deploy_kwargs = dict(cluster_name='cluster-test', ecs_service_name='dummy-123',
+                             ecs_service_logical_name='Dummy', deployment_identifier='id-01',
+                             service_name='dummy-test', sample_env_file_path='./env.sample', timeout_seconds=5,
+                             env_name='test', secrets_name='dummy-test-secrets',
+                             service_configuration=service_configuration, region='region1',
+                             ecr_image_uri='repo:v1-dirty', metrics=MagicMock())
+
+        deploy_new_version(ecr_image_digest='sha256:01', **deploy_kwargs)
+        client.register_task_definition.assert_not_called()
+
+        with patch("cloudlift.deployment.deployer.deploy_task_definition") as mock_deploy_task_definition:
+            deploy_new_version(ecr_image_digest='sha256:02', **deploy_kwargs)
+
+        client.register_task_definition.assert_called_once()
+        mock_deploy_task_definition.assert_called_once()
+
 class TestDeployAndWait(TestCase):
     @staticmethod
     def create_ecs_service_with_status(status):
         return EcsService('cluster-testing', status)
 
-    def test_deploy_and_wait_successful_run(self):
+    def create_deployment(self):
         deployment = MagicMock()
+        deployment.deploy.return_value = self.create_ecs_service_with_status({'deployments': []})
+        return deployment
+
+    def test_deploy_and_wait_successful_run(self):
+        deployment = self.create_deployment()
         deployment.get_service.side_effect = [
             self.create_ecs_service_with_status({
                 'desiredCount': 5,
@@ -198,7 +324,7 @@ class TestDeployAndWait(TestCase):
 
     @patch("cloudlift.deployment.deployer.log_err")
     def test_deploy_and_wait_timeout(self, mock_log_err):
-        deployment = MagicMock()
+        deployment = self.create_deployment()
         deployment.get_service.return_value = self.create_ecs_service_with_status({
             'desiredCount': 5,
             'runningCount': 0,
@@ -224,7 +350,7 @@ class TestDeployAndWait(TestCase):
 
     @patch("cloudlift.deployment.deployer.log_err")
     def test_deploy_and_wait_unable_to_place_tasks_initially_succeeds_eventually(self, mock_log_err):
-        deployment = MagicMock()
+        deployment = self.create_deployment()
         start_time = datetime.now(tz=tzlocal())
         deployment.get_service.side_effect = [
             self.create_ecs_service_with_status({
@@ -281,7 +407,7 @@ class TestDeployAndWait(TestCase):
 
     @patch("cloudlift.deployment.deployer.log_err")
     def test_deploy_and_wait_unable_to_place_tasks_till_timeout(self, mock_log_err):
-        deployment = MagicMock()
+        deployment = self.create_deployment()
         start_time = datetime.now(tz=tzlocal())
         deployment.get_service.side_effect = [
             self.create_ecs_service_with_status({
@@ -336,37 +462,103 @@ class TestDeployAndWait(TestCase):
         deployment.deploy.assert_called_with(new_task_definition)
         mock_log_err.assert_called_with('Deployment timed out!')
 
+    def test_deploy_and_wait_records_the_timings_of_the_deployment(self):
+        deployment = MagicMock()
+        deployment.service_name = 'dummy-123'
+        deployment.deploy.return_value = self.create_ecs_service_with_status({'deployments': [
+            {'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'IN_PROGRESS', 'runningCount': 0},
+        ]})
+        deployment.get_service.side_effect = [
+            self.create_ecs_service_with_status({'events': [], 'deployments': [
+                {'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'IN_PROGRESS', 'runningCount': 1},
+            ]}),
+            self.create_ecs_service_with_status({'events': [], 'deployments': [
+                {'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'COMPLETED', 'runningCount': 2},
+            ]}),
+        ]
+        metrics = MagicMock()
+
+        with patch('cloudlift.deployment.deployer.log_with_color'):
+            self.assertTrue(deploy_and_wait(deployment, EcsTaskDefinition({'containerDefinitions': []}), 'green', 15,
+                                            metrics=metrics))
+
+        self.assertEqual(['UpdateService', 'FirstTaskRunning', 'SteadyState'],
+                         [recorded[0][0] for recorded in metrics.record_duration.call_args_list])
+        for recorded in metrics.record_duration.call_args_list:
+            self.assertEqual({'ServiceName': 'dummy-123'}, recorded[1])
+
+    def test_rollout_state_follows_the_deployment(self):
+        def state(*deployments, deployment_id='ecs-svc/2'):
+            service = self.create_ecs_service_with_status({'desiredCount': 2, 'runningCount': 2,
+                                                           'deployments': list(deployments)})
+            return rollout_state(service, deployment_id)
+
+        self.assertEqual('COMPLETED', state({'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'COMPLETED'},
+                                            {'id': 'ecs-svc/1', 'status': 'ACTIVE', 'rolloutState': 'COMPLETED'}))
+        # Until the circuit breaker gives up on it
+        self.assertEqual('IN_PROGRESS', state({'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'IN_PROGRESS',
+                                               'failedTasks': 5}))
+        self.assertEqual('FAILED', state({'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'FAILED'}))
+        # Rolled back by the circuit breaker
+        self.assertEqual('FAILED', state({'id': 'ecs-svc/3', 'status': 'PRIMARY', 'rolloutState': 'IN_PROGRESS'},
+                                         {'id': 'ecs-svc/2', 'status': 'ACTIVE', 'rolloutState': 'IN_PROGRESS'}))
+        self.assertEqual('FAILED', state({'id': 'ecs-svc/3', 'status': 'PRIMARY', 'rolloutState': 'COMPLETED'}))
+        self.assertEqual('COMPLETED', state({'id': 'ecs-svc/2', 'status': 'PRIMARY'}, deployment_id=None))
+        self.assertEqual('IN_PROGRESS', state({'id': 'ecs-svc/2', 'status': 'PRIMARY'},
+                                              {'id': 'ecs-svc/1', 'status': 'ACTIVE'}, deployment_id=None))
+
+    @patch("cloudlift.deployment.deployer.log_with_color")
+    @patch("cloudlift.deployment.deployer.log_err")
+    def test_deploy_and_wait_stops_at_a_failed_rollout_with_the_stopped_task_reasons(self, mock_log_err,
+                                                                                   mock_log_with_color):
+        deployment = MagicMock()
+        deployment.deploy.return_value = self.create_ecs_service_with_status({'deployments': [
+            {'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'IN_PROGRESS', 'failedTasks': 0},
+            {'id': 'ecs-svc/1', 'status': 'ACTIVE', 'rolloutState': 'COMPLETED'},
+        ]})
+        deployment.get_service.return_value = self.create_ecs_service_with_status({
+            'desiredCount': 2, 'runningCount': 2, 'events': [],
+            'deployments': [
+                {'id': 'ecs-svc/2', 'status': 'PRIMARY', 'rolloutState': 'FAILED', 'failedTasks': 10},
+                {'id': 'ecs-svc/1', 'status': 'ACTIVE', 'rolloutState': 'COMPLETED'},
+            ]})
+        crashed = {'stoppedReason': 'Essential container in task exited',
+                   'containers': [{'name': 'DummyContainer', 'exitCode': 1}]}
+        deployment.get_stopped_tasks.return_value = [crashed, crashed]
+        started_at = datetime.now()
+
+        self.assertFalse(deploy_and_wait(deployment, EcsTaskDefinition({'containerDefinitions': []}), 'green', 60))
+
+        self.assertLess(datetime.now() - started_at, timedelta(seconds=5))
+        mock_log_err.assert_called_with('Deployment failed!')
+        deployment.get_stopped_tasks.assert_called_once_with('ecs-svc/2')
+        mock_log_with_color.assert_called_with(
+            '2 stopped task(s): Essential container in task exited (DummyContainer: exit code 1)', 'green')
+
+    @patch("cloudlift.deployment.deployer.log_with_color")
+    def test_fetch_and_print_new_events_prints_unseen_events_oldest_first(self, mock_log_with_color):
+        start_time = datetime.now(tz=tzlocal())
+        service = self.create_ecs_service_with_status({'events': [
+            {'id': 'c', 'message': '(service test) has reached a steady state.',
+             'createdAt': start_time + timedelta(seconds=2)},
+            {'id': 'b', 'message': '(service test) has started 1 tasks.', 'createdAt': start_time + timedelta(seconds=1)},
+            {'id': 'a', 'message': '(service test) has stopped 1 tasks.', 'createdAt': start_time},
+        ]})
+        seen_event_ids = {'a'}
+
+        fetch_and_print_new_events(service, seen_event_ids, 'green')
+        fetch_and_print_new_events(service, seen_event_ids, 'green')
+
+        self.assertEqual({'a', 'b', 'c'}, seen_event_ids)
+        self.assertEqual(['test has started 1 tasks.', 'test has reached a steady state.'],
+                         [call[0][0] for call in mock_log_with_color.call_args_list])
+
 
-@patch('cloudlift.deployment.deployer.datetime')
-@patch('cloudlift.deployment.deployer.boto3.client')
-def test_create_deployment_timeout_alarm(mock_boto3_client, dt):
-    mock_boto3_client.put_metric_data = MagicMock()
-    cluster_name = sentinel.cluster_name
+def test_create_deployment_timeout_alarm():
+    metrics = MagicMock()
     service_name = sentinel.service_name
-    now = datetime.now()
-    dt.utcnow = MagicMock(return_value=now)
-    record_deployment_failure_metric(cluster_name, service_name)
-    mock_boto3_client.assert_called_with('cloudwatch')
-    mock_boto3_client.return_value.put_metric_data.assert_called_with(
-        Namespace='ECS/DeploymentMetrics',
-        MetricData=[
-            {
-                "MetricName": 'FailedCloudliftDeployments',
-                "Value": 1,
-                "Timestamp": now,
-                "Dimensions": [
-                    {
-                        'Name': 'ClusterName',
-                        'Value': cluster_name
-                    },
-                    {
-                        'Name': 'ServiceName',
-                        'Value': service_name
-                    }
-                ]
-            }
-        ]
-    )
+    record_deployment_failure_metric(metrics, service_name)
+    metrics.record.assert_called_with('FailedCloudliftDeployments', 1, ServiceName=service_name)
 
 
 class TestBuildConfig(TestCase):
@@ -0,0 +1,69 @@
+from datetime import datetime
+from unittest import TestCase
+
+from botocore.exceptions import ClientError
+from mock import patch
+
+from cloudlift.deployment.deployment_metrics import DeploymentMetrics
+
+
+class TestDeploymentMetrics(TestCase):
+    @patch('cloudlift.deployment.deployment_metrics.datetime')
+    @patch('cloudlift.deployment.deployment_metrics.get_client')
+    def test_publishes_the_buffered_metrics_in_one_request_in_the_region(self, mock_get_client, mock_datetime):
+        now = datetime.now()
+        mock_datetime.utcnow.return_value = now
+        metrics = DeploymentMetrics('cluster-test', 'region1')
+
+        metrics.record_duration('ImageBuild', 42.1234, ApplicationName='dummy')
+        metrics.record('FailedCloudliftDeployments', 1, ServiceName='dummy-123')
+        mock_get_client.assert_not_called()
+        metrics.publish()
+        metrics.publish()
+
+        mock_get_client.assert_called_once_with('cloudwatch', 'region1')
+        mock_get_client.return_value.put_metric_data.assert_called_once_with(
+            Namespace='ECS/DeploymentMetrics',
+            MetricData=[
+                {
+                    "MetricName": 'ImageBuildSeconds',
+                    "Value": 42.123,
+                    "Unit": 'Seconds',
+                    "Timestamp": now,
+                    "Dimensions": [{'Name': 'ClusterName', 'Value': 'cluster-test'},
+                                   {'Name': 'ApplicationName', 'Value': 'dummy'}],
+                },
+                {
+                    "MetricName": 'FailedCloudliftDeployments',
+                    "Value": 1,
+                    "Unit": 'Count',
+                    "Timestamp": now,
+                    "Dimensions": [{'Name': 'ClusterName', 'Value': 'cluster-test'},
+                                   {'Name': 'ServiceName', 'Value': 'dummy-123'}],
+                },
+            ]
+        )
+
+    @patch('cloudlift.deployment.deployment_metrics.time')
+    def test_phase_records_the_duration_of_the_block_even_when_it_fails(self, mock_time):
+        mock_time.side_effect = [100.0, 102.5]
+        metrics = DeploymentMetrics('cluster-test', 'region1')
+
+        with self.assertRaises(KeyError):
+            with metrics.phase('TaskDefinitionRegister', ServiceName='dummy-123'):
+                raise KeyError
+
+        self.assertEqual([('TaskDefinitionRegisterSeconds', 2.5)],
+                         [(metric['MetricName'], metric['Value']) for metric in metrics._metric_data])
+
+    @patch('cloudlift.deployment.deployment_metrics.log_warning')
+    @patch('cloudlift.deployment.deployment_metrics.get_client')
+    def test_failing_to_publish_only_logs_a_warning(self, mock_get_client, mock_log_warning):
+        mock_get_client.return_value.put_metric_data.side_effect = ClientError(
+            {'Error': {'Code': 'AccessDenied'}}, 'PutMetricData')
+        metrics = DeploymentMetrics('cluster-test', 'region1')
+        metrics.record('FailedCloudliftDeployments', 1, ServiceName='dummy-123')
+
+        metrics.publish()
+
+        mock_log_warning.assert_called_once()
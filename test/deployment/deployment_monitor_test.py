@@ -0,0 +1,80 @@
+from datetime import datetime
+from unittest import TestCase
+
+from mock import MagicMock
+
+from cloudlift.deployment.deployer import wait_for_finish
+from cloudlift.deployment.deployment_monitor import DeploymentMonitor, ServiceWatch
+from cloudlift.exceptions import UnrecoverableException
+
+
+def _service_definition(name, running_count):
+    return {
+        'serviceName': name,
+        'desiredCount': 2,
+        'runningCount': running_count,
+        'events': [{'message': 'event for ' + name, 'createdAt': datetime.now()}],
+        'deployments': [{'status': 'PRIMARY', 'desiredCount': 2, 'runningCount': running_count}],
+    }
+
+
+def _describe_services(cluster_name, service_names):
+    return {'services': [_service_definition(name, 2) for name in service_names], 'failures': []}
+
+
+class TestDeploymentMonitor(TestCase):
+    def test_describes_watched_services_in_batches_of_ten(self):
+        client = MagicMock()
+        client.describe_services_batch.side_effect = _describe_services
+        monitor = DeploymentMonitor(client, 'cluster-test')
+        watches = [monitor.watch('service-{:02d}'.format(index)) for index in range(25)]
+
+        monitor.poll()
+
+        self.assertEqual(3, client.describe_services_batch.call_count)
+        self.assertEqual([10, 10, 5], [len(call[0][1]) for call in client.describe_services_batch.call_args_list])
+        self.assertEqual('service-24', watches[24].next(timeout=0).name)
+
+    def test_stops_polling_unwatched_services(self):
+        client = MagicMock()
+        client.describe_services_batch.side_effect = _describe_services
+        monitor = DeploymentMonitor(client, 'cluster-test')
+        monitor.watch('first')
+        monitor.watch('second')
+        monitor.unwatch('first')
+
+        monitor.poll()
+
+        client.describe_services_batch.assert_called_once_with('cluster-test', ['second'])
+
+    def test_raises_describe_failures_to_the_waiting_job(self):
+        client = MagicMock()
+        client.describe_services_batch.return_value = {'services': [], 'failures': [
+            {'arn': 'arn:aws:ecs:us-west-2:123456789012:service/cluster-test/missing', 'reason': 'MISSING'}
+        ]}
+        monitor = DeploymentMonitor(client, 'cluster-test')
+        watch = monitor.watch('missing')
+
+        monitor.poll()
+
+        with self.assertRaises(UnrecoverableException) as error:
+            watch.next(timeout=0)
+        self.assertEqual('Unable to describe service missing: MISSING', error.exception.value)
+
+    def test_next_returns_none_without_a_newer_description(self):
+        watch = ServiceWatch('service')
+        watch.publish(service='described')
+
+        self.assertEqual('described', watch.next(timeout=0))
+        self.assertIsNone(watch.next(timeout=0))
+
+    def test_wait_for_finish_uses_the_monitor_instead_of_polling_itself(self):
+        client = MagicMock()
+        client.describe_services_batch.side_effect = _describe_services
+        action = MagicMock(service_name='service-test')
+
+        with DeploymentMonitor(client, 'cluster-test', interval=0.01) as monitor:
+            self.assertTrue(wait_for_finish(action, set(), 'green', datetime.now().timestamp() + 5, monitor))
+
+        action.get_service.assert_not_called()
+        self.assertNotIn('service-test', monitor._watches)
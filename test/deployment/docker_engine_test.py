@@ -0,0 +1,134 @@
+import base64
+import io
+import json
+import os
+import shutil
+import socketserver
+import tarfile
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from unittest import TestCase
+from urllib.parse import parse_qs, urlparse
+
+from mock import patch
+
+from cloudlift.deployment import docker_engine
+from cloudlift.deployment.docker_engine import DockerEngine, DockerEngineError, PushProgress
+
+
+class FakeDaemonHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._reply(200, b'OK')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append((self.command, self.path, dict(self.headers), body))
+        status, events = self.server.responses.pop(0)
+        self._reply(status, b''.join(json.dumps(event).encode('utf-8') + b'\r\n' for event in events))
+
+    do_DELETE = do_POST
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TestDockerEngine(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.socket_path = os.path.join(self.tmp_dir, 'docker.sock')
+        self.daemon = FakeDaemon(self.socket_path, FakeDaemonHandler)
+        self.daemon.requests = []
+        self.daemon.responses = []
+        threading.Thread(target=self.daemon.serve_forever, daemon=True).start()
+        self.addCleanup(self.daemon.server_close)
+        self.addCleanup(self.daemon.shutdown)
+        self.engine = DockerEngine(self.socket_path, timeout=5)
+
+    def test_builds_from_the_context_archive_and_returns_the_image_id(self):
+        context_dir = os.path.join(self.tmp_dir, 'app')
+        os.makedirs(context_dir)
+        with open(os.path.join(context_dir, 'Dockerfile'), 'w') as dockerfile:
+            dockerfile.write('FROM scratch\n')
+        self.daemon.responses.append((200, [{'stream': 'Step 1/1 : FROM scratch\n'}, {'aux': {'ID': 'sha256:img'}}]))
+        events = []
+
+        image_id = self.engine.build(context_dir, 'repo:v1', build_args={'A': '1'}, cache_from=['repo:latest'],
+                                     on_event=events.append)
+
+        self.assertEqual('sha256:img', image_id)
+        self.assertEqual('Step 1/1 : FROM scratch\n', events[0]['stream'])
+        method, path, headers, body = self.daemon.requests[0]
+        params = parse_qs(urlparse(path).query)
+        self.assertEqual(('POST', '/build'), (method, urlparse(path).path))
+        self.assertEqual(['repo:v1'], params['t'])
+        self.assertEqual(['Dockerfile'], params['dockerfile'])
+        self.assertEqual({'A': '1'}, json.loads(params['buildargs'][0]))
+        self.assertEqual(['repo:latest'], json.loads(params['cachefrom'][0]))
+        self.assertEqual('application/x-tar', headers['Content-Type'])
+        with tarfile.open(fileobj=io.BytesIO(body)) as archive:
+            self.assertEqual(['Dockerfile'], archive.getnames())
+
+    def test_raises_the_error_message_of_the_daemon(self):
+        self.daemon.responses.append((200, [
+            {'stream': 'Step 1/2 : RUN make\n'},
+            {'error': 'failed',
+             'errorDetail': {'message': "The command '/bin/sh -c make' returned a non-zero code: 2"}},
+        ]))
+
+        with self.assertRaises(DockerEngineError) as error:
+            self.engine.push('acc.dkr.ecr.region.amazonaws.com/repo', 'v1', {})
+
+        self.assertEqual("The command '/bin/sh -c make' returned a non-zero code: 2", error.exception.value)
+
+    def test_pushes_with_registry_credentials_and_counts_layers(self):
+        self.daemon.responses.append((200, [
+            {'status': 'The push refers to repository [acc.dkr.ecr.region.amazonaws.com/repo]'},
+            {'status': 'Pushing', 'id': 'l1', 'progressDetail': {'current': 1, 'total': 2}},
+            {'status': 'Pushed', 'id': 'l1'},
+            {'status': 'Layer already exists', 'id': 'l2'},
+        ]))
+        progress = PushProgress()
+
+        with patch('builtins.print'):
+            self.engine.push('acc.dkr.ecr.region.amazonaws.com/repo', 'v1',
+                             {'username': 'AWS', 'password': 'token', 'serveraddress': 'https://acc'},
+                             on_event=progress)
+
+        _, path, headers, _ = self.daemon.requests[0]
+        self.assertEqual('/images/acc.dkr.ecr.region.amazonaws.com/repo/push?tag=v1', path)
+        self.assertEqual({'username': 'AWS', 'password': 'token', 'serveraddress': 'https://acc'},
+                         json.loads(base64.urlsafe_b64decode(headers['X-Registry-Auth'])))
+        self.assertEqual((1, 1), (progress.pushed, progress.existing))
+
+    def test_raises_for_failed_requests(self):
+        self.daemon.responses.append((404, [{'message': 'No such image: repo:v1'}]))
+
+        with self.assertRaises(DockerEngineError) as error:
+            self.engine.tag('repo:v1', 'acc.dkr.ecr.region.amazonaws.com/repo', 'v1')
+
+        self.assertEqual('Docker engine request failed (404): No such image: repo:v1', error.exception.value)
+
+    def test_local_engine_uses_the_unix_socket_of_docker_host(self):
+        with patch.dict(os.environ, {'DOCKER_HOST': 'unix://' + self.socket_path}):
+            self.assertEqual(self.socket_path, docker_engine.local_engine().socket_path)
+
+    def test_local_engine_is_none_without_a_reachable_unix_socket(self):
+        for environment in [{'DOCKER_HOST': 'tcp://127.0.0.1:2375'},
+                            {'DOCKER_HOST': 'unix://' + os.path.join(self.tmp_dir, 'missing.sock')},
+                            {'DOCKER_HOST': 'unix://' + self.socket_path, 'CLOUDLIFT_DOCKER_CLI': '1'}]:
+            docker_engine.clear_local_engine()
+            with patch.dict(os.environ, environment):
+                self.assertIsNone(docker_engine.local_engine())
+
@@ -1,9 +1,15 @@
-from cloudlift.deployment import ECR
+from cloudlift.deployment import ECR, docker_engine
+from cloudlift.deployment.ecr import INDEX_MEDIA_TYPES, MANIFEST_MEDIA_TYPES, buildx_builder, clear_registry_logins
+from cloudlift.exceptions import UnrecoverableException
 from unittest import TestCase
+from datetime import datetime, timedelta
+from dateutil.tz import tzutc
+import base64
 import boto3
 import json
 import os
-from unittest.mock import patch, MagicMock, call
+import subprocess
+from unittest.mock import ANY, patch, MagicMock, call
 
 
 class TestECR(TestCase):
@@ -11,6 +17,17 @@ class TestECR(TestCase):
         patcher = patch.object(boto3.session.Session, 'client')
         self.addCleanup(patcher.stop)
         patcher.start()
+        git_patcher = patch('cloudlift.utils.git_metadata.subprocess.check_output', side_effect=_mock_git_calls)
+        self.addCleanup(git_patcher.stop)
+        git_patcher.start()
+        # Docker goes through the CLI unless a test hands in an engine
+        engine_patcher = patch('cloudlift.deployment.ecr.docker_engine.local_engine', return_value=None)
+        self.addCleanup(engine_patcher.stop)
+        self.mock_local_engine = engine_patcher.start()
+        # buildx builds use the current builder unless a test says otherwise
+        builder_patcher = patch('cloudlift.deployment.ecr.buildx_builder', return_value=None)
+        self.addCleanup(builder_patcher.stop)
+        self.mock_buildx_builder = builder_patcher.start()
 
     def test_build_command_without_build_args(self):
         ecr = ECR("aws-region", "test-repo", "12345", None, None)
@@ -48,6 +65,85 @@ class TestECR(TestCase):
             ECR("aws-region", "test-repo", "12345", ssh="/tmp/sock")._should_enable_buildkit()
         )
 
+    @patch("cloudlift.deployment.ecr.git_metadata.get_branch", return_value='main')
+    def test_build_command_with_registry_cache(self, mock_get_branch):
+        ecr = ECR("aws-region", "test-repo", "12345", registry_cache=True)
+        cache_ref = '12345.dkr.ecr.aws-region.amazonaws.com/test-repo-build-cache:main-dockerfile'
+        default_cache_ref = '12345.dkr.ecr.aws-region.amazonaws.com/test-repo-build-cache:master-dockerfile'
+
+        self.assertEqual(
+            'docker buildx build --progress=plain --load -t test:v1 '
+            f'--cache-from type=registry,ref={cache_ref} --cache-from type=registry,ref={default_cache_ref} '
+            f'--cache-to type=registry,ref={cache_ref},mode=max,image-manifest=true,oci-mediatypes=true .',
+            ecr._build_command("test:v1")
+        )
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_multi_platform_image_is_pushed_by_buildx(self, mock_create_ecr_client, mock_check_call):
+        self.mock_local_engine.return_value = MagicMock()
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.get_authorization_token.return_value = _authorization(hours=12)
+        mock_ecr_client.describe_images.return_value = _image_details('sha256:index', 'v1')
+        ecr = ECR("aws-region", "test-repo", "12345", version="v1", platforms=['linux/amd64', 'linux/arm64'])
+
+        ecr.build_image()
+        image = ecr.push_image()
+
+        image_uri = '12345.dkr.ecr.aws-region.amazonaws.com/test-repo:v1'
+        self.assertEqual([
+            call(['docker', 'login', '-u', 'user', '-p', 'token', 'http://proxy']),
+            call(f'docker buildx build --progress=plain --platform linux/amd64,linux/arm64 --push -t {image_uri} .',
+                 env=ANY, shell=True),
+        ], mock_check_call.call_args_list)
+        self.mock_local_engine.return_value.push.assert_not_called()
+        self.assertEqual('sha256:index', image.digest)
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    def test_buildx_build_uses_the_selected_builder(self, mock_check_call):
+        self.mock_buildx_builder.return_value = 'cloudlift'
+        ecr = ECR("aws-region", "test-repo", "12345", version="v1", platforms=['linux/arm64'])
+
+        with patch.object(ecr, '_login_to_ecr'):
+            ecr._build_image()
+
+        image_uri = '12345.dkr.ecr.aws-region.amazonaws.com/test-repo:v1'
+        mock_check_call.assert_called_once_with(
+            f'docker buildx build --progress=plain --platform linux/arm64 --push --builder cloudlift -t {image_uri} .',
+            env=ANY, shell=True)
+
+    @patch("cloudlift.deployment.ecr.log_intent")
+    @patch("cloudlift.deployment.ecr.subprocess.Popen")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_build_with_registry_cache_reports_cache_hits(self, mock_create_ecr_client, mock_popen,
+                                                          mock_log_intent):
+        mock_popen.return_value.stdout = iter(['#4 [1/2] FROM python\n', '#4 CACHED\n',
+                                               '#5 [2/2] COPY . /app\n', '#5 DONE 0.1s\n'])
+        mock_popen.return_value.wait.return_value = 0
+        ecr = ECR("aws-region", "test-repo", "12345", version="v1", registry_cache=True)
+
+        with patch.object(ecr, '_login_to_ecr') as mock_login_to_ecr, \
+                patch.object(ecr, '_build_command', return_value='docker buildx build .'):
+            ecr._build_image()
+
+        mock_login_to_ecr.assert_called_once_with()
+        self.assertEqual((1, 2), ecr.build_cache_stats)
+        mock_log_intent.assert_called_with('Build cache: 1 of 2 steps cached, 1 rebuilt')
+
+    @patch("cloudlift.deployment.ecr.get_account_id", MagicMock(return_value="12345"))
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_ensure_repository_creates_build_cache_repository(self, mock_create_ecr_client):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+
+        ECR("aws-region", "test-repo", "12345", registry_cache=True).ensure_repository()
+
+        mock_ecr_client.create_repository.assert_has_calls([
+            call(repositoryName='test-repo', imageScanningConfiguration={'scanOnPush': True}),
+            call(repositoryName='test-repo-build-cache'),
+        ])
+
     @patch("cloudlift.deployment.ecr.subprocess")
     @patch.dict(os.environ, {"PATH": "/usr/bin"}, clear=True)
     def test_build_with_ssh(self, mock_subprocess):
@@ -59,27 +155,84 @@ class TestECR(TestCase):
                                                                                    'PATH': '/usr/bin'}, shell=True,
         )
 
-    @patch("boto3.session.Session")
-    @patch("boto3.client")
-    def test_if_ecr_assumes_given_role_arn(self, mock_boto_client, mock_session):
+    @patch("cloudlift.deployment.ecr.subprocess")
+    def test_build_goes_through_the_docker_cli_by_default(self, mock_subprocess):
+        engine = self.mock_local_engine.return_value = MagicMock()
+        ecr = ECR("aws-region", "test-repo", version="12345")
+
+        ecr._build_image()
+
+        engine.build.assert_not_called()
+        mock_subprocess.check_call.assert_called_once_with('docker build -t test-repo:12345 .', env=ANY, shell=True)
+
+    @patch("cloudlift.deployment.ecr.ENGINE_BUILD", True)
+    @patch("cloudlift.deployment.ecr.subprocess")
+    def test_opted_in_build_goes_through_the_docker_engine(self, mock_subprocess):
+        engine = self.mock_local_engine.return_value = MagicMock()
+        ecr = ECR("aws-region", "test-repo", version="12345", build_args={'SSH_KEY': 'key'},
+                  dockerfile='Dockerfile.worker')
+
+        ecr._build_image()
+
+        engine.build.assert_called_once_with('.', 'test-repo:12345', 'Dockerfile.worker', {'SSH_KEY': 'key'},
+                                             on_event=docker_engine.print_build_event)
+        mock_subprocess.check_call.assert_not_called()
+
+    @patch("cloudlift.deployment.ecr.ENGINE_BUILD", True)
+    @patch("cloudlift.deployment.ecr.subprocess")
+    @patch.dict(os.environ, {'PATH': '/usr/bin'}, clear=True)
+    def test_build_with_cache_from_goes_through_the_docker_cli_with_buildkit(self, mock_subprocess):
+        engine = self.mock_local_engine.return_value = MagicMock()
+        ecr = ECR("aws-region", "test-repo", version="12345", cache_from=['test-repo:latest'])
+
+        ecr._build_image()
+
+        engine.build.assert_not_called()
+        mock_subprocess.check_call.assert_called_once_with(
+            'docker build -t test-repo:12345 --cache-from test-repo:latest .',
+            env={'DOCKER_BUILDKIT': '1', 'PATH': '/usr/bin'}, shell=True,
+        )
+
+    @patch("cloudlift.deployment.ecr.ENGINE_BUILD", True)
+    @patch("cloudlift.deployment.ecr.subprocess")
+    def test_build_with_ssh_goes_through_the_docker_cli(self, mock_subprocess):
+        engine = self.mock_local_engine.return_value = MagicMock()
+        ecr = ECR("aws-region", "test-repo", version="12345", ssh="default")
+
+        ecr._build_image()
+
+        engine.build.assert_not_called()
+        mock_subprocess.check_call.assert_called_once()
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_push_goes_through_the_docker_engine_without_docker_login(self, mock_create_ecr_client,
+                                                                      mock_check_call):
+        engine = self.mock_local_engine.return_value = MagicMock()
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.get_authorization_token.return_value = _authorization(hours=12)
+        repo_path = 'acc-id.dkr.ecr.aws-region.amazonaws.com/target-repo'
+
+        ECR("aws-region", "target-repo", "acc-id", version="v1")._push_image()
+        ECR("aws-region", "target-repo", "acc-id", version="v2")._push_image()
+
+        mock_check_call.assert_not_called()
+        mock_ecr_client.get_authorization_token.assert_called_once()
+        engine.tag.assert_has_calls([call('target-repo:v1', repo_path, 'v1'), call('target-repo:v2', repo_path, 'v2')])
+        engine.push.assert_any_call(repo_path, 'v1', {
+            'username': 'user', 'password': 'token', 'serveraddress': 'http://proxy',
+        }, on_event=ANY)
+        engine.remove_image.assert_has_calls([call(repo_path + ':v1'), call(repo_path + ':v2')])
+
+    @patch("cloudlift.deployment.ecr.get_client")
+    def test_if_ecr_assumes_given_role_arn(self, mock_get_client):
         assume_role_arn = 'test-assume-role-arn'
-        mock_sts_client = MagicMock()
-        mock_boto_client.return_value = mock_sts_client
-        mock_sts_client.assume_role.return_value = {
-            'Credentials': {
-                'AccessKeyId': 'mockAccessKeyId', 'SecretAccessKey': 'mockSecretAccessKey',
-                'SessionToken': 'mockSessionToken'
-            }
-        }
 
         ECR("aws-region", "test-repo", "12345", assume_role_arn=assume_role_arn)
 
-        mock_sts_client.assume_role.assert_called_with(RoleArn=assume_role_arn, RoleSessionName='ecrCloudliftAgent')
-        mock_session.assert_called_with(
-            aws_access_key_id='mockAccessKeyId',
-            aws_secret_access_key='mockSecretAccessKey',
-            aws_session_token='mockSessionToken',
-        )
+        mock_get_client.assert_called_with('ecr', 'aws-region', role_arn=assume_role_arn,
+                                           role_session_name='ecrCloudliftAgent')
 
     @patch("cloudlift.deployment.ecr.get_account_id")
     @patch("cloudlift.deployment.ecr._create_ecr_client")
@@ -136,6 +289,27 @@ class TestECR(TestCase):
 
         self.assertEqual("acc-id.dkr.ecr.aws-region.amazonaws.com/target-repo", ecr.repo_path)
 
+    def test_for_dockerfile_shares_repository_and_build_options(self):
+        ecr = ECR("aws-region", "target-repo", "acc-id", version="v1", build_args={"A": "1"})
+
+        sidecar_ecr = ecr.for_dockerfile('Dockerfile.sidecar')
+
+        self.assertEqual('Dockerfile.sidecar', sidecar_ecr.dockerfile)
+        self.assertEqual('v1-Dockerfile.sidecar', sidecar_ecr.version)
+        self.assertEqual({"A": "1"}, sidecar_ecr.build_args)
+        self.assertIsNone(ecr.dockerfile)
+        self.assertEqual('v1', ecr.version)
+
+    def test_for_nested_dockerfile_derives_a_valid_tag(self):
+        ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
+
+        sidecar_ecr = ecr.for_dockerfile('docker/Dockerfile.sidecar')
+
+        self.assertEqual('docker/Dockerfile.sidecar', sidecar_ecr.dockerfile)
+        self.assertEqual('v1-docker-Dockerfile.sidecar', sidecar_ecr.version)
+        self.assertEqual('v1-docker-Dockerfile.sidecar', ECR("aws-region", "target-repo", "acc-id",
+                                                            dockerfile='docker/Dockerfile.sidecar')._derive_version())
+
     def test_local_image_uri(self):
         ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
 
@@ -146,32 +320,20 @@ class TestECR(TestCase):
     def test_ensure_image_in_ecr_for_explicit_version(self, mock_create_ecr_client, mock_subprocess):
         mock_ecr_client = MagicMock()
         mock_create_ecr_client.return_value = mock_ecr_client
-        mock_ecr_client.batch_get_image.return_value = {'images': 'image-01'}
-
-        def mock_check_output(cmd):
-            if " ".join(cmd) == "git rev-list -n 1 HEAD":
-                mock = MagicMock()
-                mock.strip.return_value.decode.return_value = Exception('mocked error')
-                return mock
-
-            if " ".join(cmd) == 'git show -s --format="%ct" HEAD':
-                mock = MagicMock()
-                mock.strip.return_value.decode.return_value = '"1602236172"'
-                return mock
-
-            mock = MagicMock()
-            mock.decode.return_value = None
-            return mock
-
-        mock_subprocess.check_output.side_effect = mock_check_output
+        mock_ecr_client.describe_images.return_value = _image_details('sha256:01', 'v1')
+        mock_ecr_client.batch_get_image.return_value = {'images': [{'imageManifest': 'manifest-01'}]}
 
         ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
 
         ecr.ensure_image_in_ecr()
 
-        mock_ecr_client.batch_get_image.assert_called_with(
+        mock_ecr_client.describe_images.assert_called_once_with(
             imageIds=[{'imageTag': 'v1'}], repositoryName='target-repo',
         )
+        mock_ecr_client.batch_get_image.assert_called_once_with(
+            imageIds=[{'imageDigest': 'sha256:01'}], repositoryName='target-repo',
+            acceptedMediaTypes=MANIFEST_MEDIA_TYPES + INDEX_MEDIA_TYPES,
+        )
 
     @patch("cloudlift.deployment.ecr.log_intent")
     @patch("cloudlift.deployment.ecr.subprocess")
@@ -180,19 +342,17 @@ class TestECR(TestCase):
                                                                        mock_subprocess, mock_log_intent):
         mock_ecr_client = MagicMock()
         mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.describe_images.return_value = _image_details('sha256:01', 'v1')
         mock_ecr_client.batch_get_image.return_value = {'images': [{'imageManifest': 'manifest-01'}]}
 
-        mock_subprocess.check_output.side_effect = _mock_git_calls
-
         ecr = ECR("aws-region", "target-repo", "acc-id")
 
         ecr.ensure_image_in_ecr()
 
         mock_log_intent.assert_has_calls([call('Image found in ECR')])
-        mock_ecr_client.put_image.assert_has_calls([
-            call(imageManifest='manifest-01', imageTag='v1', repositoryName='target-repo'),
-            call(imageManifest='manifest-01', imageTag='v1-1602236172', repositoryName='target-repo'),
-        ])
+        mock_ecr_client.put_image.assert_called_once_with(
+            imageManifest='manifest-01', imageTag='v1-1602236172', repositoryName='target-repo',
+        )
 
     @patch("cloudlift.deployment.ecr.subprocess")
     @patch("cloudlift.deployment.ecr._create_ecr_client")
@@ -201,11 +361,11 @@ class TestECR(TestCase):
                                                                            mock_subprocess):
         mock_ecr_client = MagicMock()
         mock_create_ecr_client.return_value = mock_ecr_client
-        mock_ecr_client.batch_get_image.side_effect = [
-            {'images': []},
-            {'images': [{'imageManifest': 'manifest-01'}]},
-            {'images': [{'imageManifest': 'manifest-01'}]},
+        mock_ecr_client.describe_images.side_effect = [
+            ImageNotFoundException(),
+            _image_details('sha256:01', 'v1'),
         ]
+        mock_ecr_client.batch_get_image.return_value = {'images': [{'imageManifest': 'manifest-01'}]}
 
         mock_ecr_client.get_authorization_token.return_value = {
             'authorizationData': [
@@ -213,8 +373,6 @@ class TestECR(TestCase):
             ]
         }
 
-        mock_subprocess.check_output.side_effect = _mock_git_calls
-
         ecr = ECR("aws-region", "target-repo", "acc-id")
 
         ecr.ensure_image_in_ecr()
@@ -224,11 +382,8 @@ class TestECR(TestCase):
             call(['docker', 'tag', 'target-repo:v1',
                   'acc-id.dkr.ecr.aws-region.amazonaws.com/target-repo:v1']),
         ])
-        mock_ecr_client.put_image.assert_has_calls([
-            call(imageManifest='manifest-01', imageTag='v1', repositoryName='target-repo'),
-            call(imageManifest='manifest-01', imageTag='v1-1602236172', repositoryName='target-repo'),
-        ]
-
+        mock_ecr_client.put_image.assert_called_once_with(
+            imageManifest='manifest-01', imageTag='v1-1602236172', repositoryName='target-repo',
         )
 
     @patch("cloudlift.deployment.ecr.subprocess")
@@ -239,10 +394,11 @@ class TestECR(TestCase):
                                                                                     mock_subprocess):
         mock_ecr_client = MagicMock()
         mock_create_ecr_client.return_value = mock_ecr_client
-        mock_ecr_client.batch_get_image.side_effect = [
-            {'images': []},
-            {'images': [{'imageManifest': 'manifest-01'}]},
+        mock_ecr_client.describe_images.side_effect = [
+            ImageNotFoundException(),
+            _image_details('sha256:01', 'v1-CustomDockerFile'),
         ]
+        mock_ecr_client.batch_get_image.return_value = {'images': [{'imageManifest': 'manifest-01'}]}
 
         mock_ecr_client.get_authorization_token.return_value = {
             'authorizationData': [
@@ -250,8 +406,6 @@ class TestECR(TestCase):
             ]
         }
 
-        mock_subprocess.check_output.side_effect = _mock_git_calls
-
         ecr = ECR("aws-region", "target-repo", "acc-id", dockerfile='CustomDockerFile')
 
         ecr.ensure_image_in_ecr()
@@ -262,22 +416,242 @@ class TestECR(TestCase):
         ])
 
         self.assertEqual('acc-id.dkr.ecr.aws-region.amazonaws.com/target-repo:v1-CustomDockerFile', ecr.image_uri)
-        mock_ecr_client.put_image.assert_called_with(
-            imageManifest='manifest-01', imageTag='v1-CustomDockerFile', repositoryName='target-repo',
+        mock_ecr_client.put_image.assert_called_once_with(
+            imageManifest='manifest-01', imageTag='v1-CustomDockerFile-1602236172', repositoryName='target-repo',
         )
 
+    @patch("cloudlift.deployment.ecr.build_context.context_tag", return_value='ctx-0123')
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_ensure_image_in_ecr_reuses_image_with_same_build_context(self, mock_create_ecr_client,
+                                                                      mock_context_tag):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.describe_images.side_effect = [
+            ImageNotFoundException(),
+            _image_details('sha256:01', 'ctx-0123'),
+        ]
+        mock_ecr_client.batch_get_image.side_effect = [
+            {'images': [{'imageId': {'imageTag': 'ctx-0123', 'imageDigest': 'sha256:01'}}]},
+            {'images': [{'imageManifest': 'manifest-01'}]},
+        ]
+
+        ecr = ECR("aws-region", "target-repo", "acc-id", build_args={'A': '1'}, context_hash=True)
+        with patch.object(ecr, '_build_image') as mock_build_image:
+            ecr.ensure_image_in_ecr()
+
+        mock_build_image.assert_not_called()
+        self.assertEqual('sha256:01', ecr.image_digest)
+        mock_context_tag.assert_called_once_with('.', None, {'A': '1'}, None)
+        mock_ecr_client.describe_images.assert_has_calls([
+            call(repositoryName='target-repo', imageIds=[{'imageTag': 'v1'}, {'imageTag': 'ctx-0123'}]),
+            call(repositoryName='target-repo', imageIds=[{'imageDigest': 'sha256:01'}]),
+        ])
+        mock_ecr_client.put_image.assert_has_calls([
+            call(imageManifest='manifest-01', imageTag='v1', repositoryName='target-repo'),
+            call(imageManifest='manifest-01', imageTag='v1-1602236172', repositoryName='target-repo'),
+        ], any_order=True)
+        self.assertEqual(2, mock_ecr_client.put_image.call_count)
+
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_add_tags_fetches_manifest_once(self, mock_create_ecr_client):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.describe_images.return_value = _image_details('sha256:01', 'v1')
+        mock_ecr_client.batch_get_image.return_value = {'images': [{'imageManifest': 'manifest-01'}]}
+
+        results = ECR("aws-region", "target-repo", "acc-id", version="v1").add_tags(['latest', 'release', 'qa'])
+
+        mock_ecr_client.batch_get_image.assert_called_once_with(
+            repositoryName='target-repo', imageIds=[{'imageDigest': 'sha256:01'}],
+            acceptedMediaTypes=MANIFEST_MEDIA_TYPES + INDEX_MEDIA_TYPES)
+        mock_ecr_client.put_image.assert_has_calls([
+            call(repositoryName='target-repo', imageTag=tag, imageManifest='manifest-01')
+            for tag in ['latest', 'release', 'qa']
+        ], any_order=True)
+        self.assertEqual([('latest', 'added'), ('release', 'added'), ('qa', 'added')],
+                         [(result.tag, result.status) for result in results])
+
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_add_tags_skips_manifest_download_for_tags_already_on_the_image(self, mock_create_ecr_client):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.describe_images.return_value = _image_details('sha256:01', 'v1', 'latest')
+        ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
+
+        results = ecr.add_tags(['latest'])
+        ECR("aws-region", "target-repo", "acc-id", version="v1").add_tags(['v1'])
+
+        mock_ecr_client.describe_images.assert_called_once()
+        mock_ecr_client.batch_get_image.assert_not_called()
+        mock_ecr_client.put_image.assert_not_called()
+        self.assertEqual([('latest', 'exists')], [(result.tag, result.status) for result in results])
+
+    @patch("cloudlift.deployment.ecr.log_err")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_add_tags_reports_each_failed_tag(self, mock_create_ecr_client, mock_log_err):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.describe_images.return_value = _image_details('sha256:01', 'v1')
+        mock_ecr_client.batch_get_image.return_value = {'images': [{'imageManifest': 'manifest-01'}]}
+        mock_ecr_client.exceptions.ImageAlreadyExistsException = type('ImageAlreadyExistsException',
+                                                                      (Exception,), {})
+        mock_ecr_client.exceptions.ImageTagAlreadyExistsException = type('ImageTagAlreadyExistsException',
+                                                                         (Exception,), {})
+
+        def put_image(imageTag, **kwargs):
+            if imageTag == 'latest':
+                raise mock_ecr_client.exceptions.ImageAlreadyExistsException('already tagged')
+            if imageTag == 'release':
+                raise mock_ecr_client.exceptions.ImageTagAlreadyExistsException('tag is immutable')
+
+        mock_ecr_client.put_image.side_effect = put_image
+
+        with self.assertRaises(UnrecoverableException) as error:
+            ECR("aws-region", "target-repo", "acc-id", version="v1").add_tags(['latest', 'release', 'qa'])
+
+        self.assertEqual('Unable to add tags: release', error.exception.value)
+        self.assertEqual(3, mock_ecr_client.put_image.call_count)
+        mock_log_err.assert_called_once_with('Unable to add additional tag release: tag is immutable')
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_login_to_ecr_reuses_unexpired_login(self, mock_create_ecr_client, mock_check_call):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.get_authorization_token.return_value = _authorization(hours=12)
+
+        ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
+        self.assertTrue(ecr._login_to_ecr())
+        self.assertFalse(ECR("aws-region", "other-repo", "acc-id", version="v1")._login_to_ecr())
+
+        mock_ecr_client.get_authorization_token.assert_called_once_with()
+        mock_check_call.assert_called_once_with(['docker', 'login', '-u', 'user', '-p', 'token', 'http://proxy'])
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_login_to_ecr_again_when_token_is_about_to_expire(self, mock_create_ecr_client, mock_check_call):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.get_authorization_token.return_value = _authorization(hours=0.25)
+
+        ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
+        ecr._login_to_ecr()
+        ecr._login_to_ecr()
+
+        self.assertEqual(2, mock_ecr_client.get_authorization_token.call_count)
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_login_to_ecr_reuses_login_of_an_earlier_run(self, mock_create_ecr_client, mock_check_call):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.get_authorization_token.return_value = _authorization(hours=12)
+
+        with patch.dict(os.environ):
+            os.environ.pop('CLOUDLIFT_NO_CACHE', None)
+            ECR("aws-region", "target-repo", "acc-id", version="v1")._login_to_ecr()
+            clear_registry_logins()
+            self.assertFalse(ECR("aws-region", "target-repo", "acc-id", version="v1")._login_to_ecr())
+
+        mock_ecr_client.get_authorization_token.assert_called_once_with()
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_call")
+    @patch("cloudlift.deployment.ecr._create_ecr_client")
+    def test_push_logs_in_again_when_remembered_login_is_rejected(self, mock_create_ecr_client, mock_check_call):
+        mock_ecr_client = MagicMock()
+        mock_create_ecr_client.return_value = mock_ecr_client
+        mock_ecr_client.get_authorization_token.return_value = _authorization(hours=12)
+        ecr = ECR("aws-region", "target-repo", "acc-id", version="v1")
+        ecr._login_to_ecr()
+        ecr_name = 'acc-id.dkr.ecr.aws-region.amazonaws.com/target-repo:v1'
+        mock_check_call.reset_mock()
+        pushes = []
+
+        def check_call(command):
+            if command[:2] == ['docker', 'push']:
+                pushes.append(command)
+                if len(pushes) == 1:
+                    raise subprocess.CalledProcessError(1, command)
+
+        mock_check_call.side_effect = check_call
+
+        ecr._push_image()
+
+        mock_check_call.assert_has_calls([
+            call(['docker', 'tag', 'target-repo:v1', ecr_name]),
+            call(['docker', 'push', ecr_name]),
+            call(['docker', 'login', '-u', 'user', '-p', 'token', 'http://proxy']),
+            call(['docker', 'push', ecr_name]),
+            call(['docker', 'rmi', ecr_name]),
+        ])
+
+
+class ImageNotFoundException(Exception):
+    pass
+
+
+def _image_details(digest, *tags):
+    return {'imageDetails': [{'imageDigest': digest, 'imageTags': list(tags), 'imageSizeInBytes': 1024,
+                              'imagePushedAt': datetime(2020, 10, 9, tzinfo=tzutc())}]}
+
+
+def _authorization(hours):
+    return {'authorizationData': [{
+        'authorizationToken': base64.b64encode(b'user:token').decode('utf-8'),
+        'proxyEndpoint': 'http://proxy',
+        'expiresAt': datetime.now(tzutc()) + timedelta(hours=hours),
+    }]}
+
+
+class TestBuildxBuilder(TestCase):
+    @patch("cloudlift.deployment.ecr.subprocess.check_output")
+    def test_current_builder_is_used_when_its_driver_can_export_caches(self, mock_check_output):
+        mock_check_output.return_value = 'Name:   ci\nDriver: docker-container\n'
+
+        self.assertIsNone(buildx_builder())
+        self.assertIsNone(buildx_builder())
+
+        mock_check_output.assert_called_once_with(['docker', 'buildx', 'inspect'], stderr=subprocess.DEVNULL,
+                                                  universal_newlines=True)
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_output")
+    def test_builder_is_created_when_the_current_one_uses_the_docker_driver(self, mock_check_output):
+        mock_check_output.side_effect = [
+            'Name:   default\nDriver: docker\n',
+            subprocess.CalledProcessError(1, 'docker buildx inspect cloudlift'),
+            'cloudlift\n',
+        ]
+
+        self.assertEqual('cloudlift', buildx_builder())
+
+        mock_check_output.assert_called_with(['docker', 'buildx', 'create', '--name', 'cloudlift',
+                                              '--driver', 'docker-container'], stderr=subprocess.STDOUT,
+                                             universal_newlines=True)
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_output")
+    def test_missing_buildx_fails_with_a_clear_message(self, mock_check_output):
+        mock_check_output.side_effect = FileNotFoundError()
+
+        with self.assertRaises(UnrecoverableException) as error:
+            buildx_builder()
+
+        self.assertIn('Install the docker buildx plugin', error.exception.value)
+
+    @patch("cloudlift.deployment.ecr.subprocess.check_output")
+    def test_failing_to_create_the_builder_fails_with_a_clear_message(self, mock_check_output):
+        mock_check_output.side_effect = [
+            'Name:   default\nDriver: docker\n',
+            subprocess.CalledProcessError(1, 'docker buildx inspect cloudlift'),
+            subprocess.CalledProcessError(1, 'docker buildx create', output='permission denied\n'),
+        ]
+
+        with self.assertRaises(UnrecoverableException) as error:
+            buildx_builder()
 
-def _mock_git_calls(cmd, rev_list=None, epoch=None):
-    if " ".join(cmd) == "git rev-list -n 1 HEAD":
-        mock = MagicMock()
-        mock.strip.return_value.decode.return_value = rev_list or "v1"
-        return mock
+        self.assertIn('docker buildx create --use --driver docker-container', error.exception.value)
 
-    if " ".join(cmd) == 'git show -s --format="%ct" HEAD':
-        mock = MagicMock()
-        mock.strip.return_value.decode.return_value = epoch or '"1602236172"'
-        return mock
 
-    mock = MagicMock()
-    mock.decode.return_value = None
-    return mock
+def _mock_git_calls(cmd):
+    if list(cmd[:2]) == ['git', 'log']:
+        return b'v1 1602236172\n'
+    return b''
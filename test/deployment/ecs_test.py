@@ -1,3 +1,4 @@
+import threading
 import unittest
 from cloudlift.deployment.ecs import EcsTaskDefinition, EcsAction, EcsClient
 from cloudlift.exceptions import UnrecoverableException
@@ -82,6 +83,12 @@ class TestEcsTaskDefinition(unittest.TestCase):
 
 
 class TestEcsAction(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("cloudlift.deployment.ecs.DeploymentIndex")
+        self.mock_deployment_index = patcher.start()
+        self.mock_deployment_index.return_value.get_task_definition_arn.return_value = None
+        self.addCleanup(patcher.stop)
+
     def test_get_task_definition_by_deployment_identifier(self):
         cluster_name = "cluster-1"
         service_name = MagicMock()
@@ -108,13 +115,13 @@ class TestEcsAction(unittest.TestCase):
         self.assertEqual({'deployment_identifier': 'id-0'}, actual_td.tags)
         client.list_task_definitions.assert_called_with = 'prodServiceAFamily'
 
-    @patch("cloudlift.deployment.ecs.Session")
-    def test_get_task_definition_by_deployment_identifier_with_next_token(self, mock_session):
+    @patch("cloudlift.deployment.ecs.get_client")
+    def test_get_task_definition_by_deployment_identifier_with_next_token(self, mock_get_client):
         cluster_name = "cluster-1"
         service_name = MagicMock()
         service_name.task_definition.return_value.family.return_value = "prodServiceAFamily"
         mock_boto_client = MagicMock()
-        mock_session.return_value.client.return_value = mock_boto_client
+        mock_get_client.return_value = mock_boto_client
 
         client = EcsClient()
 
@@ -145,13 +152,13 @@ class TestEcsAction(unittest.TestCase):
             call(familyPrefix='tdFamily', status='ACTIVE', sort='DESC', nextToken='token1')
         ])
 
-    @patch("cloudlift.deployment.ecs.Session")
-    def test_get_task_definition_by_deployment_identifier_with_no_matches(self, mock_session):
+    @patch("cloudlift.deployment.ecs.get_client")
+    def test_get_task_definition_by_deployment_identifier_with_no_matches(self, mock_get_client):
         cluster_name = "cluster-1"
         service_name = MagicMock()
         service_name.task_definition.return_value.family.return_value = "stgServiceAFamily"
         mock_boto_client = MagicMock()
-        mock_session.return_value.client.return_value = mock_boto_client
+        mock_get_client.return_value = mock_boto_client
 
         client = EcsClient()
 
@@ -173,6 +180,104 @@ class TestEcsAction(unittest.TestCase):
 
         self.assertEqual("task definition does not exist for deployment_identifier: id-0", error.exception.value)
 
+    def test_get_task_definition_by_deployment_identifier_from_the_deployment_index(self):
+        client = MagicMock()
+        client.describe_task_definition.side_effect = lambda task_definition_arn: {
+            'taskDefinition': {'taskDefinitionArn': task_definition_arn, 'family': 'tdFamily', 'status': 'ACTIVE'},
+            'tags': [{'key': 'deployment_identifier', 'value': 'id-0'}] if task_definition_arn == 'arn3' else [],
+        }
+        self.mock_deployment_index.return_value.get_task_definition_arn.return_value = 'arn3'
+
+        action = EcsAction(client, "cluster-1", MagicMock())
+
+        actual_td = action.get_task_definition_by_deployment_identifier(service=MagicMock(),
+                                                                        deployment_identifier="id-0")
+
+        self.assertEqual('arn3', actual_td.arn)
+        self.mock_deployment_index.assert_called_with('tdFamily', 'id-0')
+        client.list_task_definitions.assert_not_called()
+        self.mock_deployment_index.return_value.set_task_definition_arn.assert_not_called()
+
+    def test_get_task_definition_by_deployment_identifier_records_the_search_result(self):
+        client = MagicMock()
+        client.list_task_definitions.return_value = (['arn2', 'arn3'], None)
+
+        def mock_describe_task_definition(task_definition_arn):
+            status = 'INACTIVE' if task_definition_arn == 'arn1' else 'ACTIVE'
+            tags = [{'key': 'deployment_identifier', 'value': 'id-0'}] \
+                if task_definition_arn in ('arn1', 'arn3') else []
+            return {'taskDefinition': {'taskDefinitionArn': task_definition_arn, 'family': 'tdFamily',
+                                       'status': status}, 'tags': tags}
+
+        client.describe_task_definition.side_effect = mock_describe_task_definition
+        # Deregistered since it was recorded
+        self.mock_deployment_index.return_value.get_task_definition_arn.return_value = 'arn1'
+
+        action = EcsAction(client, "cluster-1", MagicMock())
+
+        actual_td = action.get_task_definition_by_deployment_identifier(service=MagicMock(),
+                                                                        deployment_identifier="id-0")
+
+        self.assertEqual('arn3', actual_td.arn)
+        client.list_task_definitions.assert_called_with(family='tdFamily')
+        self.mock_deployment_index.return_value.set_task_definition_arn.assert_called_with('arn3')
+
+    def test_get_task_definition_by_deployment_identifier_returns_the_newest_match(self):
+        client = MagicMock()
+        client.list_task_definitions.return_value = (['arn3', 'arn2', 'arn1'], None)
+        older_match_described = threading.Event()
+
+        def mock_describe_task_definition(task_definition_arn):
+            if task_definition_arn == 'arn3':
+                # Answered after the older match
+                older_match_described.wait(5)
+            elif task_definition_arn == 'arn2':
+                older_match_described.set()
+            tags = [{'key': 'deployment_identifier', 'value': 'id-0'}] \
+                if task_definition_arn in ('arn2', 'arn3') else []
+            return {'taskDefinition': {'taskDefinitionArn': task_definition_arn, 'family': 'tdFamily'},
+                    'tags': tags}
+
+        client.describe_task_definition.side_effect = mock_describe_task_definition
+
+        action = EcsAction(client, "cluster-1", MagicMock())
+
+        actual_td = action.get_task_definition_by_deployment_identifier(service=MagicMock(),
+                                                                        deployment_identifier="id-0")
+
+        self.assertEqual('arn3', actual_td.arn)
+
+    def test_get_stopped_tasks_of_a_deployment(self):
+        client = MagicMock()
+        task_arns = ['task-{}'.format(number) for number in range(150)]
+        client.list_stopped_tasks.side_effect = [(task_arns[:100], 'token1'), (task_arns[100:], None)]
+        client.describe_tasks.side_effect = lambda cluster_name, task_arns: {'tasks': [
+            {'taskArn': arn, 'startedBy': 'ecs-svc/2' if arn in ('task-1', 'task-120') else 'ecs-svc/1'}
+            for arn in task_arns]}
+
+        stopped_tasks = EcsAction(client, "cluster-1", "service-1").get_stopped_tasks('ecs-svc/2')
+
+        self.assertEqual(['task-1', 'task-120'], [task['taskArn'] for task in stopped_tasks])
+        self.assertEqual([call("cluster-1", "service-1"), call("cluster-1", "service-1", 'token1')],
+                         client.list_stopped_tasks.call_args_list)
+        self.assertEqual([100, 50], [len(describe[1]['task_arns']) for describe in client.describe_tasks.call_args_list])
+
+
+class TestEcsClient(unittest.TestCase):
+    @patch("cloudlift.deployment.ecs.get_client")
+    def test_list_stopped_tasks_passes_the_next_token(self, mock_get_client):
+        mock_get_client.return_value.list_tasks.side_effect = [
+            {'taskArns': ['task-1'], 'nextToken': 'token1'},
+            {'taskArns': ['task-2']},
+        ]
+        client = EcsClient()
+
+        self.assertEqual((['task-1'], 'token1'), client.list_stopped_tasks('cluster-1', 'service-1'))
+        self.assertEqual((['task-2'], None), client.list_stopped_tasks('cluster-1', 'service-1', 'token1'))
+
+        mock_get_client.return_value.list_tasks.assert_called_with(cluster='cluster-1', serviceName='service-1',
+                                                                   desiredStatus='STOPPED', nextToken='token1')
+
 
 def _build_task_definition(container_defn):
     return EcsTaskDefinition({'taskDefinitionArn': 'arn:aws:ecs:us-west-2:408750594584:task-definition/DummyFamily:4',
@@ -198,3 +303,4 @@ def _build_container_definition(environment=None, secrets=None):
     if secrets:
         cd['secrets'] = secrets
     return cd
+
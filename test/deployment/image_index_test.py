@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from mock import MagicMock, call
+
+from cloudlift.deployment.image_index import ImageIndex, ImageInfo, image_index
+
+
+class ImageNotFoundException(Exception):
+    pass
+
+
+def _details(digest, *tags):
+    return {'imageDigest': digest, 'imageTags': list(tags), 'imageSizeInBytes': 2048, 'imagePushedAt': 'pushed'}
+
+
+class TestImageIndex(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.index = ImageIndex(self.client, 'target-repo')
+
+    def test_resolves_many_tags_in_one_call_and_remembers_every_tag_of_an_image(self):
+        self.client.describe_images.return_value = {'imageDetails': [
+            _details('sha256:01', 'v1', 'v1-1602236172', 'latest'), _details('sha256:02', 'v2'),
+        ]}
+
+        found = self.index.lookup(['v1', 'v2'])
+        again = self.index.lookup(['latest', 'v1-1602236172'])
+
+        self.client.describe_images.assert_called_once_with(
+            repositoryName='target-repo', imageIds=[{'imageTag': 'v1'}, {'imageTag': 'v2'}])
+        self.assertEqual(ImageInfo('sha256:01', ['v1', 'v1-1602236172', 'latest'], 2048, 'pushed'), found['v1'])
+        self.assertEqual('sha256:02', found['v2'].digest)
+        self.assertEqual({'sha256:01'}, {image.digest for image in again.values()})
+        self.client.batch_get_image.assert_not_called()
+
+    def test_finds_the_existing_tags_when_some_are_missing(self):
+        self.client.describe_images.side_effect = [
+            ImageNotFoundException(), {'imageDetails': [_details('sha256:01', 'v1')]},
+        ]
+        self.client.batch_get_image.return_value = {
+            'images': [{'imageId': {'imageTag': 'v1', 'imageDigest': 'sha256:01'}}],
+            'failures': [{'imageId': {'imageTag': 'v2'}, 'failureCode': 'ImageNotFound'}],
+        }
+
+        found = self.index.lookup(['v1', 'v2'])
+
+        self.assertEqual('sha256:01', found['v1'].digest)
+        self.assertIsNone(found['v2'])
+        self.client.describe_images.assert_called_with(
+            repositoryName='target-repo', imageIds=[{'imageDigest': 'sha256:01'}])
+
+    def test_looks_up_missing_tags_again(self):
+        self.client.describe_images.side_effect = [
+            ImageNotFoundException(), {'imageDetails': [_details('sha256:01', 'v1')]},
+        ]
+
+        self.assertIsNone(self.index.find('v1'))
+        self.assertEqual('sha256:01', self.index.find('v1').digest)
+        self.assertEqual(2, self.client.describe_images.call_count)
+
+    def test_missing_single_tag_costs_one_call(self):
+        self.client.describe_images.side_effect = ImageNotFoundException()
+
+        self.assertIsNone(self.index.find('v1'))
+
+        self.client.describe_images.assert_called_once()
+        self.client.batch_get_image.assert_not_called()
+
+    def test_batches_lookups_by_the_api_limit(self):
+        self.client.describe_images.return_value = {'imageDetails': []}
+
+        self.index.lookup(['tag-{}'.format(number) for number in range(150)])
+
+        self.assertEqual([100, 50], [len(lookup[1]['imageIds'])
+                                     for lookup in self.client.describe_images.call_args_list])
+
+    def test_moves_recorded_and_forgotten_tags(self):
+        self.client.describe_images.return_value = {'imageDetails': [
+            _details('sha256:01', 'v1', 'latest'), _details('sha256:02', 'v2'),
+        ]}
+        self.index.lookup(['v1', 'v2'])
+
+        self.index.record_tags('sha256:02', ['latest'])
+        self.index.forget(['v1'])
+
+        self.assertEqual(ImageInfo('sha256:02', ['v2', 'latest'], 2048, 'pushed'), self.index.find('latest'))
+        self.assertEqual(1, self.client.describe_images.call_count)
+        self.index.find('v1')
+        self.assertEqual(call(repositoryName='target-repo', imageIds=[{'imageTag': 'v1'}]),
+                         self.client.describe_images.call_args)
+
+    def test_shares_the_index_of_a_repository(self):
+        self.assertIs(image_index(self.client, 'acc-id', 'region', 'repo'),
+                      image_index(MagicMock(), 'acc-id', 'region', 'repo'))
+        self.assertIsNot(image_index(self.client, 'acc-id', 'region', 'repo'),
+                         image_index(self.client, 'other-acc-id', 'region', 'repo'))
@@ -0,0 +1,52 @@
+import threading
+from unittest import TestCase
+
+from mock import patch, MagicMock
+
+from cloudlift.deployment.image_pipeline import ImagePipeline
+from cloudlift.exceptions import UnrecoverableException
+
+
+def _ecr(name, image=None):
+    ecr = MagicMock(repo_name='repo', version=name, local_image_uri='repo:' + name, image_uri='acc/repo:' + name)
+    ecr.find_image.return_value = image
+    ecr.push_image.return_value = {'imageManifest': name}
+    return ecr
+
+
+@patch('cloudlift.deployment.image_pipeline.log_bold', MagicMock())
+class TestImagePipeline(TestCase):
+    def test_pushes_an_image_while_other_builds_are_running(self):
+        fast, slow = _ecr('fast'), _ecr('slow')
+        fast_image_pushed = threading.Event()
+        fast.push_image.side_effect = lambda: fast_image_pushed.set() or {'imageManifest': 'fast'}
+        # The slow build only finishes once the fast image was pushed
+        slow.build_image.side_effect = lambda: self.assertTrue(fast_image_pushed.wait(5))
+
+        results = ImagePipeline([slow, fast], build_concurrency=2).run()
+
+        self.assertEqual(['repo:slow', 'repo:fast'], [result.image for result in results])
+        self.assertEqual(['succeeded'] * 2, [result.status for result in results])
+        slow.tag_image.assert_called_once_with({'imageManifest': 'slow'})
+
+    def test_skips_build_and_push_for_images_in_ecr(self):
+        ecr = _ecr('v1', image={'imageManifest': 'v1'})
+
+        results = ImagePipeline([ecr]).run()
+
+        ecr.build_image.assert_not_called()
+        ecr.push_image.assert_not_called()
+        ecr.tag_image.assert_called_once_with({'imageManifest': 'v1'})
+        self.assertEqual(['find', 'tag'], sorted(results[0].timings))
+
+    @patch('cloudlift.deployment.image_pipeline.log_err')
+    def test_finishes_other_images_before_reporting_a_failed_build(self, mock_log_err):
+        broken, healthy = _ecr('broken'), _ecr('healthy')
+        broken.build_image.side_effect = UnrecoverableException('docker build exited with status: 1')
+
+        with self.assertRaises(UnrecoverableException):
+            ImagePipeline([broken, healthy], build_concurrency=1).run()
+
+        broken.push_image.assert_not_called()
+        healthy.tag_image.assert_called_once_with({'imageManifest': 'healthy'})
+        mock_log_err.assert_called_once_with('Building repo:broken failed: docker build exited with status: 1')
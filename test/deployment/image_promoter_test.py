@@ -0,0 +1,123 @@
+import io
+import json
+from unittest import TestCase
+
+from mock import patch, MagicMock
+
+from cloudlift.deployment.image_promoter import ImagePromoter, INDEX_MEDIA_TYPES, MANIFEST_MEDIA_TYPES, \
+    _service_ecr
+from cloudlift.exceptions import UnrecoverableException
+
+DOCKER_MANIFEST = 'application/vnd.docker.distribution.manifest.v2+json'
+OCI_INDEX = 'application/vnd.oci.image.index.v1+json'
+
+
+def _ecr(account_id, repo_name):
+    ecr = MagicMock(account_id=account_id, repo_name=repo_name, repo_path='{}/{}'.format(account_id, repo_name))
+    ecr.client = MagicMock()
+    return ecr
+
+
+def _image(digest, config, layers, media_type=DOCKER_MANIFEST):
+    manifest = json.dumps({'mediaType': media_type, 'config': {'digest': config},
+                           'layers': [{'digest': layer} for layer in layers]})
+    return {'imageId': {'imageDigest': digest}, 'imageManifest': manifest, 'imageManifestMediaType': media_type}
+
+
+class ExistsError(Exception):
+    pass
+
+
+ExistsError.__name__ = 'LayerAlreadyExistsException'
+
+
+@patch('cloudlift.deployment.image_promoter.log_intent', MagicMock())
+@patch('cloudlift.deployment.image_promoter.log_bold', MagicMock())
+class TestImagePromoter(TestCase):
+    def setUp(self):
+        self.source = _ecr('111', 'app-repo')
+        self.destination = _ecr('222', 'app-repo')
+        self.source.client.get_download_url_for_layer.side_effect = \
+            lambda layerDigest, **kwargs: {'downloadUrl': 'https://blobs/' + layerDigest}
+        self.destination.client.initiate_layer_upload.return_value = {'uploadId': 'upload-1', 'partSize': 4}
+
+    @patch('cloudlift.deployment.image_promoter.urllib.request.urlopen')
+    def test_copies_only_missing_blobs_in_parts(self, mock_urlopen):
+        image = _image('sha256:m', 'sha256:c', ['sha256:l1', 'sha256:l2'])
+        self.source.client.batch_get_image.return_value = {'images': [image]}
+        self.destination.client.batch_check_layer_availability.return_value = {
+            'layers': [{'layerDigest': 'sha256:c', 'layerAvailability': 'AVAILABLE'},
+                       {'layerDigest': 'sha256:l1', 'layerAvailability': 'AVAILABLE'}],
+            'failures': [{'layerDigest': 'sha256:l2', 'failureCode': 'MissingLayerDigest'}],
+        }
+        mock_urlopen.return_value = io.BytesIO(b'0123456789')
+
+        result = ImagePromoter(self.source, self.destination).promote('v1', ['production'])
+
+        self.assertEqual((3, 1, 10), tuple(result))
+        mock_urlopen.assert_called_once_with('https://blobs/sha256:l2', timeout=60)
+        self.assertEqual([(0, 3), (4, 7), (8, 9)], [
+            (part[1]['partFirstByte'], part[1]['partLastByte'])
+            for part in self.destination.client.upload_layer_part.call_args_list
+        ])
+        self.destination.client.complete_layer_upload.assert_called_once_with(
+            uploadId='upload-1', layerDigests=['sha256:l2'], registryId='222', repositoryName='app-repo')
+        self.destination.put_tags.assert_called_once_with(['v1', 'production'], image)
+
+    def test_puts_platform_manifests_before_tagging_an_index(self):
+        amd64 = _image('sha256:amd64', 'sha256:c1', ['sha256:shared'])
+        arm64 = _image('sha256:arm64', 'sha256:c2', ['sha256:shared'])
+        index = {'imageId': {'imageDigest': 'sha256:index'}, 'imageManifestMediaType': OCI_INDEX,
+                 'imageManifest': json.dumps({'manifests': [{'digest': 'sha256:amd64'}, {'digest': 'sha256:arm64'}]})}
+        images = {'v1': index, 'sha256:amd64': amd64, 'sha256:arm64': arm64}
+        self.source.client.batch_get_image.side_effect = lambda imageIds, **kwargs: {
+            'images': [images[imageIds[0].get('imageTag') or imageIds[0].get('imageDigest')]]}
+        self.destination.client.batch_check_layer_availability.side_effect = lambda layerDigests, **kwargs: {
+            'layers': [{'layerDigest': digest, 'layerAvailability': 'AVAILABLE'} for digest in layerDigests]}
+
+        result = ImagePromoter(self.source, self.destination).promote('v1')
+
+        self.assertEqual((3, 0, 0), tuple(result))
+        self.destination.client.batch_check_layer_availability.assert_called_once_with(
+            layerDigests=['sha256:c1', 'sha256:shared', 'sha256:c2'], registryId='222', repositoryName='app-repo')
+        self.assertEqual(['sha256:amd64', 'sha256:arm64'], [
+            put[1]['imageDigest'] for put in self.destination.client.put_image.call_args_list])
+        self.destination.put_tags.assert_called_once_with(['v1'], index)
+
+    @patch('cloudlift.deployment.image_promoter.urllib.request.urlopen')
+    def test_treats_a_blob_uploaded_meanwhile_as_copied(self, mock_urlopen):
+        self.source.client.batch_get_image.return_value = {'images': [_image('sha256:m', 'sha256:c', [])]}
+        self.destination.client.batch_check_layer_availability.return_value = {
+            'failures': [{'layerDigest': 'sha256:c'}]}
+        self.destination.client.complete_layer_upload.side_effect = ExistsError()
+        mock_urlopen.return_value = io.BytesIO(b'{}')
+
+        result = ImagePromoter(self.source, self.destination).promote('v1')
+
+        self.assertEqual(1, result.copied_blobs)
+        self.destination.put_tags.assert_called_once()
+
+    def test_raises_for_a_missing_source_image(self):
+        self.source.client.batch_get_image.return_value = {'images': [], 'failures': [{'failureCode': 'ImageNotFound'}]}
+
+        with self.assertRaises(UnrecoverableException):
+            ImagePromoter(self.source, self.destination).promote('v1')
+
+        self.destination.client.batch_check_layer_availability.assert_not_called()
+        self.source.client.batch_get_image.assert_called_once_with(
+            imageIds=[{'imageTag': 'v1'}], acceptedMediaTypes=MANIFEST_MEDIA_TYPES + INDEX_MEDIA_TYPES,
+            registryId='111', repositoryName='app-repo')
+
+
+class TestServiceEcr(TestCase):
+    @patch('cloudlift.deployment.image_promoter.ECR')
+    @patch('cloudlift.deployment.image_promoter.get_account_id', MagicMock(return_value='111'))
+    @patch('cloudlift.deployment.image_promoter.get_region_for_environment', MagicMock(return_value='region1'))
+    @patch('cloudlift.deployment.image_promoter.ServiceConfiguration')
+    def test_service_without_ecr_repo_config_uses_the_default_repository(self, mock_service_configuration,
+                                                                         mock_ecr):
+        mock_service_configuration.return_value.get_config.return_value = {'services': {}}
+
+        _service_ecr('dummy', 'staging', 'v1')
+
+        mock_ecr.assert_called_once_with('region1', 'dummy-repo', '111', None, 'v1')
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from mock import MagicMock
+
+from cloudlift.deployment.progress import StackEventCursor
+
+START = datetime(2020, 1, 1)
+
+
+def _event(index):
+    return {'EventId': 'event-{}'.format(index), 'Timestamp': START + timedelta(seconds=index),
+            'LogicalResourceId': 'Resource', 'ResourceStatus': 'CREATE_IN_PROGRESS'}
+
+
+def _pages(newest, page_size=3):
+    '''
+        describe_stack_events responses for events 0..newest, newest first
+    '''
+    events = [_event(index) for index in range(newest, -1, -1)]
+    pages = [events[i:i + page_size] for i in range(0, len(events), page_size)]
+    return [dict(StackEvents=page, NextToken='token-{}'.format(i + 1) if i + 1 < len(pages) else None)
+            for i, page in enumerate(pages)]
+
+
+class TestStackEventCursor(TestCase):
+    def test_returns_only_events_after_mark_oldest_first(self):
+        client = MagicMock()
+        client.describe_stack_events.side_effect = _pages(10)[:1] + _pages(14)
+        cursor = StackEventCursor(client, 'stack')
+        cursor.mark()
+
+        new_events = cursor.new_events()
+
+        self.assertEqual(['event-11', 'event-12', 'event-13', 'event-14'],
+                         [event['EventId'] for event in new_events])
+        # Stops paging once the watermark is reached
+        self.assertEqual(3, client.describe_stack_events.call_count)
+        client.describe_stack_events.assert_called_with(StackName='stack', NextToken='token-1')
+
+    def test_nothing_new_costs_a_single_call(self):
+        client = MagicMock()
+        client.describe_stack_events.side_effect = _pages(50)[:1] * 2
+        cursor = StackEventCursor(client, 'stack')
+        cursor.mark()
+
+        self.assertEqual([], cursor.new_events())
+        self.assertEqual(2, client.describe_stack_events.call_count)
+
+    def test_unmarked_cursor_returns_whole_history(self):
+        client = MagicMock()
+        client.describe_stack_events.side_effect = _pages(4)
+
+        self.assertEqual(['event-{}'.format(i) for i in range(5)],
+                         [event['EventId'] for event in StackEventCursor(client, 'stack').new_events()])
+
+    def test_missing_stack_has_no_events(self):
+        client = MagicMock()
+        client.describe_stack_events.side_effect = Exception('Stack does not exist')
+        cursor = StackEventCursor(client, 'stack')
+        cursor.mark()
+
+        self.assertEqual([], cursor.new_events())
@@ -106,6 +106,24 @@ class TestServiceInformationFetcher(unittest.TestCase):
 
         self.assertEqual(expected_service_info, sif.service_info)
 
+    @patch('cloudlift.deployment.service_information_fetcher.get_region_for_environment')
+    @patch('cloudlift.deployment.service_information_fetcher.EcsClient')
+    @patch('cloudlift.deployment.service_information_fetcher.get_cluster_name')
+    @patch('cloudlift.deployment.service_information_fetcher.get_client_for')
+    def test_fetch_current_desired_count_describes_services_together(self, mock_get_client_for, mock_get_cluster_name,
+                                                                     mock_ecs_client, _):
+        mock_get_client_for.return_value.describe_stacks.return_value = _describe_stacks_output()
+        mock_get_cluster_name.return_value = 'cluster-test'
+        mock_ecs_client.return_value.describe_services_batch.return_value = {'services': [
+            {'serviceName': 'dummy-sen-test-ServiceTwo-45E0C5QX2HUV', 'desiredCount': 2},
+            {'serviceName': 'dummy-sen-test-ServiceOne-X9NCSHOSMM5S', 'desiredCount': 5},
+        ]}
+        sif = ServiceInformationFetcher(service, env, {'services': {'ServiceOne': {}, 'ServiceTwo': {}}})
+
+        self.assertEqual({'ServiceOne': 5, 'ServiceTwo': 2}, sif.fetch_current_desired_count())
+        mock_ecs_client.return_value.describe_services_batch.assert_called_once_with(
+            'cluster-test', ['dummy-sen-test-ServiceOne-X9NCSHOSMM5S', 'dummy-sen-test-ServiceTwo-45E0C5QX2HUV'])
+
 
 def _describe_stacks_output():
     return {'Stacks': [{
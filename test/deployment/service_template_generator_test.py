@@ -622,6 +622,38 @@ class TestServiceTemplateGenerator(TestCase):
         assert td['Properties']['TaskRoleArn'] == 'TASK_ARN'
         assert td['Properties']['ExecutionRoleArn'] == 'TASK_EXECUTION_ARN'
 
+    @patch('cloudlift.deployment.service_template_generator.build_config')
+    @patch('cloudlift.deployment.service_template_generator.get_account_id')
+    @patch('cloudlift.deployment.template_generator.region_service')
+    def test_generated_services_get_the_deployment_circuit_breaker(self, mock_region_service, mock_get_account_id,
+                                                                   mock_build_config):
+        mock_build_config.side_effect = mock_build_config_impl
+        mock_get_account_id.return_value = "12537612"
+        mock_region_service.get_region_for_environment.return_value = "us-west-2"
+        worker_config = {
+            "cloudlift_version": 'test-version',
+            "ecr_repo": {"name": "main-repo"},
+            "notifications_arn": "some",
+            "services": {"Dummy": {"memory_reservation": Decimal(1000), "secrets_name": "something",
+                                   "command": None}},
+        }
+
+        for service_config, service_name in [(worker_config, 'Dummy'), (mocked_tcp_service_config(), 'LdapServer')]:
+            mock_service_configuration = MagicMock(spec=ServiceConfiguration, service_name='dummy',
+                                                   environment='staging')
+            mock_service_configuration.get_config.return_value = service_config
+            template_generator = ServiceTemplateGenerator(
+                mock_service_configuration, self._get_env_stack(), './test/templates/test_env.sample',
+                "12537612.dkr.ecr.us-west-2.amazonaws.com/test-service-repo:1.1.1", desired_counts={service_name: 1})
+
+            generated = load(to_json(template_generator.generate_service()))[0]
+
+            self.assertEqual({
+                'DeploymentCircuitBreaker': {'Enable': True, 'Rollback': True},
+                'MaximumPercent': 200,
+                'MinimumHealthyPercent': 100,
+            }, generated['Resources'][service_name]['Properties']['DeploymentConfiguration'])
+
     def check_in_outputs(self, template, key, value):
         self.assertIn('Outputs', template)
         self.assertTrue(key in template['Outputs'])
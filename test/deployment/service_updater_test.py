@@ -0,0 +1,73 @@
+import threading
+from unittest import TestCase
+
+from mock import patch, MagicMock
+
+from cloudlift.deployment.deployment_monitor import DeploymentMonitor
+from cloudlift.deployment.service_updater import ServiceUpdater
+from cloudlift.exceptions import UnrecoverableException
+
+
+def _service_updater(service_names):
+    service_updater = ServiceUpdater.__new__(ServiceUpdater)
+    service_updater.environment = 'test'
+    service_updater.cluster_name = 'cluster-test'
+    service_updater.service_configuration = {'services': {name: {} for name in service_names}}
+    service_updater.service_info_fetcher = MagicMock()
+    service_updater.service_info_fetcher.service_info = {
+        name: {'ecs_service_name': name + '-ecs', 'secrets_name': name + '-secrets'} for name in service_names
+    }
+    return service_updater
+
+
+@patch('cloudlift.deployment.service_updater.get_region_for_environment', MagicMock(return_value='us-west-2'))
+@patch('cloudlift.deployment.service_updater.EcsClient', MagicMock())
+class TestServiceUpdater(TestCase):
+    @patch('cloudlift.deployment.service_updater.DEPLOYMENT_CONCURRENCY', 2)
+    def test_starts_next_service_as_soon_as_a_slot_frees_up(self):
+        slow_service_released = threading.Event()
+        third_service_started = threading.Event()
+
+        def target(ecs_service_name, **kwargs):
+            if ecs_service_name == 'A-ecs':
+                # Only finishes once C was started next to it
+                self.assertTrue(third_service_started.wait(5))
+                slow_service_released.set()
+            if ecs_service_name == 'C-ecs':
+                third_service_started.set()
+
+        results = _service_updater(['A', 'B', 'C']).run_job_for_all_services('Deploy', target, {})
+
+        self.assertTrue(slow_service_released.is_set())
+        self.assertEqual(['A-ecs', 'B-ecs', 'C-ecs'], [result.service for result in results])
+        self.assertEqual(['succeeded'] * 3, [result.status for result in results])
+
+    def test_passes_per_service_arguments_without_sharing_them(self):
+        target = MagicMock()
+
+        _service_updater(['A', 'B']).run_job_for_all_services('Deploy', target, {'cluster_name': 'cluster-test'})
+
+        calls = sorted((call[1] for call in target.call_args_list), key=lambda kwargs: kwargs['ecs_service_name'])
+        self.assertEqual(['A-ecs', 'B-ecs'], [kwargs['ecs_service_name'] for kwargs in calls])
+        self.assertEqual(['A-secrets', 'B-secrets'], [kwargs['secrets_name'] for kwargs in calls])
+        self.assertEqual(['cluster-test'] * 2, [kwargs['cluster_name'] for kwargs in calls])
+        self.assertIsInstance(calls[0]['monitor'], DeploymentMonitor)
+        self.assertIs(calls[0]['monitor'], calls[1]['monitor'])
+
+    def test_reports_failures_after_all_services_finish(self):
+        target = MagicMock(side_effect=[UnrecoverableException('A Deploy failed.'), None])
+
+        with patch('cloudlift.deployment.service_updater.DEPLOYMENT_CONCURRENCY', 1), \
+                self.assertRaises(UnrecoverableException) as error:
+            _service_updater(['A', 'B']).run_job_for_all_services('Deploy', target, {})
+
+        self.assertEqual('Deploy failed', error.exception.value)
+        self.assertEqual(2, target.call_count)
+
+    @patch('cloudlift.deployment.service_updater.api_call_count')
+    def test_counts_api_calls_per_service(self, mock_api_call_count):
+        mock_api_call_count.side_effect = [0, 3]
+
+        results = _service_updater(['A']).run_job_for_all_services('Deploy', MagicMock(), {})
+
+        self.assertEqual(3, results[0].api_calls)
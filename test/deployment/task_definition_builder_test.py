@@ -1,5 +1,5 @@
 from unittest import TestCase
-from cloudlift.deployment.task_definition_builder import TaskDefinitionBuilder
+from cloudlift.deployment.task_definition_builder import TaskDefinitionBuilder, task_definition_fingerprint
 
 
 class TaskDefinitionBuilderTest(TestCase):
@@ -90,13 +90,13 @@ class TaskDefinitionBuilderTest(TestCase):
             service_name="dummy",
             configuration=configuration,
             region='region1',
+            application_name='dummy',
         )
 
         expected = {
             'containerDefinitions': [{
                 'command': ['./start_script.sh'],
                 'cpu': 0,
-                'environment': [],
                 'essential': True,
                 'healthCheck': {
                     'command': ['CMD-SHELL', './check-health.sh'],
@@ -121,6 +121,13 @@ class TaskDefinitionBuilderTest(TestCase):
             'taskRoleArn': 'fallback_arn2',
             'placementConstraints': [],
         }
+        expected['tags'] = [
+            {'key': 'application', 'value': 'dummy'},
+            {'key': 'environment', 'value': 'test'},
+            {'key': 'service', 'value': 'dummy'},
+            {'key': 'deployment_identifier', 'value': 'id-0'},
+            {'key': 'fingerprint', 'value': task_definition_fingerprint(expected)},
+        ]
 
         actual = builder.build_task_definition(
             container_configurations={
@@ -129,6 +136,7 @@ class TaskDefinitionBuilderTest(TestCase):
             ecr_image_uri="nginx:default",
             fallback_task_execution_role='fallback_arn1',
             fallback_task_role='fallback_arn2',
+            deployment_identifier='id-0',
         )
 
         self.assertEqual(expected, actual)
@@ -267,3 +275,85 @@ class TaskDefinitionBuilderTest(TestCase):
         )
 
         self.assertEqual(expected, actual)
+
+
+def _build_task_definition(configuration, container_configuration=None, image='nginx:default',
+                           deployment_identifier=None, image_digest=None):
+    builder = TaskDefinitionBuilder(
+        environment="test",
+        service_name="dummy",
+        configuration=dict(configuration, command=None, memory_reservation=100),
+        region='region1',
+        application_name='dummy',
+    )
+    return builder.build_task_definition(
+        container_configurations={'dummyContainer': container_configuration or {}},
+        ecr_image_uri=image,
+        fallback_task_role='fallback_arn',
+        fallback_task_execution_role='fallback_arn',
+        deployment_identifier=deployment_identifier,
+        image_digest=image_digest,
+    )
+
+
+class TaskDefinitionBuilderCpuArchitectureTest(TestCase):
+    def _build(self, **configuration):
+        return _build_task_definition(configuration)
+
+    def test_fargate_task_runs_on_the_configured_architecture(self):
+        for cpu_architecture, expected in [('arm64', 'ARM64'), ('x86_64', 'X86_64')]:
+            task_definition = self._build(fargate={'cpu': 256, 'memory': 512}, cpu_architecture=cpu_architecture)
+
+            self.assertEqual({'cpuArchitecture': expected, 'operatingSystemFamily': 'LINUX'},
+                             task_definition['runtimePlatform'])
+            self.assertEqual([], task_definition['placementConstraints'])
+
+    def test_ec2_task_is_placed_on_instances_of_the_configured_architecture(self):
+        for cpu_architecture in ['arm64', 'x86_64']:
+            task_definition = self._build(
+                cpu_architecture=cpu_architecture,
+                placement_constraints=[{'type': 'memberOf', 'expression': 'attribute:ecs.os-type == linux'}],
+            )
+
+            self.assertNotIn('runtimePlatform', task_definition)
+            self.assertEqual([
+                {'type': 'memberOf', 'expression': 'attribute:ecs.os-type == linux'},
+                {'type': 'memberOf', 'expression': 'attribute:ecs.cpu-architecture == ' + cpu_architecture},
+            ], task_definition['placementConstraints'])
+
+    def test_task_without_cpu_architecture_is_unconstrained(self):
+        for configuration in [{'fargate': {'cpu': 256, 'memory': 512}}, {}]:
+            task_definition = self._build(**configuration)
+
+            self.assertNotIn('runtimePlatform', task_definition)
+            self.assertEqual([], task_definition['placementConstraints'])
+
+
+class TaskDefinitionFingerprintTest(TestCase):
+    def _build(self, secrets, image='nginx:v1', deployment_identifier='id-0', image_digest=None):
+        return _build_task_definition({}, {'secrets': secrets}, image, deployment_identifier, image_digest)
+
+    @staticmethod
+    def _fingerprint(task_definition):
+        return {tag['key']: tag['value'] for tag in task_definition['tags']}['fingerprint']
+
+    def test_tags_the_task_definition_with_the_fingerprint_of_the_rest_of_it(self):
+        task_definition = self._build({'A': 'arn:a'})
+
+        self.assertEqual(task_definition_fingerprint(task_definition), self._fingerprint(task_definition))
+
+    def test_fingerprint_ignores_tags_and_the_order_of_secrets(self):
+        fingerprint = self._fingerprint(self._build({'A': 'arn:a', 'B': 'arn:b'}))
+
+        self.assertEqual(fingerprint, self._fingerprint(self._build({'B': 'arn:b', 'A': 'arn:a'},
+                                                                    deployment_identifier='id-1')))
+        self.assertNotEqual(fingerprint, self._fingerprint(self._build({'A': 'arn:a', 'B': 'arn:b'},
+                                                                       image='nginx:v2')))
+        self.assertNotEqual(fingerprint, self._fingerprint(self._build({'A': 'arn:a', 'B': 'arn:c'})))
+
+    def test_fingerprint_changes_with_the_image_digest_behind_the_same_tag(self):
+        task_definition = self._build({'A': 'arn:a'}, image_digest='sha256:01')
+
+        self.assertEqual(task_definition_fingerprint(task_definition, 'sha256:01'), self._fingerprint(task_definition))
+        self.assertNotEqual(self._fingerprint(task_definition),
+                            self._fingerprint(self._build({'A': 'arn:a'}, image_digest='sha256:02')))
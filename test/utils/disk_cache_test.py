@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from mock import patch, MagicMock
+
+from cloudlift.utils import disk_cache
+
+
+class TestDiskCache(TestCase):
+    def setUp(self):
+        self.cache_home = tempfile.mkdtemp()
+        patcher = patch.dict(os.environ, {'XDG_CACHE_HOME': self.cache_home})
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        os.environ.pop('CLOUDLIFT_NO_CACHE', None)
+
+    def test_store_and_load(self):
+        disk_cache.store('ami_id', 'us-west-2', 'ami-123')
+
+        self.assertEqual('ami-123', disk_cache.load('ami_id', 'us-west-2'))
+        self.assertIsNone(disk_cache.load('ami_id', 'us-east-1'))
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_home, 'cloudlift', 'ami_id')))
+
+    @patch('cloudlift.utils.disk_cache.time')
+    def test_entries_expire_with_namespace_policy(self, mock_time):
+        mock_time.return_value = 1000
+        disk_cache.store('environment_stack', 'stack', {'StackId': 'id'})
+
+        mock_time.return_value = 1000 + disk_cache.ttl_for('environment_stack') - 1
+        self.assertEqual({'StackId': 'id'}, disk_cache.load('environment_stack', 'stack'))
+        mock_time.return_value = 1000 + disk_cache.ttl_for('environment_stack') + 1
+        self.assertIsNone(disk_cache.load('environment_stack', 'stack'))
+
+    def test_cached_fetches_only_on_miss(self):
+        fetch = MagicMock(return_value=['us-west-2a', 'us-west-2b'])
+
+        disk_cache.cached('availability_zones', 'account/us-west-2', fetch)
+        zones = disk_cache.cached('availability_zones', 'account/us-west-2', fetch)
+
+        self.assertEqual(['us-west-2a', 'us-west-2b'], zones)
+        fetch.assert_called_once_with()
+
+    def test_no_cache_bypasses_reads_and_writes(self):
+        disk_cache.store('ami_id', 'us-west-2', 'ami-123')
+        fetch = MagicMock(return_value='ami-456')
+
+        with patch.dict(os.environ, {'CLOUDLIFT_NO_CACHE': '1'}):
+            self.assertEqual('ami-456', disk_cache.cached('ami_id', 'us-west-2', fetch))
+            disk_cache.store('ami_id', 'us-east-1', 'ami-789')
+
+        self.assertEqual('ami-123', disk_cache.load('ami_id', 'us-west-2'))
+        self.assertIsNone(disk_cache.load('ami_id', 'us-east-1'))
+
+    def test_corrupt_entries_are_misses(self):
+        disk_cache.store('ami_id', 'us-west-2', 'ami-123')
+        namespace_dir = os.path.join(self.cache_home, 'cloudlift', 'ami_id')
+        for file_name in os.listdir(namespace_dir):
+            with open(os.path.join(namespace_dir, file_name), 'w') as entry_file:
+                entry_file.write('{not json')
+
+        self.assertIsNone(disk_cache.load('ami_id', 'us-west-2'))
+
+    def test_writes_leave_no_temporary_files(self):
+        disk_cache.store('ami_id', 'us-west-2', 'ami-123')
+        disk_cache.store('ami_id', 'us-west-2', 'ami-456')
+
+        namespace_dir = os.path.join(self.cache_home, 'cloudlift', 'ami_id')
+        self.assertEqual(1, len(os.listdir(namespace_dir)))
+        with open(os.path.join(namespace_dir, os.listdir(namespace_dir)[0])) as entry_file:
+            self.assertEqual('ami-456', json.load(entry_file)['value'])
+
+    def test_entries_and_clear(self):
+        disk_cache.store('ami_id', 'us-west-2', 'ami-123')
+        disk_cache.store('environment_stack', '1234/cluster-staging', {})
+        disk_cache.store('environment_stack', '1234/cluster-production', {})
+
+        self.assertEqual(
+            [('ami_id', 'us-west-2'), ('environment_stack', '1234/cluster-production'),
+             ('environment_stack', '1234/cluster-staging')],
+            sorted((namespace, key) for namespace, key, _, _ in disk_cache.entries())
+        )
+        self.assertEqual(1, disk_cache.clear('environment_stack', key_filter=lambda key: key.endswith('staging')))
+        self.assertEqual(2, disk_cache.clear())
+        self.assertEqual([], list(disk_cache.entries()))
@@ -0,0 +1,76 @@
+import os
+import subprocess
+from unittest import TestCase
+
+from mock import patch
+
+from cloudlift.exceptions import UnrecoverableException
+from cloudlift.utils import git_metadata
+
+
+def _git(cmd):
+    if cmd[1] == 'log':
+        if cmd[4] == 'missing':
+            raise subprocess.CalledProcessError(128, cmd)
+        return b'0123abcd 1602236172\n'
+    if cmd[1] == 'status':
+        return b' M cloudlift/deployment/ecr.py\n'
+    if cmd[1] == 'rev-parse':
+        return b'HEAD\n' if os.environ.get('DETACHED') else b'feature/login\n'
+
+
+@patch.dict(os.environ)
+class TestGitMetadata(TestCase):
+    def setUp(self):
+        for name in ('CLOUDLIFT_GIT_SHA', 'CLOUDLIFT_GIT_COMMIT_EPOCH', 'CLOUDLIFT_GIT_DIRTY',
+                     'CLOUDLIFT_GIT_IGNORE_UNTRACKED', 'CLOUDLIFT_GIT_BRANCH'):
+            os.environ.pop(name, None)
+        patcher = patch('cloudlift.utils.git_metadata.subprocess.check_output', side_effect=_git)
+        self.addCleanup(patcher.stop)
+        self.check_output = patcher.start()
+
+    def test_resolves_sha_and_epoch_with_one_git_call(self):
+        self.assertEqual(('0123abcd', '1602236172'), git_metadata.get_commit())
+        self.assertEqual('0123abcd', git_metadata.get_commit('HEAD').sha)
+
+        self.check_output.assert_called_once_with(('git', 'log', '-1', '--format=%H %ct', 'HEAD', '--'))
+
+    def test_runs_git_status_once(self):
+        self.assertTrue(git_metadata.is_dirty())
+        self.assertTrue(git_metadata.is_dirty())
+
+        self.check_output.assert_called_once_with(('git', 'status', '--porcelain'))
+
+    def test_skips_untracked_files_in_fast_mode(self):
+        os.environ['CLOUDLIFT_GIT_IGNORE_UNTRACKED'] = '1'
+
+        git_metadata.is_dirty()
+
+        self.check_output.assert_called_once_with(('git', 'status', '--porcelain', '--untracked-files=no'))
+
+    def test_uses_values_given_by_ci(self):
+        os.environ.update({'CLOUDLIFT_GIT_SHA': 'feedbeef', 'CLOUDLIFT_GIT_COMMIT_EPOCH': '1700000000',
+                           'CLOUDLIFT_GIT_DIRTY': 'false'})
+
+        self.assertEqual(('feedbeef', '1700000000'), git_metadata.get_commit())
+        self.assertFalse(git_metadata.is_dirty())
+        self.check_output.assert_not_called()
+
+    def test_ci_values_do_not_apply_to_other_revisions(self):
+        os.environ.update({'CLOUDLIFT_GIT_SHA': 'feedbeef', 'CLOUDLIFT_GIT_COMMIT_EPOCH': '1700000000'})
+
+        self.assertEqual('0123abcd', git_metadata.get_commit('v1.0').sha)
+
+    def test_unknown_revision(self):
+        with self.assertRaises(UnrecoverableException):
+            git_metadata.get_commit('missing')
+
+    def test_branch(self):
+        self.assertEqual('feature/login', git_metadata.get_branch())
+        os.environ['CLOUDLIFT_GIT_BRANCH'] = 'main'
+        self.assertEqual('main', git_metadata.get_branch())
+
+    def test_detached_head_has_no_branch(self):
+        os.environ['DETACHED'] = '1'
+
+        self.assertIsNone(git_metadata.get_branch())
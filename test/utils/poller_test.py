@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+from mock import patch, MagicMock
+
+from cloudlift.utils import poller
+from cloudlift.utils.poller import PollTimeout, Poller, poll
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestPoller(TestCase):
+    def setUp(self):
+        poller.clear_poll_stats()
+        self.clock = FakeClock()
+        for name in ('monotonic', 'sleep'):
+            patcher = patch('cloudlift.utils.poller.' + name, getattr(self.clock, name))
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def test_backs_off_up_to_max_interval(self):
+        fetch = MagicMock(side_effect=['PENDING'] * 5 + ['DONE'])
+
+        result = poll('test', fetch, lambda status: status == 'DONE',
+                      initial_interval=1, max_interval=4, backoff=2, jitter=0)
+
+        self.assertEqual('DONE', result)
+        self.assertEqual([1, 2, 4, 4, 4], self.clock.sleeps)
+
+    def test_returns_without_waiting_on_terminal_state(self):
+        on_pending = MagicMock()
+
+        poll('test', lambda: 'DONE', lambda status: status == 'DONE', on_pending)
+
+        self.assertEqual([], self.clock.sleeps)
+        on_pending.assert_not_called()
+
+    def test_jitter_stays_within_bounds(self):
+        fetch = MagicMock(side_effect=['PENDING'] * 20 + ['DONE'])
+
+        poll('test', fetch, lambda status: status == 'DONE', initial_interval=10, max_interval=10, jitter=0.2)
+
+        self.assertTrue(all(8 <= seconds <= 12 for seconds in self.clock.sleeps))
+
+    def test_raises_on_deadline_with_last_result(self):
+        with self.assertRaises(PollTimeout) as error:
+            poll('test', lambda: 'PENDING', lambda status: False, initial_interval=2, jitter=0, backoff=1,
+                 timeout=5)
+
+        self.assertEqual('PENDING', error.exception.last_result)
+        self.assertEqual([2, 2, 1], self.clock.sleeps)
+
+    def test_records_attempts_api_calls_and_time_spent(self):
+        fetch = MagicMock(side_effect=['PENDING', 'PENDING', 'DONE'])
+        test_poller = Poller('test', initial_interval=1, backoff=1, jitter=0)
+
+        with patch('cloudlift.utils.poller.api_call_count', side_effect=[10, 13]):
+            test_poller.poll(fetch, lambda status: status == 'DONE')
+
+        self.assertEqual(poller.PollStats('test', 3, 3, 2, False), test_poller.stats)
+        self.assertEqual({'test': {'polls': 1, 'attempts': 3, 'api_calls': 3, 'elapsed': 2, 'timed_out': 0}},
+                         poller.poll_stats())